@@ -1,24 +1,313 @@
 import os
+import hashlib
+import time
+from functools import lru_cache
 import pandas as pd
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, url_for
 from flask_cors import CORS
 from datetime import datetime
 
 # Import from local modules
 from config import POCKETBASE_COLLECTION_CONFIG # For validation
+from config import FORECAST_HORIZON_DAYS, MAX_FORECAST_HORIZON, FORECAST_RESULT_CACHE_SIZE, MAX_BACKFILL_MONTHS
+from config import BACKTEST_HORIZON_DAYS, BACKTEST_CUTOFFS, MAX_BACKTEST_CUTOFFS, GZIP_MIN_BYTES
+from config import PROFILE_REQUESTS, PROFILE_SAMPLE_INTERVAL_SECONDS
 import services # Import the services module
+import response_cache
+import response_formats
+import bulk_ingest
+import jobs
+import storage
+import series
+import hierarchy
+import backtest
+import forecasters
+import telemetry
 
 app = Flask(__name__)
 CORS(app) # Enable CORS for all routes
 
+@app.before_request
+def _start_request_timing():
+    g.request_started = time.perf_counter()
+    if PROFILE_REQUESTS and request.headers.get('X-Profile'):
+        g.profiler = telemetry.SamplingProfiler(interval=PROFILE_SAMPLE_INTERVAL_SECONDS).start()
+
+@app.after_request
+def _finish_request_timing(response):
+    """
+    Records the handler time in http_request_seconds. For a profiled request (X-Profile header,
+    PROFILE_REQUESTS enabled) the body is produced under the profiler and replaced by its report.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        response.get_data()  # Runs the generator of streamed bodies while sampling
+        profiler.stop()
+    started = g.pop('request_started', None)
+    if started is not None:
+        model_name = (request.view_args or {}).get('model_name')
+        telemetry.observe("http_request_seconds", time.perf_counter() - started,
+                          route=request.url_rule.rule if request.url_rule is not None else "unmatched",
+                          method=request.method, status=response.status_code,
+                          model=model_name if model_name in POCKETBASE_COLLECTION_CONFIG else "")
+    if profiler is not None:
+        report = Response(profiler.report(), mimetype='text/plain')
+        report.headers['X-Profile-Status'] = str(response.status_code)
+        return report
+    return response
+
+FORECAST_DATE_COLUMNS = ['ds']
+HISTORY_DATE_COLUMNS = ['ds', 'created_at', 'updated_at']
+SERIES_HISTORY_COLUMNS = ['ds', 'y', 'updated_at']
+# Any of these switches /forecast and /historical_data from the cached default body to a streamed one.
+TABLE_QUERY_PARAMS = ('format', 'since', 'until', 'columns')
+
+def _serialize_forecast(model_name):
+    df = storage.get_backend().read_forecast(model_name)
+    # Dates as 'YYYY-MM-DD' strings for JSON
+    df = response_formats.json_ready(df, FORECAST_DATE_COLUMNS, response_formats.DATE_FORMAT)
+    return df.to_json(orient="records")
+
+def _serialize_historical_data(model_name):
+    df = storage.get_backend().read_history(model_name)
+    # Dates as ISO strings ('...T00:00:00.000000Z') for JSON
+    df = response_formats.json_ready(df, HISTORY_DATE_COLUMNS, response_formats.TIMESTAMP_FORMAT)
+    return df.to_json(orient="records")
+
+def _cached_json_response(endpoint, model_name, filepath, serialize):
+    """Serves a cached JSON body with an ETag; answers 304 when If-None-Match matches."""
+    etag, body = response_cache.get_or_build(endpoint, model_name, filepath, lambda: serialize(model_name))
+    return _json_response_with_etag(etag, body)
+
+def _accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+@lru_cache(maxsize=FORECAST_RESULT_CACHE_SIZE)
+def _gzipped_body(etag, body):
+    """Bodies are cached per etag, so each one is only compressed once per process."""
+    return f"{etag}-gzip", response_formats.gzip_body(body)
+
+def _json_response_with_etag(etag, body):
+    gzipped = len(body) >= GZIP_MIN_BYTES and _accepts_gzip()
+    if gzipped:
+        etag, body = _gzipped_body(etag, body)
+    response = Response(body, mimetype='application/json')
+    if gzipped:
+        response.content_encoding = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def _parse_table_query(available_columns):
+    """
+    Parses ?format=records|columnar|arrow, ?since=/&until= (inclusive dates or timestamps on 'ds')
+    and ?columns=a,b. Returns (query, None), or (None, error message) for a 400.
+    """
+    fmt = request.args.get('format', response_formats.RECORDS).lower()
+    if fmt not in response_formats.FORMATS:
+        return None, f"'format' must be one of: {', '.join(response_formats.FORMATS)}."
+    query = {"format": fmt}
+    for bound in ('since', 'until'):
+        value = request.args.get(bound)
+        try:
+            timestamp = pd.Timestamp(value) if value else None
+        except ValueError:
+            timestamp = None
+        if value and (timestamp is None or pd.isna(timestamp)):
+            return None, f"'{bound}' must be a date or ISO timestamp."
+        if timestamp is not None and timestamp.tzinfo is not None:
+            timestamp = timestamp.tz_convert(None)  # Stored dates are naive UTC
+        query[bound] = timestamp
+    columns = None
+    if request.args.get('columns'):
+        columns = [col.strip() for col in request.args['columns'].split(',') if col.strip()]
+        unknown = [col for col in columns if col not in available_columns]
+        if unknown or not columns:
+            return None, f"'columns' must be a comma-separated list of: {', '.join(available_columns)}."
+        columns = list(dict.fromkeys(columns))
+    query["columns"] = columns
+    return query, None
+
+def _streamed_table_response(signature, read, query, date_columns, date_format):
+    """
+    Streams read(since, until, columns) in the requested format, gzipped if the client accepts it.
+    The weak ETag is derived from the source file's signature and the query, so a matching
+    If-None-Match is answered with 304 before anything is read.
+    """
+    gzipped = _accepts_gzip()
+    etag = hashlib.sha1(repr((signature, sorted(request.args.items(multi=True)), gzipped)).encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.vary.add('Accept-Encoding')
+        return response
+
+    df = read(query['since'], query['until'], query['columns'])
+    chunks = response_formats.iter_body(df, query['format'], date_columns, date_format)
+    if gzipped:
+        chunks = response_formats.gzip_chunks(chunks)
+    response = Response(chunks, mimetype=response_formats.MIMETYPES[query['format']])
+    if gzipped:
+        response.content_encoding = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag, weak=True)
+    return response
+
+def _table_query_response(filepath, available_columns, read, date_columns, date_format):
+    query, error = _parse_table_query(available_columns)
+    if error:
+        return jsonify({"error": error}), 400
+    signature = response_cache.file_signature(filepath)
+    return _streamed_table_response(signature, read, query, date_columns, date_format)
+
+@lru_cache(maxsize=FORECAST_RESULT_CACHE_SIZE)
+def _serialize_on_demand_forecast(model_name, version, horizon, freq, include_uncertainty):
+    """Keyed on the model version (see services.on_demand_version), so a retrain never serves a stale result."""
+    df = services.predict_on_demand(model_name, version, horizon, freq, include_uncertainty)
+    with telemetry.span("serialize", endpoint="forecast_on_demand", model=model_name):
+        df = response_formats.json_ready(df, FORECAST_DATE_COLUMNS, response_formats.DATE_FORMAT)
+        body = df.to_json(orient="records").encode("utf-8")
+    return hashlib.sha1(body).hexdigest(), body
+
+def _on_demand_forecast_response(model_name):
+    """Handles /forecast/<model_name>?horizon=N&freq=D|W|M&uncertainty=false from the current forecaster's fit."""
+    try:
+        horizon = int(request.args.get('horizon', FORECAST_HORIZON_DAYS))
+    except ValueError:
+        return jsonify({"error": "'horizon' must be an integer."}), 400
+    if not 1 <= horizon <= MAX_FORECAST_HORIZON:
+        return jsonify({"error": f"'horizon' must be between 1 and {MAX_FORECAST_HORIZON}."}), 400
+    freq = request.args.get('freq', 'D').upper()
+    if freq not in services.FORECAST_FREQUENCIES:
+        return jsonify({"error": f"'freq' must be one of: {', '.join(services.FORECAST_FREQUENCIES)}."}), 400
+    include_uncertainty = request.args.get('uncertainty', 'true').lower() not in ('false', '0', 'no')
+
+    version = services.on_demand_version(model_name)
+    if version is None:
+        return jsonify({"error": f"No fitted model stored for '{model_name}'. Retrain it to enable on-demand forecasts."}), 404
+    etag, body = _serialize_on_demand_forecast(model_name, version, horizon, freq, include_uncertainty)
+    return _json_response_with_etag(etag, body)
+
+@lru_cache(maxsize=FORECAST_RESULT_CACHE_SIZE)
+def _serialize_series_forecast(model_name, series_key, signature):
+    """Keyed on the bucket file's signature, so a refit of the bucket is picked up."""
+    df = series.read_series_forecast(model_name, series_key)
+    df = response_formats.json_ready(df, FORECAST_DATE_COLUMNS, response_formats.DATE_FORMAT)
+    body = df.drop(columns=['series']).to_json(orient="records").encode("utf-8")
+    return hashlib.sha1(body).hexdigest(), body
+
+@lru_cache(maxsize=FORECAST_RESULT_CACHE_SIZE)
+def _serialize_reconciled_forecast(model_name, level, node, signature):
+    """Keyed on the reconciled forecast file's signature, so a new reconciliation is picked up."""
+    df = hierarchy.read_reconciled_forecast(model_name, level, node)
+    df = response_formats.json_ready(df, FORECAST_DATE_COLUMNS, response_formats.DATE_FORMAT)
+    body = df.drop(columns=['level', 'node']).to_json(orient="records").encode("utf-8")
+    return hashlib.sha1(body).hexdigest(), body
+
+def _reconciled_forecast_response(model_name):
+    """Handles /forecast/<model_name>?level=<level>[&node=<value>] for series models with a "hierarchy"."""
+    if not hierarchy.has_hierarchy(model_name):
+        return jsonify({"error": f"'{model_name}' has no hierarchy configured."}), 400
+    level, node = request.args['level'], request.args.get('node')
+    levels = hierarchy.hierarchy_levels(model_name)
+    if level not in levels:
+        return jsonify({"error": f"Unknown level '{level}'. Expected one of: {', '.join(levels)}."}), 400
+    if level != hierarchy.TOTAL and not node:
+        return jsonify({"error": f"Pass &node=<{level}> with ?level={level}."}), 400
+    if level == hierarchy.TOTAL:
+        node = hierarchy.TOTAL
+    signature = hierarchy.reconciled_forecast_signature(model_name)
+    etag, body = _serialize_reconciled_forecast(model_name, level, node, signature)
+    return _json_response_with_etag(etag, body)
+
+def _series_forecast_response(model_name):
+    """Handles /forecast/<model_name>?series=<key> for multi-series models."""
+    if 'level' in request.args:
+        return _reconciled_forecast_response(model_name)
+    series_key = request.args.get('series')
+    if not series_key:
+        return jsonify({"error": f"'{model_name}' is a multi-series model; pass ?series=<key>."}), 400
+    if any(param in request.args for param in ('horizon', 'freq', 'uncertainty')):
+        return jsonify({"error": "On-demand horizons are not available for multi-series models."}), 400
+    signature = series.forecast_signature(model_name, series_key)
+    if any(param in request.args for param in TABLE_QUERY_PARAMS):
+        query, error = _parse_table_query(storage.FORECAST_COLUMNS)
+        if error:
+            return jsonify({"error": error}), 400
+        read = lambda since, until, columns: storage.select_rows(
+            series.read_series_forecast(model_name, series_key).drop(columns=['series']), since, until, columns)
+        return _streamed_table_response(signature, read, query, FORECAST_DATE_COLUMNS, response_formats.DATE_FORMAT)
+    etag, body = _serialize_series_forecast(model_name, series_key, signature)
+    return _json_response_with_etag(etag, body)
+
+def _series_historical_data_response(model_name):
+    series_key = request.args.get('series')
+    if not series_key:
+        return jsonify({"error": f"'{model_name}' is a multi-series model; pass ?series=<key>."}), 400
+    if any(param in request.args for param in TABLE_QUERY_PARAMS):
+        query, error = _parse_table_query(SERIES_HISTORY_COLUMNS)
+        if error:
+            return jsonify({"error": error}), 400
+        read = lambda since, until, columns: storage.select_rows(
+            series.read_series_history(model_name, series_key).drop(columns=['series']), since, until, columns)
+        return _streamed_table_response(series.history_signature(model_name, series_key), read, query,
+                                        HISTORY_DATE_COLUMNS, response_formats.TIMESTAMP_FORMAT)
+    df = series.read_series_history(model_name, series_key)
+    df = response_formats.json_ready(df, HISTORY_DATE_COLUMNS, response_formats.TIMESTAMP_FORMAT)
+    body = df.drop(columns=['series']).to_json(orient="records").encode("utf-8")
+    return _json_response_with_etag(hashlib.sha1(body).hexdigest(), body)
+
+def warm_response_caches(model_names=None):
+    """
+    Builds the cached forecast and history bodies of every model (default: all configured
+    single-series models) that has saved files. Used by wsgi.py before workers are forked.
+    Returns the number of bodies built.
+    """
+    built = 0
+    for model_name in model_names or POCKETBASE_COLLECTION_CONFIG:
+        if series.is_series_model(model_name):
+            continue
+        for endpoint, filepath, serialize in (
+                (response_cache.FORECAST, services.get_forecast_filepath(model_name), _serialize_forecast),
+                (response_cache.HISTORICAL_DATA, services.get_data_filepath(model_name), _serialize_historical_data)):
+            try:
+                response_cache.get_or_build(endpoint, model_name, filepath, lambda: serialize(model_name))
+                built += 1
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Warning: Could not pre-build the /{endpoint} response for '{model_name}': {e}")
+    return built
+
+def _force_requested(json_data=None):
+    """True for `?force=true` (or `"force": true` in a JSON object body): refit even if the history is unchanged."""
+    if request.args.get('force', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return isinstance(json_data, dict) and json_data.get('force') is True
+
+def _job_accepted_response(job_id, message, **extra):
+    status_url = url_for('get_job_route', job_id=job_id)
+    response = jsonify({"message": message, "job_id": job_id, "status_url": status_url, **extra})
+    response.status_code = 202
+    response.headers['Location'] = status_url
+    return response
+
 @app.route('/forecast/<model_name>')
 def get_forecast_route(model_name):
     forecast_filepath = services.get_forecast_filepath(model_name)
     try:
-        df = pd.read_csv(forecast_filepath) 
-        # Ensure 'ds' is string for JSON, Prophet output is usually fine
-        df['ds'] = pd.to_datetime(df['ds']).dt.strftime('%Y-%m-%d')
-        return df.to_json(orient="records")
+        if series.is_series_model(model_name):
+            return _series_forecast_response(model_name)
+        if any(param in request.args for param in ('horizon', 'freq', 'uncertainty')):
+            if any(param in request.args for param in TABLE_QUERY_PARAMS):
+                return jsonify({"error": "'format', 'since', 'until' and 'columns' are not available with on-demand horizons."}), 400
+            return _on_demand_forecast_response(model_name)
+        if any(param in request.args for param in TABLE_QUERY_PARAMS):
+            read = lambda since, until, columns: storage.get_backend().read_forecast(
+                model_name, since=since, until=until, columns=columns)
+            return _table_query_response(forecast_filepath, storage.FORECAST_COLUMNS, read,
+                                         FORECAST_DATE_COLUMNS, response_formats.DATE_FORMAT)
+        return _cached_json_response(response_cache.FORECAST, model_name, forecast_filepath, _serialize_forecast)
     except FileNotFoundError:
         return jsonify({"error": f"Forecast for model '{model_name}' not found."}), 404
     except Exception as e:
@@ -28,12 +317,14 @@ def get_forecast_route(model_name):
 def get_historical_data_route(model_name):
     data_filepath = services.get_data_filepath(model_name)
     try:
-        df = pd.read_csv(data_filepath)
-        # Ensure date columns are strings for JSON
-        for col in ['ds', 'created_at', 'updated_at']:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col]).dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ') # ISO format
-        return df.to_json(orient="records")
+        if series.is_series_model(model_name):
+            return _series_historical_data_response(model_name)
+        if any(param in request.args for param in TABLE_QUERY_PARAMS):
+            read = lambda since, until, columns: storage.get_backend().read_history(
+                model_name, since=since, until=until, columns=columns)
+            return _table_query_response(data_filepath, storage.HISTORY_COLUMNS, read,
+                                         HISTORY_DATE_COLUMNS, response_formats.TIMESTAMP_FORMAT)
+        return _cached_json_response(response_cache.HISTORICAL_DATA, model_name, data_filepath, _serialize_historical_data)
     except FileNotFoundError:
         return jsonify({"error": f"Historical data for model '{model_name}' not found."}), 404
     except Exception as e:
@@ -43,17 +334,61 @@ def get_historical_data_route(model_name):
 def manual_update_forecast_route(model_name):
     if model_name not in POCKETBASE_COLLECTION_CONFIG: # Basic validation
         return jsonify({"error": f"Model '{model_name}' is not a configured model."}), 404
-        
+
+    bulk_format = request.args.get('format') or bulk_ingest.format_for(request.mimetype)
+    if bulk_format is not None:
+        if bulk_format not in bulk_ingest.FORMATS:
+            return jsonify({"error": f"Unknown format '{bulk_format}'. Expected one of: {', '.join(bulk_ingest.FORMATS)}."}), 400
+        return _bulk_update_response(model_name, bulk_format)
+
     new_data_list = request.get_json()
     if not isinstance(new_data_list, list):
         return jsonify({"error": "JSON payload must be a list of data points."}), 400
+
+    force = _force_requested()
+    if series.is_series_model(model_name):
+        success, message, touched_buckets = services.append_manual_series_data(model_name, new_data_list)
+        if not success:
+            return jsonify({"error": message}), 500
+        if touched_buckets is None:
+            return jsonify({"message": message}), 200
+        # Unchanged buckets are skipped by the batch fit itself.
+        job_id = jobs.submit(("retrain", model_name, force), services.retrain_series_model, model_name, force, in_thread=True)
+        return _job_accepted_response(job_id, message)
     
-    success, message = services.update_forecast_manually(model_name, new_data_list)
-    
-    if success:
+    success, message, processed_historical_df = services.append_manual_data(model_name, new_data_list)
+    if not success:
+        return jsonify({"error": message}), 500
+    if processed_historical_df is None:
         return jsonify({"message": message}), 200
+
+    if not force and services.forecast_is_current(model_name, processed_historical_df):
+        # Duplicate points (client retries, re-sent batches): the saved forecast already covers them.
+        telemetry.count("fits_skipped", model=model_name)
+        return jsonify({"message": f"{message} History unchanged since the last fit; retrain skipped.", "retrain_skipped": True}), 200
+
+    # The merge is done; the Prophet fit runs in the background (and is shared by a burst of updates).
+    job_id = jobs.submit(("retrain", model_name, force), services.retrain_from_saved_history, model_name, force)
+    return _job_accepted_response(job_id, message)
+
+def _bulk_update_response(model_name, bulk_format):
+    """An NDJSON or CSV /update_forecast body: streamed into the history in one merge, then one retrain job."""
+    force = _force_requested()
+    success, message, stats, merged = services.append_bulk_data(model_name, request.stream, bulk_format)
+    if not success:
+        return jsonify({"error": message, "ingest": stats}), 400
+    if merged is None:
+        return jsonify({"message": message, "ingest": stats}), 200
+
+    if series.is_series_model(model_name):
+        job_id = jobs.submit(("retrain", model_name, force), services.retrain_series_model, model_name, force, in_thread=True)
+    elif not force and services.forecast_is_current(model_name, merged):
+        telemetry.count("fits_skipped", model=model_name)
+        return jsonify({"message": f"{message} History unchanged since the last fit; retrain skipped.",
+                        "retrain_skipped": True, "ingest": stats}), 200
     else:
-        return jsonify({"error": message}), 500
+        job_id = jobs.submit(("retrain", model_name, force), services.retrain_from_saved_history, model_name, force)
+    return _job_accepted_response(job_id, message, ingest=stats)
 
 @app.route('/trigger_monthly_update/<string:model_name>', methods=['POST'])
 def trigger_monthly_update_route(model_name):
@@ -71,14 +406,117 @@ def trigger_monthly_update_route(model_name):
     except ValueError:
         return jsonify({"error": "Invalid year or month provided."}), 400
 
-    success, message = services.update_and_retrain_model_from_db(model_name, fetch_target_month_date)
+    force = _force_requested(json_data)
+    job_id = jobs.submit(
+        ("db_update", model_name, fetch_target_month_date.isoformat(), force),
+        services.update_and_retrain_model_from_db, model_name, fetch_target_month_date, force,
+        in_thread=series.is_series_model(model_name), # Series models fan their buckets out to the worker pool
+    )
+    return _job_accepted_response(job_id, f"Update of '{model_name}' from PocketBase for {fetch_target_month_date.strftime('%Y-%m')} queued.")
 
-    if success:
-        return jsonify({"message": message}), 200
-    else:
-        return jsonify({"error": message}), 500
+@app.route('/backfill/<string:model_name>', methods=['POST'])
+def backfill_route(model_name):
+    if model_name not in POCKETBASE_COLLECTION_CONFIG:
+        return jsonify({"error": f"Model '{model_name}' not configured for PocketBase."}), 404
+
+    json_data = request.get_json(silent=True)
+    if not json_data or 'start' not in json_data or 'end' not in json_data:
+        return jsonify({"error": "Please provide 'start' and 'end' months (YYYY-MM) for the backfill."}), 400
+
+    try:
+        start_month = datetime.strptime(str(json_data['start'])[:7], '%Y-%m').date()
+        end_month = datetime.strptime(str(json_data['end'])[:7], '%Y-%m').date()
+    except ValueError:
+        return jsonify({"error": "Invalid 'start' or 'end' month; expected YYYY-MM."}), 400
+    month_count = (end_month.year - start_month.year) * 12 + end_month.month - start_month.month + 1
+    if month_count < 1:
+        return jsonify({"error": "'start' must not be after 'end'."}), 400
+    if month_count > MAX_BACKFILL_MONTHS:
+        return jsonify({"error": f"Backfill ranges are limited to {MAX_BACKFILL_MONTHS} months."}), 400
+
+    force = _force_requested(json_data)
+    job_id = jobs.submit(
+        ("backfill", model_name, start_month.isoformat(), end_month.isoformat(), force),
+        services.backfill_model_from_db, model_name, start_month, end_month, force,
+        in_thread=series.is_series_model(model_name),
+    )
+    return _job_accepted_response(job_id, f"Backfill of '{model_name}' for {month_count} month(s) queued.")
+
+@app.route('/trigger_update_all', methods=['POST'])
+def trigger_update_all_route():
+    json_data = request.get_json(silent=True)
+    if not json_data or 'year' not in json_data or 'month' not in json_data:
+        return jsonify({"error": "Please provide 'year' and 'month' (1-12) for the data to fetch."}), 400
+
+    try:
+        year = int(json_data['year'])
+        month = int(json_data['month'])
+        fetch_target_month_date = datetime(year, month, 1).date()
+    except ValueError:
+        return jsonify({"error": "Invalid year or month provided."}), 400
+
+    # Fetching runs on a coordinator thread over the shared PocketBase client; the fits go to the worker pool.
+    force = _force_requested(json_data)
+    job_id = jobs.submit(
+        ("update_all", None, fetch_target_month_date.isoformat(), force),
+        services.update_all_models_from_db, fetch_target_month_date, None, None, force,
+        in_thread=True,
+    )
+    return _job_accepted_response(job_id, f"Update of all {len(POCKETBASE_COLLECTION_CONFIG)} model(s) from PocketBase for {fetch_target_month_date.strftime('%Y-%m')} queued.")
+
+@app.route('/metrics/<model_name>')
+def get_metrics_route(model_name):
+    """
+    Rolling-origin backtest metrics (see backtest.py). Served from the fold cache when every fold
+    is cached; otherwise a backtest job is queued and its report is in the job's result details.
+    """
+    try:
+        horizon = int(request.args.get('horizon', BACKTEST_HORIZON_DAYS))
+        cutoffs = int(request.args.get('cutoffs', BACKTEST_CUTOFFS))
+    except ValueError:
+        return jsonify({"error": "'horizon' and 'cutoffs' must be integers."}), 400
+    if not 1 <= horizon <= MAX_FORECAST_HORIZON:
+        return jsonify({"error": f"'horizon' must be between 1 and {MAX_FORECAST_HORIZON}."}), 400
+    if not 1 <= cutoffs <= MAX_BACKTEST_CUTOFFS:
+        return jsonify({"error": f"'cutoffs' must be between 1 and {MAX_BACKTEST_CUTOFFS}."}), 400
+    forecaster_name = backtest.resolve_forecaster(model_name, request.args.get('forecaster'))
+    if forecaster_name not in forecasters.FORECASTER_NAMES:
+        return jsonify({"error": f"'forecaster' must be one of: {', '.join(forecasters.FORECASTER_NAMES)}."}), 400
+    series_key = request.args.get('series')
+    if series.is_series_model(model_name) and not series_key:
+        return jsonify({"error": f"'{model_name}' is a multi-series model; pass ?series=<key>."}), 400
+
+    try:
+        report = backtest.cached_backtest(model_name, horizon, cutoffs, forecaster_name, series_key)
+    except FileNotFoundError:
+        return jsonify({"error": f"Historical data for model '{model_name}' not found."}), 404
+    except Exception as e:
+        return jsonify({"error": f"Error reading backtest results for '{model_name}': {str(e)}"}), 500
+    if report is not None:
+        return jsonify(report)
+
+    # Folds are fitted on the worker pool; the job itself only plans them and merges the results.
+    job_id = jobs.submit(
+        ("backtest", model_name, horizon, cutoffs, forecaster_name, series_key),
+        backtest.run_backtest, model_name, horizon, cutoffs, forecaster_name, series_key,
+        in_thread=True,
+    )
+    return _job_accepted_response(job_id, f"Backtest of '{model_name}' ({cutoffs} cutoff(s), {horizon}-day horizon) queued; the metrics are in the job result and at this URL once it finishes.")
+
+@app.route('/metrics')
+def get_service_metrics_route():
+    """Spans and counters of every API and worker process (see telemetry.py), in the Prometheus text format."""
+    return Response(telemetry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/jobs/<job_id>')
+def get_job_route(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job)
 
 if __name__ == "__main__":
+    # Development server. In production run: gunicorn -c gunicorn.conf.py wsgi:app
     # Ensure DATA_DIR exists (config.py already does this, but good for direct run)
     os.makedirs(services.DATA_DIR, exist_ok=True) 
     app.run(debug=True)
@@ -0,0 +1,315 @@
+"""
+Rolling-origin backtests: how accurate a model's forecaster has been on its own history.
+
+Cutoffs fall every BACKTEST_PERIOD_DAYS days on a fixed calendar grid, the latest one at least
+`horizon` days before the end of the history. Each cutoff is a fold: the forecaster is fitted
+on the BACKTEST_TRAIN_DAYS days up to the cutoff and scored on the `horizon` days after it
+(MAE, RMSE, MAPE and the share of actuals inside the forecast interval).
+
+Folds run in parallel on a process pool, and each result is cached as
+DATA_DIR/backtests/<model>/<key>.json, where the key hashes exactly the rows and settings the
+fold used. Since both the grid and the training window are fixed, a fold's key survives the
+history rolling forward; a re-run only fits the new cutoffs (and any fold whose data changed).
+
+    python backtest.py sales --horizon 30 --cutoffs 5 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import forecasters
+import jobs
+import series
+import storage
+from config import (
+    BACKTEST_CACHE_MAX_AGE_DAYS,
+    BACKTEST_CUTOFFS,
+    BACKTEST_HORIZON_DAYS,
+    BACKTEST_PERIOD_DAYS,
+    BACKTEST_TRAIN_DAYS,
+    DATA_DIR,
+    PROPHET_MIN_IMPROVEMENT,
+    RETRAIN_WORKERS,
+)
+
+_EPOCH = pd.Timestamp("1970-01-01")
+
+
+def get_cache_dir(model_name):
+    return os.path.join(DATA_DIR, "backtests", model_name)
+
+
+def load_history(model_name, series_key=None):
+    """The model's (or one series') saved ds/y history, sorted. Raises FileNotFoundError if missing."""
+    if series_key is not None:
+        df = series.read_series_history(model_name, series_key)
+    else:
+        df = storage.get_backend().read_history(model_name)
+    df = df[['ds', 'y']].copy()
+    df['ds'] = pd.to_datetime(df['ds'])
+    df['y'] = pd.to_numeric(df['y'], errors='coerce')
+    return df.dropna().sort_values('ds', kind='stable').reset_index(drop=True)
+
+
+def plan_folds(history, forecaster_name, horizon, cutoffs):
+    """
+    The latest `cutoffs` cutoffs of the grid that fit in the history, oldest first, as
+    (cutoff, train_df, test_df). Cutoffs whose training window is too short for the forecaster are left out.
+    """
+    if history.empty:
+        return []
+    last_possible = history['ds'].iloc[-1].floor('D') - pd.Timedelta(days=horizon)
+    latest = last_possible - pd.Timedelta(days=(last_possible - _EPOCH).days % BACKTEST_PERIOD_DAYS)
+    folds = []
+    for k in reversed(range(cutoffs)):
+        cutoff = latest - pd.Timedelta(days=k * BACKTEST_PERIOD_DAYS)
+        ds = history['ds']
+        train_df = history[(ds > cutoff - pd.Timedelta(days=BACKTEST_TRAIN_DAYS)) & (ds <= cutoff)]
+        test_df = history[(ds > cutoff) & (ds <= cutoff + pd.Timedelta(days=horizon))]
+        if len(train_df) >= forecasters.MIN_POINTS[forecaster_name] and not test_df.empty:
+            folds.append((cutoff, train_df, test_df))
+    return folds
+
+
+def fold_key(model_name, series_key, forecaster_name, horizon, train_df, test_df):
+    """Hash of everything a fold's result depends on."""
+    settings = {
+        "model": model_name,
+        "series": series_key,
+        "collection": forecasters.fitted_config(model_name),
+        "forecaster": forecaster_name,
+        "horizon_days": horizon,
+        "train_days": BACKTEST_TRAIN_DAYS,
+        "prophet_min_improvement": PROPHET_MIN_IMPROVEMENT,
+        "prophet": forecasters.prophet_version(),
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    for df in (train_df, test_df):
+        digest.update(df['ds'].to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+        digest.update(df['y'].to_numpy(dtype=np.float64).tobytes())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+def evaluate_fold(forecaster_name, train_df, test_df, horizon):
+    """
+    Fits the forecaster on train_df and predicts test_df's dates. Runs in a pool worker.
+    "auto" runs the same selection a retrain would. Returns the fold result (JSON-ready).
+    """
+    started = time.perf_counter()
+    if forecaster_name == "auto":
+        forecaster_name = forecasters.select_forecaster("auto", train_df, horizon)["forecaster"]
+    if forecaster_name == "prophet":
+        import logging
+        from prophet import Prophet
+        logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+        model = Prophet()
+        model.fit(train_df[['ds', 'y']])
+        forecast = model.predict(test_df[['ds']])
+    else:
+        days_ahead = (test_df['ds'].iloc[-1].floor('D') - train_df['ds'].iloc[-1].floor('D')).days
+        forecast = forecasters.baseline_forecast(forecaster_name, train_df, days_ahead)
+    scored = test_df[['ds', 'y']].merge(forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']], on='ds', how='inner')
+    return {
+        "forecaster": forecaster_name,
+        "ds": scored['ds'].dt.strftime('%Y-%m-%d').tolist(),
+        "y": scored['y'].tolist(),
+        "yhat": scored['yhat'].tolist(),
+        "yhat_lower": scored['yhat_lower'].tolist(),
+        "yhat_upper": scored['yhat_upper'].tolist(),
+        "seconds": round(time.perf_counter() - started, 4),
+    }
+
+
+def compute_metrics(y, yhat, yhat_lower, yhat_upper):
+    """MAE, RMSE, MAPE (percent, over non-zero actuals) and interval coverage; None where undefined."""
+    y, yhat = np.asarray(y, dtype=np.float64), np.asarray(yhat, dtype=np.float64)
+    if len(y) == 0:
+        return {"points": 0, "mae": None, "rmse": None, "mape": None, "coverage": None}
+    errors = yhat - y
+    nonzero = y != 0
+    inside = (y >= np.asarray(yhat_lower)) & (y <= np.asarray(yhat_upper))
+    return {
+        "points": int(len(y)),
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(np.sqrt(np.mean(np.square(errors)))),
+        "mape": float(np.mean(np.abs(errors[nonzero] / y[nonzero])) * 100) if nonzero.any() else None,
+        "coverage": float(np.mean(inside)),
+    }
+
+
+def _read_cached_fold(path):
+    try:
+        with open(path, "r") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)  # Marks the fold as used, see _prune_cache
+    return result
+
+
+def _write_cached_fold(path, result):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with storage.atomic_path(path) as tmp_path, open(tmp_path, "w") as f:
+        json.dump(result, f)
+
+
+def _prune_cache(model_name):
+    cutoff = time.time() - BACKTEST_CACHE_MAX_AGE_DAYS * 86400
+    cache_dir = get_cache_dir(model_name)
+    for filename in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        path = os.path.join(cache_dir, filename)
+        try:
+            if filename.endswith(".json") and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass  # Already pruned by a concurrent run
+
+
+def _plan(model_name, horizon, cutoffs, forecaster_name, series_key):
+    """Folds of a backtest with their cache paths: [(cutoff, train_df, test_df, path)]."""
+    history = load_history(model_name, series_key)
+    cache_dir = get_cache_dir(model_name)
+    return [(cutoff, train_df, test_df,
+             os.path.join(cache_dir, fold_key(model_name, series_key, forecaster_name, horizon, train_df, test_df) + ".json"))
+            for cutoff, train_df, test_df in plan_folds(history, forecaster_name, horizon, cutoffs)]
+
+
+def _report(model_name, series_key, forecaster_name, horizon, results, computed, seconds):
+    folds, scored = [], {"y": [], "yhat": [], "yhat_lower": [], "yhat_upper": []}
+    for cutoff, result, cached in results:
+        fold = {"cutoff": cutoff.strftime('%Y-%m-%d'), "forecaster": result["forecaster"],
+                "seconds": result["seconds"], "cached": cached}
+        fold.update(compute_metrics(result["y"], result["yhat"], result["yhat_lower"], result["yhat_upper"]))
+        folds.append(fold)
+        for column in scored:
+            scored[column].extend(result[column])
+    fold_seconds = [fold["seconds"] for fold in folds]
+    return {
+        "model": model_name,
+        "series": series_key,
+        "forecaster": forecaster_name,
+        "horizon_days": horizon,
+        "train_days": BACKTEST_TRAIN_DAYS,
+        "period_days": BACKTEST_PERIOD_DAYS,
+        "metrics": compute_metrics(scored["y"], scored["yhat"], scored["yhat_lower"], scored["yhat_upper"]),
+        "folds": folds,
+        "folds_computed": computed,
+        "folds_cached": len(folds) - computed,
+        # Fit+predict time of a fold (cached folds report the run that computed them), for budgeting
+        "seconds_per_fold": round(sum(fold_seconds) / len(fold_seconds), 4) if fold_seconds else None,
+        "seconds": round(seconds, 3),
+    }
+
+
+def resolve_forecaster(model_name, forecaster_name=None):
+    """The forecaster a backtest evaluates: the given one, else what the model's retrains use."""
+    return forecaster_name or forecasters.configured_forecaster(model_name)
+
+
+def cached_backtest(model_name, horizon=BACKTEST_HORIZON_DAYS, cutoffs=BACKTEST_CUTOFFS, forecaster_name=None, series_key=None):
+    """The backtest report if every fold is already cached, else None. Raises FileNotFoundError without history."""
+    started = time.perf_counter()
+    forecaster_name = resolve_forecaster(model_name, forecaster_name)
+    results = []
+    for cutoff, _, _, path in _plan(model_name, horizon, cutoffs, forecaster_name, series_key):
+        result = _read_cached_fold(path)
+        if result is None:
+            return None
+        results.append((cutoff, result, True))
+    if not results:
+        return None
+    return _report(model_name, series_key, forecaster_name, horizon, results, 0, time.perf_counter() - started)
+
+
+def run_backtest(model_name, horizon=BACKTEST_HORIZON_DAYS, cutoffs=BACKTEST_CUTOFFS, forecaster_name=None,
+                 series_key=None, executor=None):
+    """
+    Backtests a model (or one series of a series model), fitting the folds that are not cached on
+    executor (the job worker pool by default). Returns (success, message, report).
+    """
+    started = time.perf_counter()
+    forecaster_name = resolve_forecaster(model_name, forecaster_name)
+    if forecaster_name not in forecasters.FORECASTER_NAMES:
+        return False, f"Unknown forecaster '{forecaster_name}'. Expected one of: {', '.join(forecasters.FORECASTER_NAMES)}.", {}
+    label = f"'{model_name}'" + (f" series '{series_key}'" if series_key is not None else "")
+    try:
+        planned = _plan(model_name, horizon, cutoffs, forecaster_name, series_key)
+    except FileNotFoundError:
+        return False, f"Historical data for {label} not found.", {}
+    if not planned:
+        return False, f"History of {label} is too short for a {horizon}-day backtest with {forecaster_name}.", {}
+
+    results, missing = {}, []
+    for cutoff, train_df, test_df, path in planned:
+        result = _read_cached_fold(path)
+        if result is None:
+            missing.append((cutoff, train_df, test_df, path))
+        else:
+            results[cutoff] = (result, True)
+    jobs.report_progress(stage="backtesting", folds_total=len(planned), folds_done=len(results))
+
+    if missing:
+        if executor is None:
+            executor = jobs.get_worker_pool()
+        futures = {executor.submit(evaluate_fold, forecaster_name, train_df, test_df, horizon): (cutoff, path)
+                   for cutoff, train_df, test_df, path in missing}
+        failures = []
+        for future in as_completed(futures):
+            cutoff, path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failures.append(f"{cutoff.strftime('%Y-%m-%d')}: {e}")
+                continue
+            _write_cached_fold(path, result)
+            results[cutoff] = (result, False)
+            jobs.report_progress(folds_done=len(results))
+        if failures:
+            return False, f"Backtest of {label}: {len(failures)} fold(s) failed ({'; '.join(failures)}).", {}
+    _prune_cache(model_name)
+
+    report = _report(model_name, series_key, forecaster_name, horizon,
+                     [(cutoff, *results[cutoff]) for cutoff, _, _, _ in planned], len(missing), time.perf_counter() - started)
+    metrics = report["metrics"]
+    mape = "n/a" if metrics["mape"] is None else f"{metrics['mape']:.1f}%"
+    message = (f"Backtest of {label} with {forecaster_name}: {len(planned)} fold(s) of {horizon} days "
+               f"({len(missing)} fitted, {len(planned) - len(missing)} cached), MAE {metrics['mae']:.3f}, "
+               f"RMSE {metrics['rmse']:.3f}, MAPE {mape}, coverage {metrics['coverage']:.0%}.")
+    return True, message, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of a model's forecaster.")
+    parser.add_argument("model_name")
+    parser.add_argument("--horizon", type=int, default=BACKTEST_HORIZON_DAYS, help="Days scored after each cutoff.")
+    parser.add_argument("--cutoffs", type=int, default=BACKTEST_CUTOFFS)
+    parser.add_argument("--forecaster", choices=forecasters.FORECASTER_NAMES,
+                        help="Forecaster to evaluate (default: the model's configured one).")
+    parser.add_argument("--series", help="Series key, for multi-series models.")
+    parser.add_argument("--workers", type=int, default=RETRAIN_WORKERS)
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        success, message, report = run_backtest(args.model_name, args.horizon, args.cutoffs, args.forecaster,
+                                                args.series, pool)
+    if not success:
+        print(f"Error: {message}")
+        sys.exit(1)
+
+    def _fmt(value, spec):
+        return "-" if value is None else format(value, spec)
+
+    print(f"{'cutoff':<12}{'forecaster':<16}{'points':>7}{'MAE':>10}{'RMSE':>10}{'MAPE':>8}{'cover':>7}{'seconds':>9}")
+    for fold in report["folds"]:
+        print(f"{fold['cutoff']:<12}{fold['forecaster']:<16}{fold['points']:>7}{_fmt(fold['mae'], '.3f'):>10}"
+              f"{_fmt(fold['rmse'], '.3f'):>10}{_fmt(fold['mape'], '.1f'):>8}{_fmt(fold['coverage'], '.0%'):>7}"
+              f"{fold['seconds']:>8.2f}s{' (cached)' if fold['cached'] else ''}")
+    print(f"Success: {message} {report['seconds_per_fold']:.2f}s per fold, {report['seconds']:.1f}s total.")
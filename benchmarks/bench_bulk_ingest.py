@@ -0,0 +1,152 @@
+"""
+Bulk upload throughput: the JSON list body of /update_forecast against NDJSON and CSV bodies
+(bulk_ingest.py), in rows per second.
+
+Per size, --model's synthetic hourly series (generate_data.synthetic_series) is encoded three ways,
+with --bad-fraction of the rows broken (unparseable 'ds', non-numeric 'y' or a malformed line), then:
+
+    parse   body bytes -> typed ds/y DataFrame (json.loads + pd.DataFrame for the JSON list)
+    ingest  parse plus the merge into an empty saved history (services.append_manual_data /
+            services.append_bulk_data), per storage backend
+
+Checks that the bulk paths accept the same rows as the JSON list path and count every broken row
+as rejected; exits non-zero otherwise. The history window is lifted so every size is kept whole.
+Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_bulk_ingest.py [--sizes 100000 1000000] [--repeats 3] [--bad-fraction 0.001]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def encode(data, bad_fraction, seed=0):
+    """(JSON list, NDJSON, CSV) bodies for data, and the number of rows broken in each."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    ds = data['ds'].dt.strftime('%Y-%m-%dT%H:%M:%S').tolist()
+    y = [str(value) for value in data['y'].tolist()]
+    bad = rng.choice(len(ds), size=int(len(ds) * bad_fraction), replace=False)
+    malformed = set()
+    for i, row in enumerate(bad):
+        if i % 3 == 0:
+            ds[row] = "not a date"
+        elif i % 3 == 1:
+            y[row] = '"n/a"'
+        else:
+            malformed.add(int(row))
+    lines = [f'{{"ds":"{d}","y":{v}}}' if i not in malformed else '{"ds":' for i, (d, v) in enumerate(zip(ds, y))]
+    ndjson = ("\n".join(lines) + "\n").encode()
+    json_list = json.dumps([{"ds": d, "y": v if i not in malformed else None} for i, (d, v) in
+                            enumerate(zip(ds, (json.loads(v) for v in y)))]).encode()
+    rows = [f"{d},{v.strip(chr(34))}" if i not in malformed else f"{d},{v},extra" for i, (d, v) in enumerate(zip(ds, y))]
+    csv_body = ("ds,y\n" + "\n".join(rows) + "\n").encode()
+    return json_list, ndjson, csv_body, len(bad)
+
+
+def _timings(fn, repeats, setup=None):
+    timings, result = [], None
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return timings, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--bad-fraction", type=float, default=0.001)
+    parser.add_argument("--backend", nargs="+", default=["csv", "parquet"], choices=["csv", "parquet"])
+    parser.add_argument("--model", default="sales", help="Model whose config and data pattern are used.")
+    args = parser.parse_args()
+
+    # DATA_DIR is relative, so histories and lock files land in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_bulk_ingest_")
+    os.chdir(tmp_dir)
+    problems = []
+    try:
+        import pandas as pd
+        import bulk_ingest
+        import config
+        import services
+        import storage
+        from generate_data import synthetic_series
+
+        model = args.model
+        model_config = config.POCKETBASE_COLLECTION_CONFIG[model]
+        for key in ("window_days", "window_rows"):
+            model_config.pop(key, None)
+        model_config["window_days"] = None
+
+        def parse_json_list(body):
+            df = pd.DataFrame(json.loads(body))
+            df['ds'] = pd.to_datetime(df['ds'], errors='coerce')
+            df['y'] = pd.to_numeric(df['y'], errors='coerce')
+            return df.dropna(subset=['ds', 'y'])
+
+        def remove_history():
+            path = storage.get_backend().data_path(model)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+        print(f"{'rows':>9}  {'case':<28}{'MB':>8}{'seconds':>10}{'rows/s':>13}{'speedup':>9}")
+        for rows in args.sizes:
+            data = synthetic_series(model, rows, freq='h', end="2025-06-30")
+            json_list, ndjson, csv_body, broken = encode(data, args.bad_fraction)
+            bodies = {"json list": json_list, bulk_ingest.NDJSON: ndjson, bulk_ingest.CSV: csv_body}
+            parsers = {"json list": parse_json_list,
+                       bulk_ingest.NDJSON: lambda body: bulk_ingest.read_points(io.BytesIO(body), bulk_ingest.NDJSON),
+                       bulk_ingest.CSV: lambda body: bulk_ingest.read_points(io.BytesIO(body), bulk_ingest.CSV)}
+            ingesters = {"json list": lambda: services.append_manual_data(model, json.loads(json_list)),
+                         bulk_ingest.NDJSON: lambda: services.append_bulk_data(model, io.BytesIO(ndjson), bulk_ingest.NDJSON),
+                         bulk_ingest.CSV: lambda: services.append_bulk_data(model, io.BytesIO(csv_body), bulk_ingest.CSV)}
+
+            cases = [("parse", name, lambda name=name: parsers[name](bodies[name]), None) for name in bodies]
+            for backend_name in args.backend:
+                cases += [(f"ingest [{backend_name}]", name, ingesters[name], backend_name) for name in bodies]
+            reference = {}
+            for stage, name, fn, backend_name in cases:
+                if backend_name is not None:
+                    storage.STORAGE_BACKEND, storage._backend = backend_name, None
+                    os.makedirs(config.DATA_DIR, exist_ok=True)
+                timings, result = _timings(fn, args.repeats, setup=remove_history if backend_name else None)
+                seconds = statistics.median(timings)
+                speedup = f"{reference[stage] / seconds:>8.1f}x" if stage in reference else ""
+                reference.setdefault(stage, seconds)
+                print(f"{rows:>9}  {f'{stage}: {name}':<28}{len(bodies[name]) / 1e6:>8.1f}{seconds:>10.3f}{rows / seconds:>13,.0f}{speedup}")
+
+                if stage == "parse" and name != "json list":
+                    df, stats = result
+                    expected = rows - broken
+                    if len(df) != expected or stats["rejected"] != broken:
+                        problems.append(f"{rows} rows, {name}: accepted {len(df)} (expected {expected}), rejected {stats['rejected']} (expected {broken})")
+                elif stage == "parse" and len(result) != rows - broken:
+                    problems.append(f"{rows} rows, json list: accepted {len(result)} (expected {rows - broken})")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for problem in problems:
+        print(f"Error: {problem}")
+    if not problems:
+        print("\nSuccess: Every bulk path accepted the same rows as the JSON list path.")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Retrain wall time and holdout error of Prophet vs. the NumPy baselines (see forecasters.py) on
+the series in prophet_data/.
+
+Each series is also cut to its last --short-days points, the kind of short history "auto" is
+meant to take off Prophet. Times are the median of --repeats fit+predict runs for a
+FORECAST_HORIZON_DAYS forecast; MAE is on the holdout the "auto" contest uses, and the pick
+is what "auto" would choose.
+
+Usage: python benchmarks/bench_forecasters.py [--short-days 45] [--repeats 3]
+"""
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+from prophet import Prophet
+
+import forecasters
+from config import FORECAST_HORIZON_DAYS
+
+logging.getLogger("cmdstanpy").disabled = True
+
+
+def _prophet_forecast(df):
+    model = Prophet()
+    model.fit(df[['ds', 'y']])
+    return model.predict(model.make_future_dataframe(periods=FORECAST_HORIZON_DAYS))
+
+
+def _median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def bench_history(label, df, repeats):
+    scores = forecasters.holdout_scores(df, FORECAST_HORIZON_DAYS)
+    pick = forecasters.select_forecaster("auto", df, FORECAST_HORIZON_DAYS)["forecaster"]
+    runs = {"prophet": lambda: _prophet_forecast(df)}
+    for name in forecasters.BASELINES:
+        if len(df) >= forecasters.MIN_POINTS[name]:
+            runs[name] = lambda name=name: forecasters.baseline_forecast(name, df, FORECAST_HORIZON_DAYS)
+    for name, run in runs.items():
+        seconds = _median_seconds(run, repeats)
+        mae = f"{scores[name]:.2f}" if name in scores else "-"
+        print(f"{label:<32}{len(df):>7}  {name:<16}{seconds * 1000:>9.1f}ms{mae:>10}  {'<- auto' if name == pick else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--short-days", type=int, default=45, help="Length of the short-history variant.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per forecaster; the median is reported.")
+    args = parser.parse_args()
+
+    print(f"{'model':<32}{'points':>7}  {'forecaster':<16}{'fit+predict':>11}{'MAE':>10}")
+    for filepath in sorted(glob.glob(os.path.join(REPO_ROOT, "prophet_data", "*_data.csv"))):
+        model_name = os.path.basename(filepath)[:-len("_data.csv")]
+        df = pd.read_csv(filepath, usecols=["ds", "y"], parse_dates=["ds"]).sort_values('ds')
+        bench_history(model_name, df, args.repeats)
+        bench_history(f"{model_name} (last {args.short_days})", df.tail(args.short_days), args.repeats)
+
+
+if __name__ == "__main__":
+    main()
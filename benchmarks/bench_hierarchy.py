@@ -0,0 +1,150 @@
+"""
+Hierarchical reconciliation (hierarchy.py): accuracy per level and cost per method.
+
+A synthetic panel (generate_data.synthetic_panel) of --series series is split into --groups
+categories. The last FORECAST_HORIZON_DAYS days are held out; every series and every aggregate
+(total, categories) gets a --forecaster base forecast, and each method reconciles them. Reports
+the holdout MAE per level, the largest gap between the total and the sum of the series, and the
+time of the reconciliation itself. Then, per --sizes, times reconcile_forecasts() alone and the
+whole stage behind a retrain (hierarchy.reconcile_model(): reading the buckets, aggregate baselines,
+reconciling and writing) for that many series.
+
+Exits non-zero if a reconciled forecast is not coherent. Runs in a temporary directory;
+prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_hierarchy.py [--series 200] [--groups 10] [--periods 365]
+                                            [--sizes 1000 10000] [--forecaster holt_winters]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MODEL = "product_stocks_by_product"
+
+
+def base_forecasts(matrix, grid, horizon, forecaster):
+    """(forecasts, in-sample variances) of `forecaster` for every row of a (series x days) matrix."""
+    import numpy as np
+    import pandas as pd
+    import forecasters
+    forecasts, variances = np.empty((len(matrix), horizon)), np.empty(len(matrix))
+    for i, y in enumerate(matrix):
+        forecast = forecasters.baseline_forecast(forecaster, pd.DataFrame({'ds': grid, 'y': y}), horizon)
+        forecasts[i] = forecast['yhat'].to_numpy()[-horizon:]
+        variances[i] = np.mean(np.square(y - forecast['yhat'].to_numpy()[:len(grid)]))
+    return forecasts, variances
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=200, help="Series in the accuracy comparison.")
+    parser.add_argument("--groups", type=int, default=10, help="Categories between the total and the series.")
+    parser.add_argument("--periods", type=int, default=365, help="Days per series, holdout included.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000], help="Series counts for the timings.")
+    parser.add_argument("--forecaster", default="holt_winters", help="Base forecaster of every node (a NumPy baseline).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # DATA_DIR is relative, so histories, forecasts and lock files land in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_hierarchy_")
+    os.chdir(tmp_dir)
+    problems = []
+    try:
+        import numpy as np
+        import pandas as pd
+        import config
+        import hierarchy
+        import series
+        from generate_data import synthetic_panel
+        from tests.pb_stub import add_example_series_models
+
+        add_example_series_models()  # The multi-series examples commented out in config.py
+        horizon = config.FORECAST_HORIZON_DAYS
+        panel = synthetic_panel(MODEL, args.series, args.periods, end="2025-06-30", seed=args.seed)
+        leaves = sorted(panel['series'].unique())
+        mapping = pd.DataFrame({"category": [f"C{i % args.groups:02d}" for i in range(len(leaves))]}, index=leaves)
+        A, nodes = hierarchy.aggregation_matrix(mapping)
+        Y = panel.pivot(index='series', columns='ds', values='y').reindex(leaves).to_numpy(dtype=np.float64)
+        grid = pd.DatetimeIndex(sorted(panel['ds'].unique()))
+        train, actual = Y[:, :-horizon], Y[:, -horizon:]
+        levels = {"total": slice(0, 1), "category": slice(1, len(nodes)), "series": slice(len(nodes), len(nodes) + len(leaves))}
+
+        base_leaves, leaf_variance = base_forecasts(train, grid[:-horizon], horizon, args.forecaster)
+        base_aggregates, aggregate_variance = base_forecasts(A @ train, grid[:-horizon], horizon, args.forecaster)
+        truth = np.vstack([A @ actual, actual])
+
+        def report(name, forecast, seconds):
+            errors = np.abs(forecast - truth).mean(axis=1)
+            gap = float(np.abs(forecast[0] - forecast[levels["series"]].sum(axis=0)).max())
+            maes = "".join(f"{errors[rows].mean():>12.2f}" for rows in levels.values())
+            print(f"  {name:<12}{maes}{gap:>14.2f}{seconds * 1000:>10.2f}ms")
+            return gap
+
+        print(f"Holdout MAE per node, {len(leaves)} series in {args.groups} categories, {horizon}-day horizon, {args.forecaster} base forecasts")
+        print(f"  {'method':<12}{'total':>12}{'category':>12}{'series':>12}{'total - sum':>14}{'time':>12}")
+        report("base", np.vstack([base_aggregates, base_leaves]), 0.0)
+        for method in hierarchy.METHODS:
+            started = time.perf_counter()
+            aggregates, reconciled = hierarchy.reconcile_forecasts(A, base_aggregates, base_leaves, method,
+                                                                   aggregate_variance, leaf_variance)
+            gap = report(method, np.vstack([aggregates, reconciled]), time.perf_counter() - started)
+            if gap > 1e-6 * max(1.0, float(np.abs(aggregates[0]).max())):
+                problems.append(f"{method}: the total is {gap:.3g} off the sum of the series")
+
+        print(f"\nTimings, {args.groups} categories, {horizon}-day horizon")
+        print(f"  {'series':>8}  {'method':<12}{'reconcile_forecasts':>21}{'reconcile_model':>17}")
+        model_config = config.POCKETBASE_COLLECTION_CONFIG[MODEL]
+        for size in args.sizes:
+            panel = synthetic_panel(MODEL, size, 120, end="2025-06-30", seed=args.seed)
+            keys = sorted(panel['series'].unique())
+            A = hierarchy.aggregation_matrix(pd.DataFrame({"category": [f"C{i % args.groups:02d}" for i in range(size)]}, index=keys))[0]
+            rng = np.random.default_rng(args.seed)
+            base_leaves, base_aggregates = rng.uniform(50, 150, (size, horizon)), rng.uniform(50, 150, (len(A), horizon)) * A.sum(axis=1, keepdims=True)
+            variances = rng.uniform(1, 10, size), rng.uniform(1, 10, len(A))
+
+            # Leaf forecasts written straight into the buckets, as a retrain would leave them
+            shutil.rmtree(config.DATA_DIR, ignore_errors=True)
+            os.makedirs(config.DATA_DIR)
+            series.merge_series_history(MODEL, panel)
+            future = pd.date_range(panel['ds'].max() + pd.Timedelta(days=1), periods=horizon)
+            forecasts = pd.concat([panel.rename(columns={'y': 'yhat'}),
+                                   pd.DataFrame({'series': np.repeat(keys, horizon), 'ds': np.tile(future, size),
+                                                 'yhat': base_leaves.ravel()})], ignore_index=True)
+            forecasts['yhat_lower'], forecasts['yhat_upper'] = forecasts['yhat'] - 10, forecasts['yhat'] + 10
+            for bucket, bucket_df in forecasts.groupby(forecasts['series'].map(series.bucket_of)):
+                series._write_bucket(series.forecast_bucket_path(MODEL, bucket), bucket_df[series.FORECAST_COLUMNS])
+            pd.DataFrame({"product": keys, "category": [f"C{i % args.groups:02d}" for i in range(size)]}).to_csv(
+                os.path.join(config.DATA_DIR, "categories.csv"), index=False)
+            model_config["hierarchy"] = {"levels": ["category"], "mapping": "categories.csv"}
+            try:
+                for method in hierarchy.METHODS:
+                    started = time.perf_counter()
+                    hierarchy.reconcile_forecasts(A, base_aggregates, base_leaves, method, variances[1], variances[0])
+                    matrix_seconds = time.perf_counter() - started
+                    started = time.perf_counter()
+                    success, message, _ = hierarchy.reconcile_model(MODEL, method, force=True)
+                    model_seconds = time.perf_counter() - started
+                    if not success:
+                        problems.append(message)
+                    print(f"  {size:>8}  {method:<12}{matrix_seconds * 1000:>19.2f}ms{model_seconds:>16.2f}s")
+            finally:
+                model_config.pop("hierarchy", None)
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for problem in problems:
+        print(f"Error: {problem}")
+    if not problems:
+        print("\nSuccess: Every reconciled forecast is coherent.")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Records/second of the PocketBase record aggregation on synthetic records (no HTTP involved).
+
+The vectorized path folds pages of record dicts into a pb_fetch.DailyAggregator, as the
+streaming fetcher does. The previous row-by-row loop over SDK record objects is kept here as the
+baseline. See bench_pb_fetch.py for the end-to-end fetch against a local server.
+
+Usage: python benchmarks/bench_ingest.py [--records 10000 100000] [--model service_request_counts]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+
+from config import POCKETBASE_COLLECTION_CONFIG, PB_PAGE_SIZE
+from pb_fetch import DailyAggregator
+
+
+def synthetic_records(model_name, count, month=date(2025, 1, 1), seed=0):
+    """PocketBase record dicts spread over one month, shaped like the model's collection."""
+    config = POCKETBASE_COLLECTION_CONFIG[model_name]
+    rng = np.random.default_rng(seed)
+    seconds = np.sort(rng.integers(0, 28 * 86400, count))
+    timestamps = (pd.Timestamp(month) + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S.000Z")
+    values = rng.normal(50, 15, count).round(2)
+    records = []
+    for i, (ts, value) in enumerate(zip(timestamps, values)):
+        record = {"id": f"rec{i:012d}", config["ds_field"]: ts}
+        if config.get("y_field"):
+            record[config["y_field"]] = float(value)
+        records.append(record)
+    return records
+
+
+def vectorized_aggregate(records, model_name, page_size=PB_PAGE_SIZE):
+    config = POCKETBASE_COLLECTION_CONFIG[model_name]
+    aggregator = DailyAggregator(config["ds_field"], config.get("y_field"), config.get("aggregation_method"))
+    for page_number, start in enumerate(range(0, len(records), page_size), start=1):
+        aggregator.add_page(page_number, records[start:start + page_size])
+    return aggregator.result()
+
+
+def legacy_aggregate(records, model_name):
+    """The original per-record loop from fetch_data_for_month_from_pb."""
+    config = POCKETBASE_COLLECTION_CONFIG[model_name]
+    ds_field, y_field, aggregation_method = config["ds_field"], config.get("y_field"), config.get("aggregation_method")
+    new_data_points = []
+    for record in records:
+        try:
+            ds_date = pd.to_datetime(str(getattr(record, ds_field)).split(" ")[0]).date()
+            if aggregation_method == "count":
+                new_data_points.append({'ds': ds_date, 'y': 1})
+            else:
+                new_data_points.append({'ds': ds_date, 'y': float(getattr(record, y_field))})
+        except Exception as e:
+            print(f"Error processing record {record.id} for {model_name}: {e}")
+    new_df = pd.DataFrame(new_data_points)
+    new_df['ds'] = pd.to_datetime(new_df['ds'])
+    if aggregation_method == "count":
+        new_df = new_df.groupby('ds').size().reset_index(name='y')
+    elif aggregation_method == "sum":
+        new_df = new_df.groupby('ds')['y'].sum().reset_index()
+    return new_df
+
+
+def _rate(fn, count):
+    started = time.perf_counter()
+    fn()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--model", default="service_request_counts", choices=sorted(POCKETBASE_COLLECTION_CONFIG))
+    args = parser.parse_args()
+
+    print(f"{'model':<26}{'records':>10}{'legacy rec/s':>16}{'vectorized rec/s':>20}{'speedup':>9}")
+    for count in args.records:
+        records = synthetic_records(args.model, count)
+        sdk_records = [SimpleNamespace(**record) for record in records] # What the SDK's get_full_list returned
+        legacy = _rate(lambda: legacy_aggregate(sdk_records, args.model), count)
+        vectorized = _rate(lambda: vectorized_aggregate(records, args.model), count)
+        print(f"{args.model:<26}{count:>10}{legacy:>16,.0f}{vectorized:>20,.0f}{vectorized / legacy:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
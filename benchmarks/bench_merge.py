@@ -0,0 +1,140 @@
+"""
+Merge time of new points into a saved history: the previous concat/sort/drop_duplicates merge
+versus history.merge (searchsorted placement into the already sorted history).
+
+For each size the history is full (window = its row count), so every merge also evicts rows.
+Cases: appending one new point (the daily update), re-sending the last 30 points with new
+values (a monthly re-fetch), and 30 points scattered through the history (a backfill).
+Histories this long do not fit in pandas' date range at daily resolution, so points are hourly.
+With --end-to-end, also times services._process_and_save_historical_data (read, merge, write)
+per storage backend in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_merge.py [--sizes 1000 100000 1000000] [--repeats 3] [--end-to-end]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+
+import history
+
+MODEL_NAME = "sales"
+
+
+def _previous_merge(existing_df, new_df, rows):
+    """The merge before history.py, for comparison."""
+    combined_df = pd.concat([existing_df, new_df], ignore_index=True)
+    combined_df['ds'] = pd.to_datetime(combined_df['ds'], errors='coerce').dt.tz_localize(None)
+    combined_df['updated_at'] = pd.to_datetime(combined_df['updated_at'], errors='coerce')
+    combined_df.dropna(subset=['ds'], inplace=True)
+    combined_df.sort_values(by=['ds', 'updated_at'], ascending=[True, True], inplace=True)
+    combined_df.drop_duplicates(subset=['ds'], keep='last', inplace=True)
+    combined_df.sort_values('ds', ascending=True, inplace=True)
+    return combined_df.tail(rows).reset_index(drop=True)
+
+
+def synthetic_history(rows):
+    now = pd.Timestamp.now('UTC').tz_localize(None)
+    return pd.DataFrame({
+        'ds': pd.date_range(end=pd.Timestamp.today().normalize(), periods=rows, freq='h'),
+        'y': np.random.default_rng(0).normal(100, 10, rows).round(2),
+        'created_at': now,
+        'updated_at': now,
+    })
+
+
+def cases(existing):
+    ds = existing['ds']
+    rng = np.random.default_rng(1)
+    return {
+        "append 1": pd.DataFrame({'ds': [ds.iloc[-1] + pd.Timedelta(hours=1)], 'y': [1.0]}),
+        "update last 30": pd.DataFrame({'ds': ds.iloc[-30:].to_numpy(), 'y': 1.0}),
+        "backfill 30": pd.DataFrame({'ds': np.sort(rng.choice(ds.to_numpy(), 30, replace=False)) + np.timedelta64(30, 'm'),
+                                     'y': 1.0}),
+    }
+
+
+def _median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def bench_merge(rows, repeats):
+    existing = synthetic_history(rows)
+    now = pd.Timestamp.now('UTC').tz_localize(None)
+    window = (history.ROWS, rows)
+    results = {}
+    for name, new_data_df in cases(existing).items():
+        new_df = history.new_points(new_data_df, now)
+        before = _median_seconds(lambda: _previous_merge(existing, new_df, rows), repeats)
+        after = _median_seconds(lambda: history.merge(existing, new_df, window), repeats)
+        expected = _previous_merge(existing, new_df, rows)
+        merged, _ = history.merge(existing, new_df, window)
+        pd.testing.assert_frame_equal(merged, expected, check_dtype=False)
+        results[name] = (before, after)
+    return results
+
+
+def bench_end_to_end(rows, repeats):
+    import config
+    import services
+    import storage
+
+    results = {}
+    for backend_name in storage.BACKENDS:
+        # DATA_DIR is relative, so the history (and lock files) land in the temporary directory.
+        tmp_dir = tempfile.mkdtemp(prefix="bench_merge_")
+        os.chdir(tmp_dir)
+        try:
+            os.makedirs(config.DATA_DIR)
+            storage.STORAGE_BACKEND, storage._backend = backend_name, None
+            config.POCKETBASE_COLLECTION_CONFIG[MODEL_NAME]["window_rows"] = rows
+            existing = synthetic_history(rows)
+            storage.get_backend().write_history(MODEL_NAME, existing)
+            appended = [existing['ds'].iloc[-1]]
+
+            def append_one():
+                appended[0] += pd.Timedelta(hours=1)
+                services._process_and_save_historical_data(MODEL_NAME, pd.DataFrame({'ds': appended, 'y': [1.0]}))
+            results[backend_name] = _median_seconds(append_one, repeats)
+        finally:
+            config.POCKETBASE_COLLECTION_CONFIG[MODEL_NAME].pop("window_rows", None)
+            os.chdir(REPO_ROOT)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--end-to-end", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'case':<16}{'previous':>12}{'searchsorted':>14}{'speedup':>9}")
+    for rows in args.sizes:
+        for name, (before, after) in bench_merge(rows, args.repeats).items():
+            print(f"{rows:>10}  {name:<16}{before * 1000:>10.1f}ms{after * 1000:>12.1f}ms{before / after:>8.1f}x")
+
+    if args.end_to_end:
+        print(f"\n{'rows':>10}  read + merge + write of one new point")
+        for rows in args.sizes:
+            timings = bench_end_to_end(rows, args.repeats)
+            print(f"{rows:>10}  " + "  ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
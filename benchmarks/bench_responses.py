@@ -0,0 +1,108 @@
+"""
+Size and build time of /historical_data and /forecast bodies for a long history, per format.
+
+Writes a synthetic daily history (and a forecast of the same length) for one model, then times
+each body through the Flask test client with the response cache cleared before every request:
+the old per-row strftime serializer for reference, the default (cached) body, the streamed
+records/columnar/Arrow formats, gzip, and a ?since= slice of the last year.
+Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_responses.py [--days 36500] [--repeats 3] [--backend csv parquet]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MODEL_NAME = "sales"
+
+
+def _strftime_body(df):
+    """The serializer before response_formats, for comparison."""
+    df = df.copy()
+    for col in ['ds', 'created_at', 'updated_at']:
+        if col in df.columns:
+            df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    return df.to_json(orient="records").encode("utf-8")
+
+
+def _time(fn, repeats):
+    timings, size = [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        size = fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=36500)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--backend", nargs="+", default=["csv", "parquet"], choices=["csv", "parquet"])
+    args = parser.parse_args()
+
+    # DATA_DIR is relative, so every file lands in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_responses_")
+    os.chdir(tmp_dir)
+    try:
+        import numpy as np
+        import pandas as pd
+        import app
+        import response_cache
+        import storage
+
+        ds = pd.date_range(end=pd.Timestamp.today().normalize(), periods=args.days, freq="D")
+        now = pd.Timestamp.now('UTC').tz_localize(None)
+        rng = np.random.default_rng(0)
+        history = pd.DataFrame({"ds": ds, "y": rng.integers(50, 500, len(ds)), "created_at": now, "updated_at": now})
+        forecast = pd.DataFrame({"ds": ds, "yhat": rng.normal(200, 50, len(ds))})
+        forecast["yhat_lower"], forecast["yhat_upper"] = forecast["yhat"] - 40, forecast["yhat"] + 40
+        since = (ds[-1] - pd.Timedelta(days=364)).strftime("%Y-%m-%d")
+        client = app.app.test_client()
+
+        def request(path, **headers):
+            def run():
+                response_cache.clear()
+                app._gzipped_body.cache_clear()
+                return len(client.get(path, headers=headers).data)
+            return run
+
+        print(f"{args.days} rows; median of {args.repeats}")
+        for backend_name in args.backend:
+            storage.STORAGE_BACKEND = backend_name
+            storage._backend = None
+            backend = storage.get_backend()
+            backend.write_history(MODEL_NAME, history)
+            backend.write_forecast(MODEL_NAME, forecast)
+
+            cases = [
+                ("strftime (old)", lambda: len(_strftime_body(backend.read_history(MODEL_NAME)))),
+                ("default", request(f"/historical_data/{MODEL_NAME}")),
+                ("default, gzip", request(f"/historical_data/{MODEL_NAME}", **{"Accept-Encoding": "gzip"})),
+                ("records (streamed)", request(f"/historical_data/{MODEL_NAME}?format=records")),
+                ("columnar", request(f"/historical_data/{MODEL_NAME}?format=columnar")),
+                ("columnar, gzip", request(f"/historical_data/{MODEL_NAME}?format=columnar", **{"Accept-Encoding": "gzip"})),
+                ("arrow", request(f"/historical_data/{MODEL_NAME}?format=arrow")),
+                ("columnar, last year", request(f"/historical_data/{MODEL_NAME}?format=columnar&since={since}")),
+                ("forecast default", request(f"/forecast/{MODEL_NAME}")),
+                ("forecast columnar", request(f"/forecast/{MODEL_NAME}?format=columnar")),
+            ]
+            print(f"\n[{backend_name}]")
+            print(f"{'body':<24}{'seconds':>10}{'MB':>10}")
+            for label, fn in cases:
+                seconds, size = _time(fn, args.repeats)
+                print(f"{label:<24}{seconds:>10.3f}{size / 1e6:>10.2f}")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+The refresh scheduler (scheduler.py) against the local PocketBase stand-in (tests/pb_stub.py).
+
+Serves --days of synthetic records ending today for every configured collection, then:
+
+ 1. runs every model once (--once mode), checking that starts are at least --stagger seconds
+    apart, that no more than --max-fits refreshes overlap, and that each high-water mark is today;
+ 2. adds a day of records after the high-water marks and runs the daemon with a --cadence of a
+    few seconds for --seconds, checking that every run fetched only from its high-water day on.
+
+Reports per-model fetch sizes and run times, and the number of requests the stub served per phase.
+Exits non-zero if a check fails. Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_scheduler.py [--records 5000] [--days 30] [--max-fits 2] [--stagger 1]
+                                            [--cadence 5] [--seconds 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def add_day(collections, config, day, count, seed=0):
+    """Appends `count` records on `day` to every collection, with the fields its models read."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    added = {}
+    for model_config in config.values():
+        name = model_config["collection_name"]
+        if name not in added:
+            added[name] = []
+            for i in range(count):
+                ts = f"{day.isoformat()} {i * 86399 // count // 3600:02d}:{i * 86399 // count // 60 % 60:02d}:00.000Z"
+                added[name].append({"id": f"new{day:%Y%m%d}{i:08d}", "collectionName": name,
+                                    model_config["ds_field"]: ts, "created": ts, "updated": ts})
+        for record in added[name]:
+            if model_config.get("y_field"):
+                record.setdefault(model_config["y_field"], float(rng.normal(50, 15)))
+            if model_config.get("series_key"):
+                record.setdefault(model_config["series_key"], f"SKU-{rng.integers(1, 51):04d}")
+    for name, records in added.items():
+        collections[name].extend(records)
+
+
+def check_runs(runs, stagger, max_fits):
+    """Problems with the start spacing and overlap of a list of completed runs."""
+    problems = []
+    starts = sorted(run["started_at"] for run in runs)
+    for previous, current in zip(starts, starts[1:]):
+        if current - previous < stagger - 0.01:
+            problems.append(f"runs started {current - previous:.2f}s apart (stagger {stagger}s)")
+    for run in runs:
+        overlapping = sum(other["started_at"] <= run["started_at"] < other["finished_at"] for other in runs)
+        if overlapping > max_fits:
+            problems.append(f"{overlapping} runs overlapped at the start of '{run['model']}' (cap {max_fits})")
+    problems += [f"'{run['model']}' failed: {run['message']}" for run in runs if not run["success"]]
+    return problems
+
+
+def print_runs(runs, origin):
+    print(f"  {'model':<28}{'start':>8}{'seconds':>9}{'points':>8}  status")
+    for run in sorted(runs, key=lambda r: r["started_at"]):
+        print(f"  {run['model']:<28}{run['started_at'] - origin:>7.1f}s{run['seconds']:>9.2f}{run['rows_fetched']:>8}  {run['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=5_000, help="Records per collection.")
+    parser.add_argument("--days", type=int, default=30, help="Days of records, ending today.")
+    parser.add_argument("--max-fits", type=int, default=2)
+    parser.add_argument("--stagger", type=float, default=1.0, help="Seconds between run starts.")
+    parser.add_argument("--cadence", type=float, default=5.0, help="Seconds between runs of a model in phase 2.")
+    parser.add_argument("--seconds", type=float, default=20.0, help="How long phase 2 runs.")
+    args = parser.parse_args()
+
+    # DATA_DIR is relative, so every file lands in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_scheduler_")
+    os.chdir(tmp_dir)
+    import services
+    import scheduler
+    from config import POCKETBASE_COLLECTION_CONFIG
+    from tests.pb_stub import start_stub_server, synthetic_collections
+
+    today = date.today()
+    collections = synthetic_collections(args.records, start=today - timedelta(days=args.days - 1), days=args.days)
+    server, base_url = start_stub_server(collections)
+    services.POCKETBASE_URL = base_url  # The stub's port is only known now, after config was read
+    problems = []
+    try:
+        print(f"Phase 1: every model once, {args.records} records x {args.days} days per collection")
+        origin, requests_before = time.time(), server.state.requests
+        runs = scheduler.Scheduler(max_concurrent_fits=args.max_fits, stagger_seconds=args.stagger).run(once=True)
+        print_runs(runs, origin)
+        print(f"  {server.state.requests - requests_before} stub requests, {time.time() - origin:.1f}s")
+        problems += check_runs(runs, args.stagger, args.max_fits)
+        problems += [f"'{name}' high water {scheduler.read_state(name).get('high_water')}, expected {today}"
+                     for name in POCKETBASE_COLLECTION_CONFIG if scheduler.read_state(name).get("high_water") != today.isoformat()]
+
+        new_day = today + timedelta(days=1)
+        add_day(collections, POCKETBASE_COLLECTION_CONFIG, new_day, max(1, args.records // args.days))
+        server.state._query_cache.clear()
+        for model_config in POCKETBASE_COLLECTION_CONFIG.values():
+            model_config["refresh_minutes"] = args.cadence / 60
+
+        print(f"\nPhase 2: daemon for {args.seconds:g}s, every model every {args.cadence:g}s, one new day of records")
+        origin, requests_before = time.time(), server.state.requests
+        daemon = scheduler.Scheduler(max_concurrent_fits=args.max_fits, stagger_seconds=args.stagger)
+        threading.Timer(args.seconds, daemon.stop).start()
+        runs = daemon.run()
+        print_runs(runs, origin)
+        print(f"  {server.state.requests - requests_before} stub requests, {len(runs)} runs")
+        problems += check_runs(runs, args.stagger, args.max_fits)
+        for run in runs:
+            # From the high-water day on: today and the new day, per series for multi-series models.
+            limit = 2 * (50 if POCKETBASE_COLLECTION_CONFIG[run["model"]].get("series_key") else 1)
+            if run["rows_fetched"] > limit:
+                problems.append(f"'{run['model']}' fetched {run['rows_fetched']} points after its high-water mark (at most {limit} expected)")
+        problems += [f"'{name}' high water {scheduler.read_state(name).get('high_water')}, expected {new_day}"
+                     for name in {run["model"] for run in runs} if scheduler.read_state(name).get("high_water") != new_day.isoformat()]
+    finally:
+        server.shutdown()
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for problem in problems:
+        print(f"Error: {problem}")
+    if not problems:
+        print("\nSuccess: All scheduler checks passed.")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
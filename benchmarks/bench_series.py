@@ -0,0 +1,73 @@
+"""
+Throughput (series/minute) of the multi-series batch training engine (see series.py).
+
+Generates synthetic daily series for a multi-series model, then fits them all with pools of
+different sizes. Every run is forced, so unchanged buckets are refitted too. A first, untimed
+run picks each series' forecaster (see forecasters.py), so the timed runs measure refits with
+the picks reused, as in steady-state retrains. FORECASTER=prophet (the default) times Prophet
+alone; set FORECASTER=auto to time the per-series picks.
+Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_series.py [--series 200] [--days 365] [--workers 1 4 8]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def main():
+    import series
+    from config import SERIES_BUCKETS, SERIES_UNCERTAINTY_SAMPLES
+    from generate_data import generate_series_data
+    from tests.pb_stub import add_example_series_models
+
+    add_example_series_models()  # The multi-series examples commented out in config.py
+
+    default_workers = sorted({1, os.cpu_count() or 1})
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--model", default=series.series_models()[0], choices=series.series_models())
+    args = parser.parse_args()
+
+    # DATA_DIR is relative, so the bucket files (and lock files) land in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_series_")
+    os.chdir(tmp_dir)
+    try:
+        started = time.perf_counter()
+        generate_series_data(args.model, args.series, args.days)
+        print(f"Generated {args.series} series x {args.days} days in {time.perf_counter() - started:.1f}s "
+              f"({SERIES_BUCKETS} buckets, {SERIES_UNCERTAINTY_SAMPLES} uncertainty samples)")
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=max(args.workers)) as pool:
+            success, message, summary = series.train_series_model(args.model, pool, force=True)
+        if not success:
+            print(f"Error: {message}")
+            sys.exit(1)
+        print(f"Selection run: {time.perf_counter() - started:.1f}s, forecasters {summary['forecasters']}")
+
+        print(f"{'workers':>8}{'fitted':>8}{'seconds':>10}{'series/min':>12}")
+        for workers in args.workers:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pool.submit(int).result()  # Start a worker before timing
+                success, message, summary = series.train_series_model(args.model, pool, force=True)
+            if not success:
+                print(f"Error: {message}")
+                sys.exit(1)
+            print(f"{workers:>8}{summary['fitted']:>8}{summary['seconds']:>10.1f}{summary['series_per_minute']:>12.0f}")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
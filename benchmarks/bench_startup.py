@@ -0,0 +1,112 @@
+"""
+Import time and memory of an API process, to catch regressions in startup cost.
+
+Each run imports the app in a fresh interpreter and reports the wall time, the peak RSS and
+whether any module that only the training paths need (Prophet, Stan, matplotlib, httpx) was
+imported. On Linux it then loads wsgi.py (app, warm caches, gc.freeze) the way the gunicorn
+master does, forks a worker that serves every read endpoint, and reports how much of the
+worker's memory is still shared with the master versus private to it.
+
+Exits 1 when a heavy module is imported at startup or a limit is exceeded.
+
+Usage: python benchmarks/bench_startup.py [--repeats 5] [--max-seconds 2] [--max-rss-mb 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the fitting and fetching code paths may import these.
+HEAVY_MODULES = ["prophet", "cmdstanpy", "matplotlib", "httpx"]
+
+_IMPORT_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  "heavy": [name for name in %r if name in sys.modules]}))
+"""
+
+_FORK_PROBE = """
+import contextlib, io, json, os, sys
+with contextlib.redirect_stdout(io.StringIO()):
+    import wsgi
+from config import POCKETBASE_COLLECTION_CONFIG
+
+def rollup():
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+read_fd, write_fd = os.pipe()
+pid = os.fork()
+if pid == 0:
+    client = wsgi.app.test_client()
+    for _ in range(20):
+        for model_name in POCKETBASE_COLLECTION_CONFIG:
+            client.get(f"/forecast/{model_name}")
+            client.get(f"/historical_data/{model_name}")
+    os.write(write_fd, json.dumps(rollup()).encode())
+    os._exit(0)
+os.close(write_fd)
+with os.fdopen(read_fd) as f:
+    worker = json.loads(f.read())
+os.waitpid(pid, 0)
+print(json.dumps({"master": rollup(), "worker": worker}))
+"""
+
+
+def _run_probe(code):
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters; the median time is reported.")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if the median import time exceeds this.")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="Fail if the peak RSS after import exceeds this.")
+    args = parser.parse_args()
+
+    runs = [_run_probe(_IMPORT_PROBE % (HEAVY_MODULES,)) for _ in range(args.repeats)]
+    seconds = statistics.median(run["seconds"] for run in runs)
+    rss_mb = max(run["rss_kb"] for run in runs) / 1024  # ru_maxrss is in KiB on Linux
+    heavy = sorted({name for run in runs for name in run["heavy"]})
+    print(f"import app: {seconds:.3f}s (median of {args.repeats}), peak RSS {rss_mb:.0f} MB")
+
+    failures = []
+    if heavy:
+        failures.append(f"imported at startup: {', '.join(heavy)}")
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        failures.append(f"import took {seconds:.3f}s (limit {args.max_seconds}s)")
+    if args.max_rss_mb is not None and rss_mb > args.max_rss_mb:
+        failures.append(f"peak RSS {rss_mb:.0f} MB (limit {args.max_rss_mb} MB)")
+
+    if os.path.exists("/proc/self/smaps_rollup") and hasattr(os, "fork"):
+        memory = _run_probe(_FORK_PROBE)
+        worker = memory["worker"]
+        private_mb = (worker.get("Private_Clean", 0) + worker.get("Private_Dirty", 0)) / 1024
+        shared_mb = (worker.get("Shared_Clean", 0) + worker.get("Shared_Dirty", 0)) / 1024
+        print(f"forked worker after serving reads: {worker.get('Rss', 0) / 1024:.0f} MB RSS, "
+              f"{shared_mb:.0f} MB shared with the master, {private_mb:.0f} MB private")
+    else:
+        print("Warning: /proc/self/smaps_rollup not available; fork sharing not measured.")
+
+    for failure in failures:
+        print(f"Error: {failure}")
+    if failures:
+        sys.exit(1)
+    print("Success: no heavy imports at startup.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Read/write timings of the history storage backends (see storage.py).
+
+For each size a synthetic daily history is written in full, read back, and then updated with
+one new day (the common daily-append case, passing touched_ds so Parquet only rewrites the
+affected partitions). Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_storage.py [--sizes 1000 100000] [--repeats 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+
+def synthetic_history(rows):
+    now = pd.Timestamp.now('UTC').tz_localize(None)
+    return pd.DataFrame({
+        'ds': pd.date_range(end=pd.Timestamp.today().normalize(), periods=rows, freq='D'),
+        'y': np.random.default_rng(0).normal(100, 10, rows).round(2),
+        'created_at': now,
+        'updated_at': now,
+    })
+
+
+def _median_seconds(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def bench_backend(backend, rows, repeats):
+    history = synthetic_history(rows)
+    appended = pd.concat([history.iloc[1:], synthetic_history(1).assign(ds=history['ds'].iloc[-1] + pd.Timedelta(days=1))],
+                         ignore_index=True)
+    touched = appended['ds'].iloc[-1:]
+    return {
+        "write": _median_seconds(lambda: backend.write_history("bench", history), repeats),
+        "read": _median_seconds(lambda: backend.read_history("bench"), repeats),
+        "append": _median_seconds(lambda: backend.write_history("bench", appended, touched_ds=touched), repeats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'backend':<10}{'rows':>10}{'write':>12}{'read':>12}{'append':>12}")
+    for rows in args.sizes:
+        for name, backend_class in storage.BACKENDS.items():
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                result = bench_backend(backend_class(tmp_dir), rows, args.repeats)
+            print(f"{name:<10}{rows:>10}" + "".join(f"{result[k] * 1000:>10.1f}ms" for k in ("write", "read", "append")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+Benchmark suite: ingest, merge, fit, predict and serve latency across history sizes, written as
+JSON so that runs on different commits can be compared.
+
+Data comes from generate_data.synthetic_series (daily points of --model's pattern ending at --end),
+so every run on every machine times the same inputs. Per size:
+
+    ingest   saving the whole series into an empty history (parse, merge, write), per backend
+    merge    appending one point to / re-sending the last 30 points of the saved history, per backend
+    fit      Prophet fit (sizes up to --fit-max-rows) and the holt_winters baseline (fit + predict)
+    predict  FORECAST_HORIZON_DAYS from the stored Prophet model, with and without intervals
+    serve    /historical_data and /forecast through the Flask test client, cold (cache cleared)
+             and warm, per backend
+
+The history window is lifted for the suite so every size is kept whole.
+Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000 10000 100000] [--repeats 3] [--output results.json]
+                                     [--compare baseline.json] [--threshold 0.2]
+    python benchmarks/bench_suite.py --diff baseline.json results.json
+
+Results go to benchmarks/results/<commit>.json by default. --compare and --diff print the ratio of
+every case to the baseline and exit with status 1 if any case is slower by more than --threshold.
+"""
+import argparse
+import importlib.metadata
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+SCHEMA_VERSION = 1
+PACKAGES = ("numpy", "pandas", "pyarrow", "prophet", "cmdstanpy", "flask")
+
+
+def _timings(fn, repeats, setup=None):
+    """Runs setup() (untimed) and fn() `repeats` times. Returns the timings in seconds."""
+    timings = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _result(stage, case, rows, timings, backend=None):
+    return {"stage": stage, "case": case, "backend": backend, "rows": rows, "repeats": len(timings),
+            "median_seconds": statistics.median(timings), "min_seconds": min(timings)}
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Commit, interpreter, package versions and machine the results were measured on."""
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "packages": versions,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def run_suite(args):
+    """Runs every stage for every size in a temporary directory. Returns the list of results."""
+    # DATA_DIR is relative, so histories, models and lock files land in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_suite_")
+    os.chdir(tmp_dir)
+    logging.getLogger("cmdstanpy").disabled = True
+    try:
+        import pandas as pd
+        import app
+        import config
+        import forecasters
+        import model_store
+        import response_cache
+        import services
+        import storage
+        from generate_data import synthetic_series
+        from prophet import Prophet
+
+        model = args.model
+        model_config = config.POCKETBASE_COLLECTION_CONFIG[model]
+        saved_window = {key: model_config.pop(key) for key in ("window_days", "window_rows") if key in model_config}
+        model_config["window_days"] = None
+        client = app.app.test_client()
+        results = []
+
+        def reset_data_dir():
+            shutil.rmtree(config.DATA_DIR, ignore_errors=True)
+            os.makedirs(config.DATA_DIR)
+            storage._backend = None
+            response_cache.clear()
+            app._gzipped_body.cache_clear()
+            services._load_stored_model.cache_clear()
+
+        def remove_history():
+            path = storage.get_backend().data_path(model)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+
+        def get(path):
+            response = client.get(path)
+            body = response.data  # Streamed bodies are only built when read
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {path} returned {response.status_code}: {body[:200]!r}")
+            return len(body)
+
+        def cold_get(path):
+            def run():
+                response_cache.clear()
+                app._gzipped_body.cache_clear()
+                return get(path)
+            return run
+
+        try:
+            for rows in args.sizes:
+                data = synthetic_series(model, rows, end=args.end, seed=args.seed)
+                print(f"\n{rows} rows")
+
+                for backend_name in args.backend:
+                    storage.STORAGE_BACKEND = backend_name
+                    reset_data_dir()
+                    ingest = lambda: services._process_and_save_historical_data(model, data)
+                    results.append(_result("ingest", "full series", rows, _timings(ingest, args.repeats, setup=remove_history), backend_name))
+
+                    appended = [data['ds'].iloc[-1]]
+
+                    def append_one():
+                        appended[0] += pd.Timedelta(days=1)
+                        services._process_and_save_historical_data(model, pd.DataFrame({'ds': appended, 'y': [1]}))
+                    results.append(_result("merge", "append 1", rows, _timings(append_one, args.repeats), backend_name))
+                    last_30 = data.tail(30).assign(y=lambda df: df['y'] + 1)
+                    update = lambda: services._process_and_save_historical_data(model, last_30)
+                    results.append(_result("merge", "update last 30", rows, _timings(update, args.repeats), backend_name))
+
+                    forecast = pd.DataFrame({'ds': data['ds'], 'yhat': data['y'].astype(float)})
+                    forecast['yhat_lower'], forecast['yhat_upper'] = forecast['yhat'] - 10, forecast['yhat'] + 10
+                    storage.get_backend().write_forecast(model, forecast)
+                    for case, path in (("history cold", f"/historical_data/{model}"),
+                                       ("history columnar cold", f"/historical_data/{model}?format=columnar"),
+                                       ("forecast cold", f"/forecast/{model}")):
+                        results.append(_result("serve", case, rows, _timings(cold_get(path), args.repeats), backend_name))
+                    get(f"/historical_data/{model}")
+                    warm = lambda: get(f"/historical_data/{model}")
+                    results.append(_result("serve", "history warm", rows, _timings(warm, args.repeats), backend_name))
+
+                baseline = lambda: forecasters.baseline_forecast("holt_winters", data, config.FORECAST_HORIZON_DAYS)
+                results.append(_result("fit", "holt_winters", rows, _timings(baseline, args.repeats)))
+                if rows <= args.fit_max_rows:
+                    fitted = []
+                    fit = lambda: fitted.append(Prophet().fit(data[['ds', 'y']].copy()))
+                    results.append(_result("fit", "prophet", rows, _timings(fit, args.repeats)))
+                    version = model_store.save_model(model, fitted[-1])
+                    for case, include_uncertainty in (("prophet", True), ("prophet, no intervals", False)):
+                        predict = lambda: services.predict_from_stored_model(model, version, config.FORECAST_HORIZON_DAYS,
+                                                                             include_uncertainty=include_uncertainty)
+                        predict()  # Loads the model into the cache, as a served process would have
+                        results.append(_result("predict", case, rows, _timings(predict, args.repeats)))
+
+                for result in results:
+                    if result["rows"] == rows:
+                        print(_format_result(result))
+        finally:
+            for key in ("window_days", "window_rows"):
+                model_config.pop(key, None)
+            model_config.update(saved_window)
+        return results
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _case_label(result):
+    backend = f" [{result['backend']}]" if result["backend"] else ""
+    return f"{result['stage']}: {result['case']}{backend}"
+
+
+def _format_result(result):
+    return f"  {_case_label(result):<44}{result['median_seconds'] * 1000:>12.2f}ms"
+
+
+def _key(result):
+    return result["stage"], result["case"], result["backend"], result["rows"]
+
+
+def compare(baseline, current, threshold):
+    """Prints current/baseline median ratios per case. Returns the number of cases slower than 1 + threshold."""
+    baseline_results = {_key(result): result for result in baseline["results"]}
+    print(f"\nBaseline {baseline['environment'].get('commit')} vs {current['environment'].get('commit')}")
+    print(f"  {'case':<44}{'rows':>9}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    regressions = 0
+    for result in current["results"]:
+        previous = baseline_results.get(_key(result))
+        if previous is None:
+            continue
+        ratio = result["median_seconds"] / previous["median_seconds"] if previous["median_seconds"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressions = "  slower", regressions + 1
+        elif ratio < 1 / (1 + threshold):
+            flag = "  faster"
+        print(f"  {_case_label(result):<44}{result['rows']:>9}{previous['median_seconds'] * 1000:>10.2f}ms"
+              f"{result['median_seconds'] * 1000:>10.2f}ms{ratio:>7.2f}x{flag}")
+    if regressions:
+        print(f"Warning: {regressions} case(s) slower than the baseline by more than {threshold:.0%}.")
+    return regressions
+
+
+def _load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--backend", nargs="+", default=["csv", "parquet"], choices=["csv", "parquet"])
+    parser.add_argument("--model", default="sales", help="Model whose config and data pattern are used.")
+    parser.add_argument("--end", default="2025-06-30", help="Date of the last generated point.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fit-max-rows", type=int, default=10_000, help="Largest size Prophet is fitted on.")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<commit>.json).")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to compare this run with.")
+    parser.add_argument("--diff", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two results files without running.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown ratio above 1 reported as a regression.")
+    args = parser.parse_args()
+    # The suite runs in a temporary directory, so paths given relative to the caller's are resolved first.
+    args.output, args.compare = (os.path.abspath(path) if path else None for path in (args.output, args.compare))
+
+    if args.diff:
+        sys.exit(1 if compare(_load(args.diff[0]), _load(args.diff[1]), args.threshold) else 0)
+
+    baseline = _load(args.compare) if args.compare else None  # Read before the run may overwrite it
+    env = environment()
+    parameters = {key: getattr(args, key) for key in ("sizes", "repeats", "backend", "model", "end", "seed", "fit_max_rows")}
+    results = run_suite(args)
+    report = {"schema": SCHEMA_VERSION, "environment": env, "parameters": parameters, "results": results}
+
+    output = args.output
+    if output is None:
+        name = (env["commit"] or "unknown")[:12] + ("-dirty" if env["dirty"] else "")
+        output = os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSuccess: Wrote {len(results)} results to {output}")
+
+    if baseline is not None:
+        sys.exit(1 if compare(baseline, report, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Overhead of the instrumentation in telemetry.py: the cost of one span and one counter increment,
+a cached /forecast request through the Flask test client with its timing hooks, and how long
+/metrics takes to render once many label sets have been recorded.
+Runs in a temporary directory; prophet_data/ is not touched.
+
+Usage: python benchmarks/bench_telemetry.py [--calls 100000] [--models 50]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+def _per_call(fn, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    parser.add_argument("--models", type=int, default=50, help="Distinct model labels recorded before rendering.")
+    args = parser.parse_args()
+
+    # DATA_DIR is relative, so metrics files land in the temporary directory.
+    tmp_dir = tempfile.mkdtemp(prefix="bench_telemetry_")
+    os.chdir(tmp_dir)
+    try:
+        import numpy as np
+        import pandas as pd
+        import app
+        import storage
+        import telemetry
+
+        def empty_block():
+            with telemetry.span("bench", model="sales"):
+                pass
+
+        print(f"span:    {_per_call(empty_block, args.calls) * 1e6:.2f}us per call")
+        print(f"count:   {_per_call(lambda: telemetry.count('rows_ingested', model='sales'), args.calls) * 1e6:.2f}us per call")
+
+        ds = pd.date_range(end=pd.Timestamp.today().normalize(), periods=30, freq="D")
+        storage.get_backend().write_forecast("sales", pd.DataFrame({"ds": ds, "yhat": np.ones(30), "yhat_lower": 0.0, "yhat_upper": 2.0}))
+        client = app.app.test_client()
+        client.get("/forecast/sales")
+        calls = max(1, args.calls // 100)
+        print(f"request: {_per_call(lambda: client.get('/forecast/sales'), calls) * 1e6:.0f}us per cached /forecast (hooks included)")
+
+        for i in range(args.models):
+            for span_name in ("history_read", "history_merge", "fit", "predict", "serialize"):
+                telemetry.observe("span_seconds", 0.01 * i, span=span_name, model=f"model_{i}")
+            telemetry.count("rows_ingested", i, model=f"model_{i}")
+        telemetry.flush()
+        started = time.perf_counter()
+        text = telemetry.render()
+        print(f"render:  {(time.perf_counter() - started) * 1000:.1f}ms for {len(text.splitlines())} lines")
+    finally:
+        os.chdir(REPO_ROOT)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
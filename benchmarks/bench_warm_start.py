@@ -0,0 +1,58 @@
+"""
+Cold vs. warm-started Prophet fit wall time on the series in prophet_data/.
+
+For each model the series is split so that the last --new-days points play the role of a
+fresh daily append: a model fitted on the older part provides the warm-start parameters,
+then the full series is fitted cold and warm --repeats times each.
+
+Usage: python benchmarks/bench_warm_start.py [--new-days 7] [--repeats 5]
+"""
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import pandas as pd
+from prophet import Prophet
+
+from model_store import warm_start_params
+
+logging.getLogger("cmdstanpy").disabled = True
+
+
+def _timed_fit(df, **fit_kwargs):
+    started = time.perf_counter()
+    Prophet().fit(df, **fit_kwargs)
+    return time.perf_counter() - started
+
+
+def bench_series(df, new_days, repeats):
+    previous = Prophet().fit(df.iloc[:-new_days])
+    init = warm_start_params(previous)
+    cold = [_timed_fit(df) for _ in range(repeats)]
+    warm = [_timed_fit(df, init=init) for _ in range(repeats)]
+    return statistics.median(cold), statistics.median(warm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--new-days", type=int, default=7, help="Points appended since the previous fit.")
+    parser.add_argument("--repeats", type=int, default=5, help="Fits per mode; the median is reported.")
+    args = parser.parse_args()
+
+    print(f"{'model':<28}{'points':>8}{'cold':>10}{'warm':>10}{'speedup':>9}")
+    for filepath in sorted(glob.glob(os.path.join(REPO_ROOT, "prophet_data", "*_data.csv"))):
+        model_name = os.path.basename(filepath)[:-len("_data.csv")]
+        df = pd.read_csv(filepath, usecols=["ds", "y"], parse_dates=["ds"])
+        cold, warm = bench_series(df, args.new_days, args.repeats)
+        print(f"{model_name:<28}{len(df):>8}{cold * 1000:>8.1f}ms{warm * 1000:>8.1f}ms{cold / warm:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Concurrency stress check for the per-model locks and atomic writes (see locks.py, storage.py).
+
+Several writer processes merge single new points into a model's history at the same time
+(the merge step of /update_forecast/<model>, as separate gunicorn workers would run it), a
+retrain process keeps rewriting the forecast, and reader processes poll /historical_data/<model>
+and /forecast/<model> throughout. At the end the history must contain every posted point, no
+read may have failed, and the number of history rows a reader sees must never go down.
+
+Runs in a temporary directory; prophet_data/ is not touched. Exits 1 on any failure.
+
+Usage: python benchmarks/stress_concurrent_updates.py [--writers 4] [--updates 50] [--readers 2] [--backend csv]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MODEL_NAME = "sales"
+SEED_POINTS = 30
+SEED_START = "2000-01-01"
+UPDATES_START = "2000-01-31"  # Right after the seed, so every point stays inside the history window
+
+
+def _quiet():
+    import logging
+    logging.getLogger("cmdstanpy").disabled = True
+    logging.getLogger("prophet").disabled = True
+
+
+def writer(writer_id, writers, updates, start_event, result_queue):
+    """Merges `updates` single points whose dates no other writer uses. Reports failed merges."""
+    import pandas as pd
+    import services
+
+    dates = pd.date_range(UPDATES_START, periods=writers * updates, freq="D")[writer_id::writers]
+    start_event.wait()
+    failures = []
+    for i, ds in enumerate(dates):
+        # The route's merge step; its retrain job is left out, the retrain process below rewrites the forecast.
+        success, message, _ = services.append_manual_data(MODEL_NAME, [{"ds": ds.strftime("%Y-%m-%d"), "y": float(i)}])
+        if not success:
+            failures.append(f"writer {writer_id}: {message}")
+    result_queue.put(("writer", writer_id, failures))
+
+
+def retrainer(stop_event, start_event, result_queue):
+    """Keeps refitting from the saved history, so the forecast file is rewritten during the reads."""
+    _quiet()
+    import services
+
+    start_event.wait()
+    fits, failures = 0, []
+    while not stop_event.is_set():
+        success, message = services.retrain_from_saved_history(MODEL_NAME, force=True)
+        fits += 1
+        if not success:
+            failures.append(f"retrain: {message}")
+    result_queue.put(("retrainer", fits, failures))
+
+
+def reader(reader_id, stop_event, start_event, result_queue):
+    """Polls both read endpoints; any non-200, unparsable body or shrinking history is a failure."""
+    import app
+
+    client = app.app.test_client()
+    start_event.wait()
+    reads, failures, last_rows = 0, [], 0
+    while not stop_event.is_set():
+        for endpoint in ("historical_data", "forecast"):
+            response = client.get(f"/{endpoint}/{MODEL_NAME}")
+            reads += 1
+            try:
+                body = response.get_json()
+            except Exception as e:
+                body = None
+                failures.append(f"reader {reader_id}: /{endpoint} body did not parse: {e}")
+            if response.status_code != 200 or not isinstance(body, list) or not body:
+                failures.append(f"reader {reader_id}: /{endpoint} returned {response.status_code}")
+                continue
+            if endpoint == "historical_data":
+                if len(body) < last_rows:
+                    failures.append(f"reader {reader_id}: history shrank from {last_rows} to {len(body)} rows")
+                last_rows = len(body)
+    result_queue.put(("reader", reads, failures))
+
+
+def seed():
+    """Initial history and forecast, so both read endpoints answer from the start."""
+    _quiet()
+    import numpy as np
+    import pandas as pd
+    import services
+
+    df = pd.DataFrame({"ds": pd.date_range(SEED_START, periods=SEED_POINTS, freq="D"),
+                       "y": np.random.default_rng(0).normal(100, 10, SEED_POINTS)})
+    services._process_and_save_historical_data(MODEL_NAME, df)
+    success, message = services.retrain_from_saved_history(MODEL_NAME)
+    if not success:
+        raise SystemExit(f"Error: Could not seed the forecast: {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=50, help="Points posted by each writer.")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--backend", default="csv", choices=["csv", "parquet"])
+    args = parser.parse_args()
+    if SEED_POINTS + args.writers * args.updates > 365:
+        parser.error("writers * updates must stay within the 365-day history window (at most 335 points).")
+
+    # DATA_DIR is relative, so every process (spawned with this cwd) works in the temporary directory.
+    os.environ["STORAGE_BACKEND"] = args.backend
+    tmp_dir = tempfile.mkdtemp(prefix="stress_")
+    os.chdir(tmp_dir)
+    seed()
+
+    context = multiprocessing.get_context("spawn")
+    start_event, stop_event = context.Event(), context.Event()
+    results = context.Queue()
+    writers = [context.Process(target=writer, args=(i, args.writers, args.updates, start_event, results))
+               for i in range(args.writers)]
+    others = [context.Process(target=reader, args=(i, stop_event, start_event, results)) for i in range(args.readers)]
+    others.append(context.Process(target=retrainer, args=(stop_event, start_event, results)))
+    for process in writers + others:
+        process.start()
+
+    time.sleep(5)  # Let every process finish importing before the burst
+    started = time.perf_counter()
+    start_event.set()
+    reports = [results.get() for _ in writers]
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+    reports += [results.get() for _ in others]
+    for process in writers + others:
+        process.join()
+
+    failures = [failure for report in reports for failure in report[-1]]
+    reads = sum(report[1] for report in reports if report[0] == "reader")
+    fits = sum(report[1] for report in reports if report[0] == "retrainer")
+
+    import services
+    history = services.load_historical_data(MODEL_NAME)
+    expected = SEED_POINTS + args.writers * args.updates
+    if len(history) != expected:
+        failures.append(f"history has {len(history)} rows, expected {expected} (lost updates)")
+
+    print(f"backend={args.backend} writers={args.writers} updates/writer={args.updates} readers={args.readers}")
+    print(f"{args.writers * args.updates} updates in {elapsed:.1f}s ({args.writers * args.updates / elapsed:.1f}/s), "
+          f"{reads} reads, {fits} forecast rewrites, {len(history)} history rows")
+    for failure in failures[:20]:
+        print(f"Error: {failure}")
+    if failures:
+        print(f"Error: {len(failures)} failure(s). Files left in {tmp_dir}")
+        sys.exit(1)
+    os.chdir(REPO_ROOT)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    print("Success: no lost updates and no failed reads.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Streaming parsers for bulk uploads: POST /update_forecast/<model_name> with an NDJSON or CSV body,
+and NDJSON/CSV files given to update_forecast.py.
+
+The body is read in blocks of BULK_CHUNK_BYTES and each block is parsed by pyarrow into typed
+columns; 'ds' and 'y' are then converted with one vectorized call per block ('ds' values with a
+UTC offset become naive UTC, whichever rows share their block). Rows that cannot be used are
+dropped and counted by reason in the returned stats:
+
+    malformed       a line that is not a JSON object, or a CSV row with the wrong number of fields
+    invalid_ds      missing or unparseable 'ds'
+    invalid_y       missing, non-numeric or infinite 'y'
+    missing_series  no 'series' value (multi-series models only)
+
+pyarrow rejects a whole NDJSON block for one malformed line (or a value of another JSON type,
+e.g. "y": "12"); such lines are found from the row pyarrow reports and parsed with json.loads
+while the lines around them keep the fast path (see _read_ndjson_block).
+"""
+import csv
+import io
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+from config import BULK_CHUNK_BYTES
+
+NDJSON = "ndjson"
+CSV = "csv"
+FORMATS = (NDJSON, CSV)
+
+CONTENT_TYPES = {
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/x-jsonlines": NDJSON,
+    "text/csv": CSV,
+    "application/csv": CSV,
+}
+EXTENSIONS = {".ndjson": NDJSON, ".jsonl": NDJSON, ".csv": CSV}
+
+REJECT_REASONS = ("malformed", "invalid_ds", "invalid_y", "missing_series")
+
+
+def format_for(content_type=None, filename=None):
+    """NDJSON or CSV for a request mimetype or a file name, else None."""
+    if content_type:
+        return CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    if filename:
+        return EXTENSIONS.get(("." + filename.rsplit(".", 1)[-1].lower()) if "." in filename else "")
+    return None
+
+
+def new_stats():
+    return {"rows": 0, "accepted": 0, "rejected": 0, **{reason: 0 for reason in REJECT_REASONS}}
+
+
+# A number as pyarrow casts it to float64; other strings (and "nan"/"inf") become invalid 'y' values.
+NUMBER_PATTERN = r"^[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?$"
+ERROR_ROW_PATTERN = re.compile(r"in row (\d+)")
+RETRY_ROWS = 2048  # After a failed pyarrow parse, the rest of an NDJSON block is parsed in pieces of this many lines
+MAX_FAST_PATH_RETRIES = 256  # Failed pyarrow parses per NDJSON block before the rest of it goes line by line
+
+
+def _parse_ds(values):
+    """Naive datetimes, the same for every block: values with a UTC offset are converted to UTC, naive ones kept."""
+    return pd.to_datetime(values, errors='coerce', format='ISO8601', utc=True).dt.tz_localize(None)
+
+
+def _parse_y(values):
+    """float64 values (NaN where invalid) from a pyarrow string or float64 column."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    if pa.types.is_string(values.type):
+        values = pc.utf8_trim_whitespace(values)
+        numbers = pc.if_else(pc.match_substring_regex(values, NUMBER_PATTERN), values, pa.scalar(None, pa.string()))
+        values = pc.cast(numbers, pa.float64())
+    return values.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+
+
+def _typed(table, with_series, stats):
+    """Converts a block's columns and drops the unusable rows. Returns a ds/y(/series) DataFrame."""
+    ds = _parse_ds(table.column("ds").to_pandas())
+    y = _parse_y(table.column("y"))
+    valid_ds = ds.notna().to_numpy()
+    valid_y = np.isfinite(y)
+    stats["invalid_ds"] += int((~valid_ds).sum())
+    stats["invalid_y"] += int((valid_ds & ~valid_y).sum())
+    keep = valid_ds & valid_y
+    columns = {'ds': ds.to_numpy()[keep], 'y': y[keep]}
+    if with_series:
+        keys = table.column("series").to_pandas().astype("string")
+        has_series = (keys.notna() & (keys.str.strip().str.len() > 0)).to_numpy(dtype=bool)
+        stats["missing_series"] += int((keep & ~has_series).sum())
+        keep &= has_series
+        columns = {'series': keys.to_numpy(dtype=object)[keep], 'ds': ds.to_numpy()[keep], 'y': y[keep]}
+    df = pd.DataFrame(columns)
+    stats["accepted"] += len(df)
+    return df
+
+
+def _ndjson_schema(with_series):
+    import pyarrow as pa
+    fields = [("ds", pa.string()), ("y", pa.float64())]
+    return pa.schema(fields + ([("series", pa.string())] if with_series else []))
+
+
+def _json_number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _ndjson_table_by_line(lines, schema, stats):
+    """The slow path: json.loads per line, counting the malformed ones. Returns a table of `schema`."""
+    import pyarrow as pa
+    points = []
+    for line in lines:
+        if not line.strip():
+            continue
+        stats["rows"] += 1
+        try:
+            point = json.loads(line)
+        except ValueError:
+            point = None
+        if isinstance(point, dict):
+            points.append(point)
+        else:
+            stats["malformed"] += 1
+    text = lambda value: None if value is None else str(value)
+    columns = {'ds': pa.array([text(point.get('ds')) for point in points], pa.string()),
+               'y': pa.array([_json_number(point.get('y')) for point in points], pa.float64())}
+    if 'series' in schema.names:
+        columns['series'] = pa.array([text(point.get('series')) for point in points], pa.string())
+    return pa.table(columns, schema=schema)
+
+
+def _read_ndjson_block(block, parse_options, stats):
+    """
+    Parses a block of whole lines into a list of tables, in line order. pyarrow rejects the whole
+    input for one bad line but names its row, so after a failure the rows before it are parsed
+    again on their own, the bad line with json.loads, and the rest in pieces of RETRY_ROWS lines
+    the same way: a few bad lines cost a few small extra parses, not a json.loads per line. After
+    MAX_FAST_PATH_RETRIES failures (e.g. every 'y' a string) the rest goes line by line.
+    """
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+    schema = parse_options.explicit_schema
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buffer == ord("\n"))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    blank = (lengths == 0) | ((lengths == 1) & (buffer[starts] == ord("\r")))
+    starts, ends = starts[~blank], ends[~blank]  # Row i of a pyarrow error is line i here (blank lines are not rows)
+
+    tables, failures = [], 0
+    pending = [(0, len(starts))]  # Line ranges still to parse, popped from the end
+    while pending:
+        first, last = pending.pop()
+        if first >= last:
+            continue
+        segment = block[starts[first]:ends[last - 1] + 1]
+        if failures > MAX_FAST_PATH_RETRIES or last - first == 1 and failures:
+            tables.append(_ndjson_table_by_line(segment.split(b"\n"), schema, stats))
+            continue
+        try:
+            table = pa_json.read_json(io.BytesIO(segment), parse_options=parse_options,
+                                      read_options=pa_json.ReadOptions(use_threads=False, block_size=len(segment) + 1))
+        except pa.ArrowInvalid as e:
+            failures += 1
+            match = ERROR_ROW_PATTERN.search(str(e))
+            bad = first + int(match.group(1)) if match else last
+            if bad >= last:
+                tables.append(_ndjson_table_by_line(segment.split(b"\n"), schema, stats))
+                continue
+            pieces = [(piece, min(piece + RETRY_ROWS, last)) for piece in range(bad + 1, last, RETRY_ROWS)]
+            pending += pieces[::-1] + [(bad, bad + 1), (first, bad)]
+        else:
+            stats["rows"] += table.num_rows
+            tables.append(table)
+    return tables
+
+
+def _iter_ndjson(stream, with_series, stats, chunk_bytes):
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+    parse_options = pa_json.ParseOptions(explicit_schema=_ndjson_schema(with_series), unexpected_field_behavior="ignore")
+    rest = b""
+    while True:
+        data = stream.read(chunk_bytes)
+        block = rest + (data or b"")
+        if data:
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:  # One line longer than a block; keep reading
+                rest = block
+                continue
+            block, rest = block[:cut], block[cut:]
+        elif block and not block.endswith(b"\n"):
+            block += b"\n"
+        if block.strip():
+            yield _typed(pa.concat_tables(_read_ndjson_block(block, parse_options, stats)), with_series, stats)
+        if not data:
+            return
+
+
+def _iter_csv(stream, with_series, stats, chunk_bytes):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    header_line = stream.readline()
+    if not header_line.strip():
+        return
+    header = next(csv.reader([header_line.decode("utf-8-sig")]))
+    required = ['series', 'ds', 'y'] if with_series else ['ds', 'y']
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f"CSV header must contain {', '.join(repr(c) for c in required)} columns; missing {', '.join(missing)}.")
+
+    def malformed_row(row):
+        stats["rows"] += 1
+        stats["malformed"] += 1
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(column_names=header, block_size=chunk_bytes),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=malformed_row),
+        convert_options=pa_csv.ConvertOptions(include_columns=required,
+                                              column_types={column: pa.string() for column in required}),
+    )
+    for batch in reader:
+        stats["rows"] += batch.num_rows
+        yield _typed(batch, with_series, stats)
+
+
+def read_points(stream, fmt, with_series=False, chunk_bytes=BULK_CHUNK_BYTES):
+    """
+    Parses a binary stream of NDJSON or CSV points ('ds', 'y', plus 'series' if with_series).
+    Returns (DataFrame with ds/y(/series), stats). Raises ValueError for an unknown format or a CSV
+    header without the required columns.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown bulk format '{fmt}'. Expected one of: {', '.join(FORMATS)}.")
+    stats = new_stats()
+    iter_blocks = _iter_ndjson if fmt == NDJSON else _iter_csv
+    blocks = [df for df in iter_blocks(stream, with_series, stats, chunk_bytes) if len(df)]
+    stats["rejected"] = stats["rows"] - stats["accepted"]
+    columns = ['series', 'ds', 'y'] if with_series else ['ds', 'y']
+    if not blocks:
+        return pd.DataFrame(columns=columns), stats
+    return pd.concat(blocks, ignore_index=True), stats
@@ -5,7 +5,15 @@ from dotenv import load_dotenv
 load_dotenv()
 
 DATA_DIR = "prophet_data"
-HISTORICAL_WINDOW_DAYS = 365  # Define the rolling window size
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv")  # "csv" or "parquet" (see storage.py)
+HISTORICAL_WINDOW_DAYS = 365  # Default rolling window (days before the newest point); see history.py for per-model "window_days"/"window_rows"
+FORECAST_HORIZON_DAYS = 30  # Horizon of the forecast saved after each (re)train
+MAX_FORECAST_HORIZON = 3650  # Upper bound for /forecast/<model_name>?horizon=N
+FORECAST_RESULT_CACHE_SIZE = 256  # On-demand predictions kept per process (LRU)
+RESPONSE_CHUNK_ROWS = 5000  # Rows per piece of a streamed /forecast or /historical_data body (?format=, ?since=, ...)
+GZIP_MIN_BYTES = 1024  # Cached JSON bodies smaller than this are sent uncompressed even if the client accepts gzip
+GZIP_LEVEL = 6
+BULK_CHUNK_BYTES = 4 * 1024 * 1024  # Bytes parsed at a time from an NDJSON/CSV body for /update_forecast or update_forecast.py (see bulk_ingest.py)
 POCKETBASE_URL = os.getenv("NEXT_PUBLIC_POCKETBASE_URL")
 
 # PocketBase Collection Configuration
@@ -14,11 +22,15 @@ POCKETBASE_COLLECTION_CONFIG = {
         "collection_name": "sales_records",
         "ds_field": "sale_date",
         "y_field": "amount",
+        # Example: refresh every 6 hours instead of SCHEDULER_REFRESH_MINUTES
+        # "refresh_minutes": 360,
     },
     "part_stock_log": {
         "collection_name": "inventory_movements",
         "ds_field": "movement_date",
         "y_field": "quantity_change",
+        # Example: keep two years instead of HISTORICAL_WINDOW_DAYS ("window_rows": N keeps the last N points)
+        # "window_days": 730,
         # Example: if you need to sum daily changes for part_stock_log
         "aggregation_method": "sum" 
     },
@@ -32,9 +44,92 @@ POCKETBASE_COLLECTION_CONFIG = {
         "ds_field": "created",
         "y_field": None,  # y is a count, so no specific field needed for value
         "aggregation_method": "count"  # Special handling for counting records
-    }
+    },
+    # Multi-series models: one series per distinct value of "series_key" (see series.py); they
+    # need pyarrow. Examples (the field names must match your collections):
+    # "product_stocks_by_product": {
+    #     "collection_name": "daily_product_stock_levels",
+    #     "ds_field": "record_date",
+    #     "y_field": "stock_level",
+    #     "series_key": "product",
+    #     # Coherent total and per-category forecasts (see hierarchy.py); the CSV in DATA_DIR
+    #     # has a "product" column and a "category" column
+    #     # "hierarchy": {"levels": ["category"], "mapping": "product_categories.csv", "method": "mint_diag"},
+    # },
+    # "part_stock_log_by_part": {
+    #     "collection_name": "inventory_movements",
+    #     "ds_field": "movement_date",
+    #     "y_field": "quantity_change",
+    #     "aggregation_method": "sum",
+    #     "series_key": "part",
+    # },
     # Add other models here
 }
 
+# PocketBase list API paging (see pb_fetch.py)
+PB_PAGE_SIZE = int(os.getenv("PB_PAGE_SIZE", 500))
+PB_FETCH_CONCURRENCY = int(os.getenv("PB_FETCH_CONCURRENCY", 4))  # Pages in flight per fetch
+PB_FETCH_RETRIES = 3
+PB_RETRY_BACKOFF_SECONDS = 0.5  # Doubled after each failed attempt
+PB_REQUEST_TIMEOUT_SECONDS = 30
+BACKFILL_MONTH_CONCURRENCY = 4  # Months fetched at once by /backfill/<model_name>
+MAX_BACKFILL_MONTHS = 120
+PB_MAX_CONNECTIONS = int(os.getenv("PB_MAX_CONNECTIONS", 16))  # Pool size of the shared client (all concurrent fetches)
+PB_ADMIN_EMAIL = os.getenv("PB_ADMIN_EMAIL")  # Superuser credentials; requests are anonymous when unset
+PB_ADMIN_PASSWORD = os.getenv("PB_ADMIN_PASSWORD")
+
+# Background retrain jobs (see jobs.py). Prophet/Stan fits are CPU-bound, so they run
+# on a bounded process pool instead of inside the Flask request handlers.
+RETRAIN_WORKERS = int(os.getenv("RETRAIN_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+MAX_FINISHED_JOBS = 500  # Finished jobs kept around for /jobs/<id> lookups
+JOB_COORDINATOR_THREADS = 1  # /trigger_update_all jobs run in the API process one at a time; later requests queue (and coalesce)
+
+# Background refresh daemon (see scheduler.py): incremental PocketBase pulls and retrains per model.
+# A POCKETBASE_COLLECTION_CONFIG entry may set its own "refresh_minutes" (None: never scheduled).
+SCHEDULER_REFRESH_MINUTES = 24 * 60
+SCHEDULER_STAGGER_SECONDS = int(os.getenv("SCHEDULER_STAGGER_SECONDS", 60))  # Least time between two runs starting
+SCHEDULER_MAX_CONCURRENT_FITS = int(os.getenv("SCHEDULER_MAX_CONCURRENT_FITS", RETRAIN_WORKERS))
+SCHEDULER_RETRY_SECONDS = 600  # A failed run is retried after this long (or at its next slot, if sooner)
+SCHEDULER_INITIAL_FETCH_DAYS = HISTORICAL_WINDOW_DAYS  # Days fetched by a model's first run, before it has a high-water mark
+
+# Spans, counters and /metrics (see telemetry.py)
+METRICS_FLUSH_SECONDS = 2  # How often a process writes its totals for /metrics to pick up
+METRICS_FILES_MAX_AGE_SECONDS = 7 * 86400  # Totals of exited processes are dropped after this long
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") != "0"  # Allow the X-Profile request header (sampling profiler)
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.005
+
+# Fitted Prophet models are serialized to MODEL_STORE_DIR/<model_name>/v<N>.json.
+# Refits initialize Stan from the previous version's parameters (warm start).
+MODEL_STORE_DIR = os.path.join(DATA_DIR, "models")
+MODEL_VERSIONS_TO_KEEP = 3
+WARM_START_REFITS = os.getenv("WARM_START_REFITS", "1") != "0"
+
+# Forecaster behind each retrain (see forecasters.py): "prophet", one of the NumPy baselines
+# ("seasonal_naive", "moving_average", "holt_winters") or "auto", which picks per series by
+# holdout error (opt-in: it may move a model off Prophet). A POCKETBASE_COLLECTION_CONFIG entry
+# may set its own "forecaster".
+FORECASTER = os.getenv("FORECASTER", "prophet")
+FORECASTER_RESELECT_DAYS = 7  # "auto" reuses a series' last holdout winner this long before re-running the contest
+PROPHET_MIN_IMPROVEMENT = 0.05  # "auto" only picks Prophet if its holdout MAE beats the best baseline by this fraction
+
+# Rolling-origin backtests (see backtest.py and /metrics/<model_name>)
+BACKTEST_HORIZON_DAYS = FORECAST_HORIZON_DAYS  # Days scored after each cutoff
+BACKTEST_CUTOFFS = 5
+MAX_BACKTEST_CUTOFFS = 50
+BACKTEST_PERIOD_DAYS = 15  # Days between cutoffs
+BACKTEST_TRAIN_DAYS = 180  # Training window of every fold; fixed, so cached folds stay valid as the history rolls
+BACKTEST_CACHE_MAX_AGE_DAYS = 30  # Cached folds not used for this long are deleted
+
+# Multi-series models (see series.py). Series are hashed into SERIES_BUCKETS partitions; a
+# bucket is the unit of batch training, so more buckets means smaller, better balanced chunks.
+SERIES_BUCKETS = 64
+SERIES_TRAIN_WORKERS = int(os.getenv("SERIES_TRAIN_WORKERS", os.cpu_count() or 1))  # CLI/benchmark pool size
+SERIES_UNCERTAINTY_SAMPLES = 200  # Prophet's default is 1000; sampling dominates predict time for short series
+
+# Hierarchical reconciliation of multi-series models with a "hierarchy" (see hierarchy.py): only
+# the series are fitted; totals and groups get a cheap baseline and all forecasts are made coherent.
+HIERARCHY_METHOD = "mint_diag"  # "bottom_up", "ols", "wls_struct" or "mint_diag"; a "hierarchy" may set its own "method"
+HIERARCHY_AGGREGATE_FORECASTER = "holt_winters"  # Baseline fitted to each total/group node's summed history
+
 # Ensure DATA_DIR exists when this module is loaded
 os.makedirs(DATA_DIR, exist_ok=True)
\ No newline at end of file
@@ -0,0 +1,247 @@
+"""
+Forecasters behind a retrain: Prophet, or one of three NumPy baselines that fit in
+milliseconds and do as well on short or low-signal series (sparse counts, flat stock levels).
+
+    seasonal_naive  each day repeats the same weekday of the last week
+    moving_average  flat at the mean of the last MOVING_AVERAGE_WINDOW days
+    holt_winters    additive weekly Holt-Winters with a damped trend; the smoothing parameters
+                    are chosen by one-step error over a grid that is fitted in a single pass
+
+"auto" (opt-in, see FORECASTER in config.py; Prophet is the default) holds out the last days of the history, scores
+every baseline on them and picks the lowest MAE. Prophet takes part once a series has enough
+points, but only wins if it beats the best baseline by PROPHET_MIN_IMPROVEMENT. The winner is
+reused for FORECASTER_RESELECT_DAYS, so most retrains never fit Prophet at all.
+
+Baseline forecasts have Prophet's ds/yhat/yhat_lower/yhat_upper layout (history rows followed by
+the horizon, 80% intervals), so the saved forecast and /forecast look the same either way.
+The Prophet fit itself (warm starts, model store) stays with the callers.
+"""
+import importlib.metadata
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from config import FORECASTER, FORECASTER_RESELECT_DAYS, POCKETBASE_COLLECTION_CONFIG, PROPHET_MIN_IMPROVEMENT
+
+SEASON = 7  # Daily data, weekly seasonality
+MOVING_AVERAGE_WINDOW = 7
+INTERVAL_Z = 1.2816  # Two-sided 80% normal interval, Prophet's default interval_width
+HOLT_WINTERS_DAMPING = 0.98
+HOLT_WINTERS_GRID = np.array(np.meshgrid([0.1, 0.3, 0.5, 0.8],   # alpha (level)
+                                         [0.0, 0.05, 0.2],       # beta (trend)
+                                         [0.05, 0.2, 0.5],       # gamma (season)
+                                         indexing="ij")).reshape(3, -1)
+
+# Fewest history points each forecaster accepts. Prophet's is the repo's long-standing minimum.
+MIN_POINTS = {"prophet": 20, "seasonal_naive": 2, "moving_average": 2, "holt_winters": 2 * SEASON, "auto": 2}
+PROPHET_MIN_POINTS = MIN_POINTS["prophet"]
+MIN_HOLDOUT_DAYS = SEASON  # Shorter histories skip the contest (see _short_history_choice)
+
+
+def _rms(residuals):
+    return float(np.sqrt(np.mean(np.square(residuals)))) if len(residuals) else 0.0
+
+
+def seasonal_naive(y, horizon):
+    """Returns (fitted, forecast, fitted_sigma, forecast_sigma) for a regular daily array y."""
+    season = SEASON if len(y) > SEASON else 1
+    fitted = y.copy()  # The first season has nothing to repeat; it fits itself
+    fitted[season:] = y[:-season]
+    forecast = np.resize(y[-season:], horizon)
+    sigma = _rms(y[season:] - y[:-season])
+    # A seasonal random walk: the error grows with the number of whole seasons ahead
+    steps = np.arange(horizon)
+    return fitted, forecast, sigma, sigma * np.sqrt(steps // season + 1)
+
+
+def moving_average(y, horizon):
+    """Returns (fitted, forecast, fitted_sigma, forecast_sigma) for a regular daily array y."""
+    n = len(y)
+    window = min(MOVING_AVERAGE_WINDOW, n)
+    cumulative = np.concatenate([[0.0], np.cumsum(y)])
+    t = np.arange(1, n)
+    start = np.maximum(t - window, 0)
+    fitted = y.copy()
+    fitted[1:] = (cumulative[t] - cumulative[start]) / (t - start)  # Mean of the window before each day
+    forecast = np.full(horizon, y[-window:].mean())
+    sigma = _rms(y[1:] - fitted[1:])
+    return fitted, forecast, sigma, np.full(horizon, sigma)
+
+
+def holt_winters(y, horizon):
+    """
+    Returns (fitted, forecast, fitted_sigma, forecast_sigma) for a regular daily array y of at
+    least two seasons. Every grid point is smoothed at once (one array lane each).
+    """
+    n = len(y)
+    alpha, beta, gamma = HOLT_WINTERS_GRID
+    phi = HOLT_WINTERS_DAMPING
+    lanes = alpha.shape[0]
+    level = np.full(lanes, y[:SEASON].mean())
+    trend = np.full(lanes, (y[SEASON:2 * SEASON].mean() - y[:SEASON].mean()) / SEASON)
+    seasonal = np.tile(y[:SEASON] - y[:SEASON].mean(), (lanes, 1))
+    fitted = np.empty((lanes, n))
+    for t in range(n):
+        i = t % SEASON
+        fitted[:, t] = level + phi * trend + seasonal[:, i]
+        new_level = alpha * (y[t] - seasonal[:, i]) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        seasonal[:, i] = gamma * (y[t] - new_level) + (1 - gamma) * seasonal[:, i]
+        level = new_level
+
+    # The first season only reproduces the initial state, so it is left out of the score
+    errors = np.mean(np.square(y[SEASON:] - fitted[:, SEASON:]), axis=1)
+    best = int(np.argmin(errors))
+    steps = np.arange(1, horizon + 1)
+    damped_trend = np.cumsum(phi ** steps) * trend[best]
+    forecast = level[best] + damped_trend + seasonal[best, (n + steps - 1) % SEASON]
+    sigma = float(np.sqrt(errors[best]))
+    # Error growth of simple exponential smoothing with the chosen alpha
+    return fitted[best], forecast, sigma, sigma * np.sqrt(1 + (steps - 1) * alpha[best] ** 2)
+
+
+BASELINES = {
+    "seasonal_naive": seasonal_naive,
+    "moving_average": moving_average,
+    "holt_winters": holt_winters,
+}  # Cheapest first: ties in the contest go to the earlier one
+FORECASTER_NAMES = ("auto", "prophet", *BASELINES)
+
+
+@lru_cache(maxsize=1)
+def prophet_version():
+    """Installed Prophet version, read from the package metadata so Prophet itself is not imported."""
+    return importlib.metadata.version("prophet")
+
+
+def configured_forecaster(model_name):
+    """The model's own "forecaster" setting, or the FORECASTER default."""
+    return POCKETBASE_COLLECTION_CONFIG.get(model_name, {}).get("forecaster", FORECASTER)
+
+
+# Collection config keys that do not shape a model's fitted forecasts: when the scheduler
+# refreshes it, and the reconciliation stage (hierarchy.py keeps its own fingerprint)
+UNFITTED_CONFIG_KEYS = ("refresh_minutes", "hierarchy")
+
+
+def fitted_config(model_name):
+    """The model's collection config without UNFITTED_CONFIG_KEYS, for fingerprints and cache keys; None if unknown."""
+    collection = POCKETBASE_COLLECTION_CONFIG.get(model_name)
+    if collection is None:
+        return None
+    return {key: value for key, value in collection.items() if key not in UNFITTED_CONFIG_KEYS}
+
+
+def to_daily(df):
+    """
+    Puts a ds/y history on a regular daily grid (gaps interpolated linearly, duplicate days
+    averaged). Returns (grid, y) as a DatetimeIndex and a float64 array.
+    """
+    days = pd.to_datetime(df['ds']).dt.floor('D')
+    values = pd.Series(pd.to_numeric(df['y'], errors='coerce').to_numpy(dtype=np.float64), index=days.to_numpy())
+    values = values.dropna().groupby(level=0).mean()
+    grid = pd.date_range(values.index[0], values.index[-1], freq='D')
+    y = values.reindex(grid).interpolate(method='linear').to_numpy(dtype=np.float64)
+    return grid, y
+
+
+def future_dates(last_ds, horizon, freq='D'):
+    """The same future dates as Prophet's make_future_dataframe(periods=horizon, freq=freq)."""
+    dates = pd.date_range(start=last_ds, periods=horizon + 1, freq=freq)
+    return dates[dates > last_ds][:horizon]
+
+
+def baseline_forecast(forecaster_name, historical_df, horizon, freq='D', include_uncertainty=True):
+    """
+    Fits a baseline to a ds/y history and returns its forecast in Prophet's layout: one row per
+    history date, then `horizon` periods of `freq` (a pandas offset, 'D' by default).
+    """
+    ds = pd.Series(pd.to_datetime(historical_df['ds']).sort_values().unique())
+    grid, y = to_daily(historical_df)
+    future = future_dates(ds.iloc[-1], horizon, freq)
+    days_ahead = max(1, (future[-1].floor('D') - grid[-1]).days) if len(future) else 1
+    fitted, forecast, fitted_sigma, forecast_sigma = BASELINES[forecaster_name](y, days_ahead)
+
+    history_positions = grid.get_indexer(ds.dt.floor('D'))
+    future_positions = (future.floor('D') - grid[-1]).days.to_numpy() - 1
+    yhat = np.concatenate([fitted[history_positions], forecast[future_positions]])
+    result = pd.DataFrame({'ds': np.concatenate([ds.to_numpy(), future.to_numpy()]), 'yhat': yhat})
+    if include_uncertainty:
+        sigma = np.concatenate([np.full(len(ds), fitted_sigma), forecast_sigma[future_positions]])
+        result['yhat_lower'] = yhat - INTERVAL_Z * sigma
+        result['yhat_upper'] = yhat + INTERVAL_Z * sigma
+    return result
+
+
+def _prophet_holdout_forecast(historical_df, cutoff, holdout_dates):
+    from prophet import Prophet
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    train_df = historical_df.loc[pd.to_datetime(historical_df['ds']) < cutoff, ['ds', 'y']]
+    model = Prophet(uncertainty_samples=0)  # Only yhat is scored
+    model.fit(train_df)
+    return model.predict(pd.DataFrame({'ds': holdout_dates}))['yhat'].to_numpy()
+
+
+def holdout_scores(historical_df, horizon, include_prophet=True):
+    """
+    Holdout MAE of each eligible forecaster on the last min(horizon, len/4) days of the history.
+    Returns {} when the history is too short for a meaningful holdout.
+    """
+    grid, y = to_daily(historical_df)
+    holdout = min(horizon, len(y) // 4)
+    if holdout < MIN_HOLDOUT_DAYS:
+        return {}
+    train, actual = y[:-holdout], y[-holdout:]
+    scores = {}
+    for name, forecaster in BASELINES.items():
+        if len(train) >= MIN_POINTS[name]:
+            scores[name] = float(np.mean(np.abs(forecaster(train, holdout)[1] - actual)))
+    cutoff = grid[-holdout]
+    if include_prophet and (pd.to_datetime(historical_df['ds']) < cutoff).sum() >= PROPHET_MIN_POINTS:
+        scores["prophet"] = float(np.mean(np.abs(_prophet_holdout_forecast(historical_df, cutoff, grid[-holdout:]) - actual)))
+    return scores
+
+
+def _short_history_choice(points):
+    return "seasonal_naive" if points >= 2 * SEASON else "moving_average"
+
+
+def _pick(scores):
+    baselines = {name: score for name, score in scores.items() if name != "prophet"}
+    best = min(baselines, key=baselines.get)  # First (cheapest) on ties
+    if "prophet" in scores and scores["prophet"] < baselines[best] * (1 - PROPHET_MIN_IMPROVEMENT):
+        return "prophet"
+    return best
+
+
+def _selection_is_reusable(selection, points, now):
+    if not selection or selection.get("forecaster") not in MIN_POINTS:
+        return False
+    if points < MIN_POINTS[selection["forecaster"]]:
+        return False
+    try:
+        selected_at = datetime.fromisoformat(selection["selected_at"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return now - selected_at < timedelta(days=FORECASTER_RESELECT_DAYS)
+
+
+def select_forecaster(configured, historical_df, horizon, previous=None):
+    """
+    Resolves a configured forecaster for one history. Returns the selection as a JSON-ready
+    dict: forecaster, selected_at, scores (holdout MAE per candidate; empty unless contested)
+    and points. Under "auto" a previous selection younger than FORECASTER_RESELECT_DAYS is
+    reused (forced refits included) as long as the history still has enough points for it.
+    """
+    now = datetime.utcnow()
+    points = len(historical_df)
+    if configured != "auto":
+        return {"forecaster": configured, "selected_at": now.isoformat(), "scores": {}, "points": points}
+    if _selection_is_reusable(previous, points, now):
+        return dict(previous, points=points)
+    scores = holdout_scores(historical_df, horizon)
+    forecaster_name = _pick(scores) if scores else _short_history_choice(points)
+    return {"forecaster": forecaster_name, "selected_at": now.isoformat(), "scores": scores, "points": points}
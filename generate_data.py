@@ -1,76 +1,164 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime
+"""
+Synthetic histories for testing and benchmarking.
+
+synthetic_series() returns `periods` points of any pandas frequency for one model's pattern,
+synthetic_panel() the same for `series_count` series of a multi-series model; generate_data()
+and generate_series_data() save them with the configured storage. Seasonality is computed on the
+whole date index at once, and the seed is derived with crc32 from the model name, so the same
+arguments give the same values in every process and run.
+
+Usage:
+    python generate_data.py <model_name> [--periods 365] [--freq D] [--seed 0] [--end YYYY-MM-DD]
+    python generate_data.py <series_model_name> [series_count] [--periods 365] ...
+"""
+import argparse
 import os
-import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import storage
+import series
+from config import DATA_DIR
 
-DATA_DIR = "prophet_data"
-MODEL_NAME = sys.argv[1] if len(sys.argv) > 1 else "sales"
 
-os.makedirs(DATA_DIR, exist_ok=True)
-output_filepath = os.path.join(DATA_DIR, f"{MODEL_NAME}_data.csv")
+def seed_for(name, seed=0):
+    """Stable across processes and runs (unlike hash())."""
+    return zlib.crc32(f"{name}:{seed}".encode("utf-8"))
 
-periods = 365
-np.random.seed(hash(MODEL_NAME) % (2**32 - 1))
 
-# Ensure date_range is timezone-naive from the start
-date_range = pd.date_range(end=pd.Timestamp.today().normalize(), periods=periods, freq='D')
+def _date_index(periods, freq, end):
+    end = pd.Timestamp.today().normalize() if end is None else pd.Timestamp(end)
+    return pd.date_range(end=end, periods=periods, freq=freq)
 
-y_values = None
 
-if MODEL_NAME == "sales":
+def _sales(ds, rng):
+    periods = len(ds)
     trend = np.linspace(100, 250, periods)
-    base_weekly_seasonality = np.array([1.0 + 0.2 * (1 if day.weekday() < 5 else -1) for day in date_range])
-    base_monthly_seasonality = []
-    for day in date_range:
-        if day.month in [11, 12, 1]: base_monthly_seasonality.append(1.2)
-        elif day.month in [6, 7, 8]: base_monthly_seasonality.append(0.9)
-        else: base_monthly_seasonality.append(1.0)
-    base_monthly_seasonality = np.array(base_monthly_seasonality)
-    weekly_effect = np.array([1.0 + 0.4 if day.weekday() >= 5 else 0.9 for day in date_range]) 
-    monthly_effect = base_monthly_seasonality * 1.1 
-    base_values = trend * weekly_effect * monthly_effect
-    noise = np.random.normal(loc=0, scale=20, size=periods)
-    y_values = np.clip(base_values + noise, 30, None).round().astype(int)
-elif MODEL_NAME == "part_stock_log":
-    trend = np.linspace(-15, 5, periods) 
-    weekly_effect = np.array([-2 if day.weekday() < 5 else 1 for day in date_range])
-    base_values = trend + weekly_effect
-    noise = np.random.normal(loc=0, scale=5, size=periods)
-    y_values = np.round(base_values + noise).astype(int)
-elif MODEL_NAME == "product_stocks":
-    trend = np.linspace(200, 50, periods) 
-    replenishment_spikes = np.zeros(periods)
-    for i in range(0, periods, 90): 
-        replenishment_spikes[i:i+3] = np.random.randint(100, 150)
-    base_values = trend + replenishment_spikes
-    noise = np.random.normal(loc=0, scale=10, size=periods)
-    y_values = np.clip(base_values + noise, 10, None).round().astype(int)
-elif MODEL_NAME == "service_request_counts":
-    trend = np.linspace(5, 25, periods) 
-    weekly_effect = np.array([1.2 if day.weekday() < 5 else 0.7 for day in date_range]) 
-    base_values = trend * weekly_effect
-    noise = np.random.normal(loc=0, scale=3, size=periods)
-    y_values = np.clip(base_values + noise, 0, None).round().astype(int) 
-else:
-    print(f"Warning: Data generation not specifically defined for model '{MODEL_NAME}'. Using generic pattern.")
+    weekly_effect = np.where(ds.weekday >= 5, 1.4, 0.9)
+    monthly_effect = np.select([ds.month.isin([11, 12, 1]), ds.month.isin([6, 7, 8])], [1.2, 0.9], 1.0) * 1.1
+    noise = rng.normal(loc=0, scale=20, size=periods)
+    return np.clip(trend * weekly_effect * monthly_effect + noise, 30, None)
+
+
+def _part_stock_log(ds, rng):
+    periods = len(ds)
+    trend = np.linspace(-15, 5, periods)
+    weekly_effect = np.where(ds.weekday < 5, -2, 1)
+    return trend + weekly_effect + rng.normal(loc=0, scale=5, size=periods)
+
+
+def _product_stocks(ds, rng):
+    periods = len(ds)
+    trend = np.linspace(200, 50, periods)
+    # A 3-day replenishment at the start of every 90-day cycle, whatever the frequency
+    day = np.asarray((ds - ds[0]) // pd.Timedelta(days=1))
+    spikes = rng.integers(100, 150, day[-1] // 90 + 1)[day // 90] * (day % 90 < 3)
+    noise = rng.normal(loc=0, scale=10, size=periods)
+    return np.clip(trend + spikes + noise, 10, None)
+
+
+def _service_request_counts(ds, rng):
+    periods = len(ds)
+    trend = np.linspace(5, 25, periods)
+    weekly_effect = np.where(ds.weekday < 5, 1.2, 0.7)
+    return np.clip(trend * weekly_effect + rng.normal(loc=0, scale=3, size=periods), 0, None)
+
+
+def _generic(ds, rng):
+    periods = len(ds)
     trend = np.linspace(50, 100, periods)
-    base_weekly_seasonality = np.array([1.0 + 0.2 * (1 if day.weekday() < 5 else -1) for day in date_range])
-    base_values = trend * base_weekly_seasonality
-    noise = np.random.normal(loc=0, scale=5, size=periods)
-    y_values = np.clip(base_values + noise, 1, None).round().astype(int)
+    weekly_effect = np.where(ds.weekday < 5, 1.2, 0.8)
+    return np.clip(trend * weekly_effect + rng.normal(loc=0, scale=5, size=periods), 1, None)
+
+
+# model name -> f(date index, rng) -> y values before rounding
+PATTERNS = {
+    "sales": _sales,
+    "part_stock_log": _part_stock_log,
+    "product_stocks": _product_stocks,
+    "service_request_counts": _service_request_counts,
+}
+
+
+def synthetic_series(model_name, periods=365, freq='D', end=None, seed=0):
+    """`periods` points (ds, y) of model_name's pattern at `freq`, ending at `end` (default today)."""
+    if periods < 1:
+        raise ValueError("periods must be at least 1.")
+    ds = _date_index(periods, freq, end)
+    pattern = PATTERNS.get(model_name)
+    if pattern is None:
+        print(f"Warning: Data generation not specifically defined for model '{model_name}'. Using generic pattern.")
+        pattern = _generic
+    y_values = pattern(ds, np.random.default_rng(seed_for(model_name, seed)))
+    return pd.DataFrame({'ds': ds, 'y': np.round(y_values).astype(int)})
+
+
+def synthetic_history(model_name, periods=365, freq='D', end=None, seed=0, now=None):
+    """synthetic_series() in the saved-history layout (storage.HISTORY_COLUMNS)."""
+    df = synthetic_series(model_name, periods, freq, end, seed)
+    df['created_at'] = df['updated_at'] = pd.Timestamp.now('UTC').tz_localize(None) if now is None else pd.Timestamp(now)
+    return df[storage.HISTORY_COLUMNS]
+
+
+def synthetic_panel(model_name, series_count=100, periods=365, freq='D', end=None, seed=0):
+    """
+    `periods` points for each of `series_count` series (SKU-0001, SKU-0002, ...), each with its
+    own level, trend and weekend effect. Columns series, ds, y; rows ordered by series, then ds.
+    """
+    rng = np.random.default_rng(seed_for(model_name, seed))
+    date_range = _date_index(periods, freq, end)
+    t = np.arange(periods)
+    weekend = np.asarray(date_range.weekday >= 5)
+
+    level = rng.uniform(20, 200, (series_count, 1))
+    slope = rng.normal(0, 0.05, (series_count, 1)) * level / periods * 10
+    weekly = 1.0 + rng.uniform(-0.3, 0.3, (series_count, 1)) * weekend
+    noise = rng.normal(0, 0.1, (series_count, periods)) * level
+    y_values = np.clip((level + slope * t) * weekly + noise, 0, None).round()
+
+    keys = [f"SKU-{i:04d}" for i in range(1, series_count + 1)]
+    return pd.DataFrame({
+        'series': np.repeat(keys, periods),
+        'ds': np.tile(date_range, series_count),
+        'y': y_values.ravel(),
+    })
+
+
+def generate_data(model_name, data_dir=DATA_DIR, periods=365, freq='D', end=None, seed=0):
+    """Generates synthetic data for model_name (a year of daily points by default) and saves it with the configured storage backend."""
+    os.makedirs(data_dir, exist_ok=True)
+    backend = storage.get_backend(data_dir)
+    output_filepath = backend.data_path(model_name)
+    df = synthetic_history(model_name, periods, freq, end, seed)
+    backend.write_history(model_name, df)
+    print(f"Success: Generated {output_filepath} for model '{model_name}' with {periods} points at frequency '{freq}'.")
+    return output_filepath
+
 
-now_iso = datetime.utcnow().isoformat()
+def generate_series_data(model_name, series_count=100, periods=365, data_dir=DATA_DIR, seed=0, freq='D', end=None):
+    """
+    Generates synthetic_panel() data for a multi-series model and merges it into the model's
+    bucketed series history. Returns the number of rows written.
+    """
+    df = synthetic_panel(model_name, series_count, periods, freq, end, seed)
+    series.merge_series_history(model_name, df, data_dir)
+    print(f"Success: Generated {series_count} series x {periods} points of data for model '{model_name}'.")
+    return len(df)
 
-df = pd.DataFrame({
-    'ds': date_range, # date_range is already timezone-naive
-    'y': y_values,
-    'created_at': now_iso,
-    'updated_at': now_iso
-})
 
-# Just to be absolutely sure, though date_range should be naive.
-df['ds'] = pd.to_datetime(df['ds']).dt.tz_localize(None)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic data for a model.")
+    parser.add_argument("model_name", nargs="?", default="sales")
+    parser.add_argument("series_count", nargs="?", type=int, default=100, help="Series to generate (multi-series models only).")
+    parser.add_argument("--periods", type=int, default=365, help="Points per series (default: 365).")
+    parser.add_argument("--freq", default="D", help="pandas frequency of the points, e.g. D, h, 15min (default: D).")
+    parser.add_argument("--end", default=None, help="Date of the last point (default: today).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
 
-df.to_csv(output_filepath, index=False)
-print(f"Success: Generated {output_filepath} for model '{MODEL_NAME}' with {periods} days of data.")
+    if series.is_series_model(args.model_name):
+        generate_series_data(args.model_name, args.series_count, args.periods, seed=args.seed, freq=args.freq, end=args.end)
+    else:
+        generate_data(args.model_name, periods=args.periods, freq=args.freq, end=args.end, seed=args.seed)
@@ -0,0 +1,23 @@
+"""
+gunicorn settings for the API (see wsgi.py). Start with:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Overridable through the environment: BIND, WEB_CONCURRENCY (worker processes) and
+WEB_THREADS (threads per worker).
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Import the app once in the master and fork the workers from it (copy-on-write).
+preload_app = True
+
+# Requests are short: reads are served from cached bodies and fits run on each worker's job
+# pool, so a few threads per worker cover requests waiting on I/O. Every worker has its own job
+# pool (RETRAIN_WORKERS processes), so keep workers * RETRAIN_WORKERS within the CPU count.
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", 4))
+timeout = 120
+graceful_timeout = 60  # Lets running jobs of a stopping worker finish
@@ -0,0 +1,315 @@
+"""
+Hierarchical reconciliation for multi-series models: coherent forecasts for a total, optional
+group levels (category, region, ...) and the series themselves, from a "hierarchy" entry in the
+model's POCKETBASE_COLLECTION_CONFIG:
+
+    "product_stocks_by_product": {
+        ...
+        "series_key": "product",
+        "hierarchy": {
+            "levels": ["category"],               # Group levels between the total and the series, top-down
+            "mapping": "product_categories.csv",  # In DATA_DIR: a 'product' (or 'series') column and one per level
+            "method": "mint_diag",                # Default HIERARCHY_METHOD
+        },
+    }
+
+Only the series (the leaves) are fitted, by series.train_series_model(), which runs the
+reconciliation after its buckets. Every total/group node gets a HIERARCHY_AGGREGATE_FORECASTER
+baseline fitted to the sum of its leaves' histories (milliseconds each), and the base forecasts
+are then made coherent over the horizon. With A the 0/1 matrix summing leaves into aggregates:
+
+    bottom_up   leaves as fitted; every aggregate is the sum of its leaves
+    ols         the least-squares projection of all base forecasts onto the coherent ones
+    wls_struct  the same, each node weighted by the number of leaves under it
+    mint_diag   MinT with a diagonal covariance: each node weighted by its in-sample residual variance
+
+With the weights W = diag(W_a, W_b) (aggregates, leaves) the reconciled leaves are
+
+    b~ = b^ + W_b A' (W_a + A W_b A')^-1 (a^ - A b^),    a~ = A b~
+
+so a model with thousands of leaves needs one solve the size of its aggregates and a few matrix
+products, for every horizon date at once. Intervals keep their base width around the reconciled
+value. Series without a forecast of their own (too few points) stay flat at their last value.
+
+Results go to DATA_DIR/<model>_series/hierarchy/forecast.parquet (level, node, ds, yhat,
+yhat_lower, yhat_upper) and are served by /forecast/<model_name>?level=<level>&node=<value>.
+Reconciliation is skipped while the bucket files, the mapping and the settings are unchanged.
+
+    python hierarchy.py product_stocks_by_product [--method bottom_up] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import forecasters
+import locks
+import series
+import telemetry
+from config import (
+    DATA_DIR,
+    FORECAST_HORIZON_DAYS,
+    HIERARCHY_AGGREGATE_FORECASTER,
+    HIERARCHY_METHOD,
+    POCKETBASE_COLLECTION_CONFIG,
+)
+from storage import atomic_path
+
+METHODS = ("bottom_up", "ols", "wls_struct", "mint_diag")
+TOTAL = "total"          # Level (and node) name of the root
+SERIES_LEVEL = "series"  # Level name of the leaves
+UNMAPPED = "(unmapped)"  # Group of series missing from the mapping file
+COLUMNS = ['level', 'node', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def hierarchy_config(model_name):
+    return POCKETBASE_COLLECTION_CONFIG.get(model_name, {}).get("hierarchy")
+
+
+def has_hierarchy(model_name):
+    return series.is_series_model(model_name) and hierarchy_config(model_name) is not None
+
+
+def hierarchy_levels(model_name):
+    """Every level of the model's hierarchy, top-down: total, the configured groups, series."""
+    return [TOTAL, *hierarchy_config(model_name).get("levels", []), SERIES_LEVEL]
+
+
+def get_hierarchy_dir(model_name, data_dir=DATA_DIR):
+    return os.path.join(series.get_series_dir(model_name, data_dir), "hierarchy")
+
+
+def reconciled_forecast_path(model_name, data_dir=DATA_DIR):
+    return os.path.join(get_hierarchy_dir(model_name, data_dir), "forecast.parquet")
+
+
+def read_reconciled_forecast(model_name, level, node=None, data_dir=DATA_DIR):
+    """The reconciled forecast of one node (every node of the level if node is None). Raises FileNotFoundError if there is none."""
+    import pyarrow.parquet as pq
+    if level == TOTAL:
+        node = TOTAL
+    filters = [('level', '=', level)] + ([('node', '=', str(node))] if node is not None else [])
+    df = pq.read_table(reconciled_forecast_path(model_name, data_dir), filters=filters).to_pandas()
+    if df.empty:
+        raise FileNotFoundError(f"No reconciled forecast for {level} '{node}' of '{model_name}'.")
+    return df
+
+
+def reconciled_forecast_signature(model_name, data_dir=DATA_DIR):
+    """(mtime_ns, size) of the reconciled forecast file, for caching responses."""
+    stat_result = os.stat(reconciled_forecast_path(model_name, data_dir))
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def read_mapping(model_name, leaves, data_dir=DATA_DIR):
+    """The group of every leaf at each configured level (a DataFrame indexed by leaf); unmapped leaves go to UNMAPPED."""
+    config = hierarchy_config(model_name)
+    levels = list(config.get("levels", []))
+    if not levels:
+        return pd.DataFrame(index=pd.Index(leaves, name='series'))
+    mapping = pd.read_csv(os.path.join(data_dir, config["mapping"]), dtype=str)
+    key = POCKETBASE_COLLECTION_CONFIG[model_name]["series_key"]
+    key_column = key if key in mapping.columns else 'series'
+    missing = [column for column in [key_column, *levels] if column not in mapping.columns]
+    if missing:
+        raise ValueError(f"Hierarchy mapping '{config['mapping']}' has no {', '.join(repr(c) for c in missing)} column(s).")
+    mapping = mapping.dropna(subset=[key_column]).drop_duplicates(key_column, keep='last').set_index(key_column)[levels]
+    return mapping.reindex(leaves).fillna(UNMAPPED)
+
+
+def aggregation_matrix(mapping):
+    """(A, nodes): A sums the leaves (columns, in mapping order) into the total and every group; nodes holds the (level, node) of its rows."""
+    leaf_count = len(mapping)
+    blocks, nodes = [np.ones((1, leaf_count))], [(TOTAL, TOTAL)]
+    for level in mapping.columns:
+        codes, groups = pd.factorize(mapping[level], sort=True)
+        block = np.zeros((len(groups), leaf_count))
+        block[codes, np.arange(leaf_count)] = 1.0
+        blocks.append(block)
+        nodes += [(level, group) for group in groups]
+    return np.vstack(blocks), nodes
+
+
+def _positive(variances):
+    """Variances usable as weights: missing ones get the mean, and none is below a millionth of it."""
+    variances = np.asarray(variances, dtype=np.float64)
+    finite = variances[np.isfinite(variances)]
+    mean = float(finite.mean()) if len(finite) and finite.mean() > 0 else 1.0
+    return np.maximum(np.where(np.isfinite(variances), variances, mean), mean * 1e-6)
+
+
+def reconcile_forecasts(A, base_aggregates, base_leaves, method, aggregate_variance=None, leaf_variance=None):
+    """
+    Coherent forecasts from base forecasts of the aggregates (rows of A x horizon) and the leaves
+    (columns of A x horizon). The variances are only used by "mint_diag". Returns (aggregates, leaves).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown reconciliation method '{method}'. Expected one of: {', '.join(METHODS)}.")
+    leaves = base_leaves
+    if method != "bottom_up":
+        if method == "ols":
+            w_a, w_b = np.ones(A.shape[0]), np.ones(A.shape[1])
+        elif method == "wls_struct":
+            w_a, w_b = A.sum(axis=1), np.ones(A.shape[1])
+        else:
+            w_a, w_b = _positive(aggregate_variance), _positive(leaf_variance)
+        weighted = A * w_b  # A W_b
+        gain = np.linalg.solve(np.diag(w_a) + weighted @ A.T, weighted).T  # W_b A' (W_a + A W_b A')^-1
+        leaves = base_leaves + gain @ (base_aggregates - A @ base_leaves)
+    return A @ leaves, leaves
+
+
+def _leaf_history_matrix(history, leaves):
+    """(grid, Y): every leaf's history on one daily grid, gaps inside a series interpolated and 0 outside it."""
+    daily = history.assign(ds=history['ds'].dt.floor('D')).pivot_table(index='series', columns='ds', values='y', aggfunc='mean')
+    grid = pd.date_range(daily.columns.min(), daily.columns.max(), freq='D')
+    daily = daily.reindex(index=leaves, columns=grid).T.interpolate(method='linear', limit_area='inside').T
+    return grid, daily.fillna(0.0).to_numpy(dtype=np.float64)
+
+
+def _leaf_forecast_matrix(forecasts, leaves, horizon_dates, column, fallback):
+    """One forecast column per leaf over the horizon; a leaf whose forecast ends earlier keeps its last value, one without any gets `fallback`."""
+    table = forecasts.pivot_table(index='series', columns='ds', values=column, aggfunc='last')
+    table = table.reindex(index=leaves, columns=table.columns.union(horizon_dates)).ffill(axis=1)
+    values = table[horizon_dates].to_numpy(dtype=np.float64, copy=True)
+    missing = np.isnan(values).all(axis=1)
+    values[missing] = fallback[missing, None]
+    return values, int(missing.sum())
+
+
+def _aggregate_forecasts(grid, Y_aggregates, horizon):
+    """The HIERARCHY_AGGREGATE_FORECASTER baseline of every aggregate. Returns (yhat, lower, upper, in-sample variance)."""
+    name = HIERARCHY_AGGREGATE_FORECASTER
+    if len(grid) < forecasters.MIN_POINTS[name]:
+        name = "moving_average"
+    yhat, lower, upper = (np.empty((len(Y_aggregates), horizon)) for _ in range(3))
+    variance = np.empty(len(Y_aggregates))
+    for i, y in enumerate(Y_aggregates):
+        with telemetry.span("fit", model="hierarchy", forecaster=name):
+            forecast = forecasters.baseline_forecast(name, pd.DataFrame({'ds': grid, 'y': y}), horizon)
+        yhat[i], lower[i], upper[i] = (forecast[column].to_numpy()[-horizon:] for column in ('yhat', 'yhat_lower', 'yhat_upper'))
+        variance[i] = np.mean(np.square(y - forecast['yhat'].to_numpy()[:len(grid)]))
+    return yhat, lower, upper, variance
+
+
+def _read_forecasts(model_name, data_dir):
+    buckets = series.list_buckets(model_name, "forecast", data_dir)
+    if not buckets:
+        return pd.DataFrame(columns=series.FORECAST_COLUMNS)
+    return pd.concat([series._read_bucket(series.forecast_bucket_path(model_name, b, data_dir)) for b in buckets], ignore_index=True)
+
+
+def _fingerprint(model_name, method, data_dir):
+    """Changes with the settings, the mapping file and any history or forecast bucket file."""
+    config = hierarchy_config(model_name)
+    settings = {"hierarchy": config, "method": method, "horizon_days": FORECAST_HORIZON_DAYS,
+                "aggregate_forecaster": HIERARCHY_AGGREGATE_FORECASTER}
+    paths = [series.history_bucket_path(model_name, b, data_dir) for b in series.list_buckets(model_name, "history", data_dir)]
+    paths += [series.forecast_bucket_path(model_name, b, data_dir) for b in series.list_buckets(model_name, "forecast", data_dir)]
+    if config.get("levels"):
+        paths.append(os.path.join(data_dir, config["mapping"]))
+    signatures = []
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+            signatures.append([path, stat_result.st_mtime_ns, stat_result.st_size])
+        except FileNotFoundError:
+            signatures.append([path, None, None])
+    return hashlib.sha256(json.dumps([settings, signatures], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def reconcile_model(model_name, method=None, force=False, data_dir=DATA_DIR):
+    """
+    Reconciles the saved leaf forecasts of a series model with a "hierarchy" and writes every
+    node's forecast. Returns (success, message, summary).
+    """
+    if not has_hierarchy(model_name):
+        return False, f"Model '{model_name}' has no hierarchy configured.", {}
+    method = method or hierarchy_config(model_name).get("method", HIERARCHY_METHOD)
+    if method not in METHODS:
+        return False, f"Unknown reconciliation method '{method}' for '{model_name}'. Expected one of: {', '.join(METHODS)}.", {}
+    if any(level in (TOTAL, SERIES_LEVEL) for level in hierarchy_levels(model_name)[1:-1]):
+        return False, f"Hierarchy levels of '{model_name}' may not be named '{TOTAL}' or '{SERIES_LEVEL}'.", {}
+
+    started = time.perf_counter()
+    output_path = reconciled_forecast_path(model_name, data_dir)
+    fingerprint_path = os.path.splitext(output_path)[0] + ".fingerprint"
+    with locks.model_lock(model_name, locks.FORECAST):
+        fingerprint = _fingerprint(model_name, method, data_dir)
+        if not force and os.path.exists(output_path) and os.path.exists(fingerprint_path):
+            with open(fingerprint_path, "r") as f:
+                if f.read().strip() == fingerprint:
+                    return True, f"Hierarchy of '{model_name}' unchanged since it was last reconciled.", {"skipped": True}
+        try:
+            history = series.read_series_history(model_name, data_dir=data_dir)
+            forecasts = _read_forecasts(model_name, data_dir)
+            leaves = sorted(history['series'].astype(str).unique())
+            mapping = read_mapping(model_name, leaves, data_dir)
+        except (FileNotFoundError, ValueError) as e:
+            return False, f"Could not reconcile '{model_name}': {e}", {}
+
+        with telemetry.span("reconcile", model=model_name, method=method):
+            history['ds'] = pd.to_datetime(history['ds']).astype('datetime64[ns]')
+            forecasts['ds'] = pd.to_datetime(forecasts['ds']).astype('datetime64[ns]')
+            A, nodes = aggregation_matrix(mapping)
+            grid, Y = _leaf_history_matrix(history, leaves)
+            horizon = FORECAST_HORIZON_DAYS
+            horizon_dates = pd.date_range(grid[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+
+            last_values = history.sort_values('ds', kind='stable').groupby('series')['y'].last().reindex(leaves).to_numpy(dtype=np.float64)
+            base_leaves, unforecast = _leaf_forecast_matrix(forecasts, leaves, horizon_dates, 'yhat', last_values)
+            leaf_lower, _ = _leaf_forecast_matrix(forecasts, leaves, horizon_dates, 'yhat_lower', last_values)
+            leaf_upper, _ = _leaf_forecast_matrix(forecasts, leaves, horizon_dates, 'yhat_upper', last_values)
+            fitted = forecasts.merge(history[['series', 'ds', 'y']], on=['series', 'ds'])
+            leaf_variance = (fitted['y'] - fitted['yhat']).pow(2).groupby(fitted['series']).mean().reindex(leaves).to_numpy()
+
+            base_aggregates, aggregate_lower, aggregate_upper, aggregate_variance = _aggregate_forecasts(grid, A @ Y, horizon)
+            aggregates, reconciled_leaves = reconcile_forecasts(A, base_aggregates, base_leaves, method,
+                                                                aggregate_variance, leaf_variance)
+
+            base = np.vstack([base_aggregates, base_leaves])
+            yhat = np.vstack([aggregates, reconciled_leaves])
+            shift = yhat - base
+            node_count = len(nodes) + len(leaves)
+            result = pd.DataFrame({
+                'level': np.repeat([level for level, _ in nodes] + [SERIES_LEVEL] * len(leaves), horizon),
+                'node': np.repeat([str(node) for _, node in nodes] + list(leaves), horizon),
+                'ds': np.tile(horizon_dates.to_numpy(), node_count),
+                'yhat': yhat.ravel(),
+                'yhat_lower': (np.vstack([aggregate_lower, leaf_lower]) + shift).ravel(),
+                'yhat_upper': (np.vstack([aggregate_upper, leaf_upper]) + shift).ravel(),
+            })
+            series._write_bucket(output_path, result[COLUMNS])
+        with atomic_path(fingerprint_path) as tmp_path, open(tmp_path, "w") as f:
+            f.write(fingerprint)
+
+    # How far the base total was from the sum of the base leaves, relative to that sum
+    leaf_total = base_leaves.sum(axis=0)
+    base_gap = float(np.mean(np.abs(base_aggregates[0] - leaf_total)) / max(float(np.mean(np.abs(leaf_total))), 1e-12))
+    seconds = time.perf_counter() - started
+    summary = {"method": method, "nodes": node_count, "aggregates": len(nodes), "leaves": len(leaves),
+               "leaves_without_forecast": unforecast, "horizon_days": horizon,
+               "base_total_gap": round(base_gap, 4), "seconds": round(seconds, 3)}
+    message = (f"Reconciled {node_count} node(s) of '{model_name}' ({len(nodes)} aggregate(s), {len(leaves)} series) "
+               f"with {method} in {seconds:.2f}s; the base total was {base_gap:.1%} off the sum of its series.")
+    return True, message, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile the forecasts of a series model's hierarchy.")
+    parser.add_argument("model_name", choices=series.series_models())
+    parser.add_argument("--method", choices=METHODS, help="Overrides the configured method.")
+    parser.add_argument("--force", action="store_true", help="Reconcile even if nothing changed.")
+    args = parser.parse_args()
+
+    success, message, _ = reconcile_model(args.model_name, args.method, args.force)
+    if success:
+        print(f"Success: {message}")
+    else:
+        print(f"Error: {message}")
+        sys.exit(1)
@@ -0,0 +1,129 @@
+"""
+Rolling-window merge of a model's saved history with new points.
+
+The saved history is kept sorted by 'ds' with one row per 'ds', so new points are placed with
+np.searchsorted instead of re-sorting and de-duplicating the combined frame, and the window is
+applied by slicing off the oldest rows.
+
+The window is set per model in POCKETBASE_COLLECTION_CONFIG with either "window_days" (keep
+points newer than N days before the newest one) or "window_rows" (keep the newest N points).
+Models without either keep HISTORICAL_WINDOW_DAYS days. A value of None keeps everything.
+"""
+import numpy as np
+import pandas as pd
+
+from config import HISTORICAL_WINDOW_DAYS, POCKETBASE_COLLECTION_CONFIG
+from storage import HISTORY_COLUMNS
+
+DAYS = "days"
+ROWS = "rows"
+
+
+def history_window(model_name):
+    """Returns (DAYS or ROWS, N or None) for the model. Raises ValueError for an invalid config."""
+    config = POCKETBASE_COLLECTION_CONFIG.get(model_name) or {}
+    if "window_days" in config and "window_rows" in config:
+        raise ValueError(f"Model '{model_name}' sets both 'window_days' and 'window_rows'; use one.")
+    kind, size = (ROWS, config["window_rows"]) if "window_rows" in config else (DAYS, config.get("window_days", HISTORICAL_WINDOW_DAYS))
+    if size is not None and (not isinstance(size, int) or size < 1):
+        raise ValueError(f"'window_{kind}' of model '{model_name}' must be a positive integer or None.")
+    return kind, size
+
+
+def window_start(ds, window):
+    """Index of the first row of sorted datetime64 array ds that is inside the window."""
+    kind, size = window
+    if size is None or len(ds) == 0:
+        return 0
+    if kind == ROWS:
+        return max(0, len(ds) - size)
+    return int(np.searchsorted(ds, ds[-1] - np.timedelta64(size, 'D'), side='right'))
+
+
+def trim_series(df, window):
+    """Applies the window to each series of a (series, ds)-sorted multi-series frame."""
+    kind, size = window
+    if size is None:
+        return df
+    if kind == ROWS:
+        return df.groupby('series', sort=False).tail(size)
+    newest = df.groupby('series', sort=False)['ds'].transform('max')
+    return df[df['ds'] > newest - pd.Timedelta(days=size)]
+
+
+def _ds_array(df):
+    return df['ds'].to_numpy(dtype='datetime64[ns]')
+
+
+def _sorted_unique(df):
+    """
+    df sorted by 'ds' with the last row per 'ds' kept and rows without 'ds' dropped.
+    Returns df itself when it already is (the saved history), after one vectorized check.
+    """
+    ds = _ds_array(df)
+    if (len(ds) < 2 or (ds[1:] > ds[:-1]).all()) and not np.isnat(ds).any():
+        return df
+    df = df[df['ds'].notna()]
+    return df.sort_values('ds', kind='stable').drop_duplicates('ds', keep='last')
+
+
+def new_points(new_data_df, now):
+    """
+    The incoming points in history layout: 'ds' parsed (timezone dropped; unparseable rows are
+    removed), 'created_at' kept if given (else now) and 'updated_at' set to now.
+    """
+    ds = pd.to_datetime(new_data_df['ds'], errors='coerce')
+    if ds.dt.tz is not None:
+        ds = ds.dt.tz_localize(None)
+    df = pd.DataFrame({
+        'ds': ds,
+        'y': new_data_df['y'] if 'y' in new_data_df.columns else 0.0,
+        'created_at': pd.to_datetime(new_data_df['created_at'], errors='coerce', format='ISO8601', utc=True).dt.tz_localize(None)
+        if 'created_at' in new_data_df.columns else now,
+        'updated_at': now,
+    })
+    return df[df['ds'].notna()]
+
+
+def merge(existing_df, new_df, window):
+    """
+    Merges new_df into existing_df (both in HISTORY_COLUMNS layout): a new point replaces the saved
+    row with the same 'ds', then rows outside the window are dropped.
+    Returns (merged, evicted_ds), where evicted_ds holds the 'ds' values that fell out of the window.
+    """
+    existing_df = _sorted_unique(existing_df[HISTORY_COLUMNS])
+    new_df = _sorted_unique(new_df[HISTORY_COLUMNS])
+    existing_ds, new_ds = _ds_array(existing_df), _ds_array(new_df)
+
+    if len(new_ds) == 0 or len(existing_ds) == 0 or new_ds[0] > existing_ds[-1]:
+        # Appending after the newest saved point (the daily-update case): no row moves, so the
+        # result is the saved rows still in the window followed by the new ones.
+        merged_ds = np.concatenate([existing_ds, new_ds])
+        start = window_start(merged_ds, window)
+        parts = [df for df in (existing_df.iloc[start:], new_df.iloc[max(0, start - len(existing_ds)):]) if len(df)]
+        merged = pd.concat(parts, ignore_index=True) if len(parts) > 1 else (parts or [new_df])[0].reset_index(drop=True)
+        return merged, pd.Series(merged_ds[:start])
+
+    positions = np.searchsorted(existing_ds, new_ds)
+    in_range = positions < len(existing_ds)
+    replaced = positions[in_range][existing_ds[positions[in_range]] == new_ds[in_range]]
+    keep = np.ones(len(existing_ds), dtype=bool)
+    keep[replaced] = False
+    kept = np.flatnonzero(keep)
+    # Each new point goes after the saved rows that stay in front of it.
+    new_slots = np.searchsorted(kept, positions)
+
+    total = len(kept) + len(new_ds)
+    is_new = np.zeros(total, dtype=bool)
+    is_new[new_slots + np.arange(len(new_ds))] = True
+    merged_ds = np.empty(total, dtype='datetime64[ns]')
+    merged_ds[~is_new] = existing_ds[kept]
+    merged_ds[is_new] = new_ds
+    order = np.empty(total, dtype=np.int64)
+    order[~is_new] = kept
+    order[is_new] = len(existing_ds) + np.arange(len(new_ds))
+
+    start = window_start(merged_ds, window)
+    combined = pd.concat([existing_df, new_df], ignore_index=True)
+    merged = combined.take(order[start:]).reset_index(drop=True)
+    return merged, pd.Series(merged_ds[:start])
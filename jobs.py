@@ -0,0 +1,259 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from config import DATA_DIR, RETRAIN_WORKERS, MAX_FINISHED_JOBS, JOB_COORDINATOR_THREADS
+import telemetry
+
+# Job records live in the API process. Workers only see the shared `_progress`
+# dict (a Manager proxy) so they can report what they are doing.
+# Records and progress are also mirrored to JOBS_DIR, so a job accepted by one API process
+# (e.g. a forked gunicorn worker) can be looked up from any other.
+JOBS_DIR = os.path.join(DATA_DIR, ".jobs")
+JOB_FILES_MAX_AGE_SECONDS = 86400  # Files left by API processes that have since exited
+_jobs = {}            # job_id -> job record
+_queued_by_key = {}   # coalescing key -> job_id of the job that has not started yet
+_lock = threading.Lock()
+_pool = None
+_dispatcher = None
+_coordinator = None
+_manager = None
+_progress = None
+
+# Set while a job is executing (in a worker process, or on a coordinator thread of the API process).
+_worker = threading.local()
+
+
+def _utcnow_iso():
+    return datetime.utcnow().isoformat()
+
+
+def _write_shared(job_id, suffix, data):
+    """Atomically writes JOBS_DIR/<job_id><suffix>. Failures only cost cross-process visibility."""
+    path = os.path.join(JOBS_DIR, job_id + suffix)
+    try:
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write job file {path}: {e}")
+
+
+def _read_shared(job_id, suffix):
+    try:
+        with open(os.path.join(JOBS_DIR, job_id + suffix), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_shared(job_id):
+    for suffix in (".json", ".progress.json"):
+        try:
+            os.remove(os.path.join(JOBS_DIR, job_id + suffix))
+        except OSError:
+            pass
+
+
+def _prune_stale_shared():
+    try:
+        filenames = os.listdir(JOBS_DIR)
+    except OSError:
+        return
+    oldest = time.time() - JOB_FILES_MAX_AGE_SECONDS
+    for filename in filenames:
+        path = os.path.join(JOBS_DIR, filename)
+        try:
+            if os.path.getmtime(path) < oldest:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _shared_record(job):
+    record = {key: job[key] for key in ("id", "submitted_at", "finished_at", "coalesced_requests", "result")}
+    record["key"] = list(job["key"]) if isinstance(job["key"], tuple) else job["key"]
+    return record
+
+
+def _get_pool():
+    """Creates the worker pool (and the progress manager) on first use."""
+    global _pool, _dispatcher, _manager, _progress
+    if _pool is None:
+        # 'spawn' keeps workers independent of the threads/locks held by the web server.
+        context = multiprocessing.get_context("spawn")
+        _manager = context.Manager()
+        _progress = _manager.dict()
+        _pool = ProcessPoolExecutor(max_workers=RETRAIN_WORKERS, mp_context=context)
+        # ProcessPoolExecutor hands work to its call queue ahead of free workers, which would
+        # make queued jobs look started. One dispatcher thread per worker keeps jobs in our
+        # own queue until a worker is actually free, so they can still be coalesced.
+        _dispatcher = ThreadPoolExecutor(max_workers=RETRAIN_WORKERS, thread_name_prefix="retrain-dispatch")
+        _prune_stale_shared()
+    return _pool
+
+
+def get_worker_pool():
+    """The process pool retrain jobs run on, for coordinator jobs that fan work out themselves."""
+    return _get_pool()
+
+
+def _get_coordinator():
+    global _coordinator
+    if _coordinator is None:
+        _coordinator = ThreadPoolExecutor(max_workers=JOB_COORDINATOR_THREADS, thread_name_prefix="job-coordinator")
+    return _coordinator
+
+
+def _dispatch(job_id, fn, args):
+    return _pool.submit(_run_job, _progress, job_id, fn, args).result()
+
+
+def _run_job(progress, job_id, fn, args):
+    """Exposes the progress dict to report_progress() for the current job and runs fn."""
+    _worker.progress, _worker.job_id = progress, job_id
+    try:
+        report_progress(stage="running", started_at=_utcnow_iso())
+        return fn(*args)
+    finally:
+        _worker.progress = _worker.job_id = None
+        telemetry.flush()  # So /metrics sees the job's spans and counters right away
+
+
+def report_progress(**info):
+    """Records progress for the job running in this process/thread. Does nothing outside a job."""
+    progress = getattr(_worker, "progress", None)
+    if progress is None:
+        return
+    current = dict(progress.get(_worker.job_id, {}))
+    current.update(info)
+    progress[_worker.job_id] = current
+    _write_shared(_worker.job_id, ".progress.json", current)
+
+
+def _prune_finished_jobs():
+    finished = [job_id for job_id, job in _jobs.items() if job["future"].done()]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job_id]
+        if _progress is not None:
+            _progress.pop(job_id, None)
+        _remove_shared(job_id)
+
+
+def submit(key, fn, *args, in_thread=False):
+    """
+    Queues fn(*args) on the worker pool and returns the job id.
+    If a job with the same key is still waiting for a worker, no new job is created and the
+    waiting job's id is returned, so a burst of identical requests results in a single run.
+    fn must be a picklable top-level function returning (success, message), or
+    (success, message, details) where details is JSON-serializable.
+    in_thread=True runs fn on a coordinator thread of this process instead; meant for jobs that
+    mostly wait on I/O and hand their CPU-bound work to get_worker_pool().
+    """
+    with _lock:
+        job_id = _queued_by_key.get(key)
+        if job_id is not None and job_id in _jobs:
+            future = _jobs[job_id]["future"]
+            # A job only becomes "running" once a worker is free to take it, so anything
+            # written to disk before this check is still seen by the queued job.
+            if not future.running() and not future.done():
+                _jobs[job_id]["coalesced_requests"] += 1
+                _write_shared(job_id, ".json", _shared_record(_jobs[job_id]))
+                return job_id
+
+        _get_pool()
+        job_id = uuid.uuid4().hex
+        _jobs[job_id] = {
+            "id": job_id,
+            "key": key,
+            "submitted_at": _utcnow_iso(),
+            "finished_at": None,
+            "coalesced_requests": 0,
+            "result": None,
+            "future": None,
+        }
+        _queued_by_key[key] = job_id
+        _write_shared(job_id, ".json", _shared_record(_jobs[job_id]))
+        if in_thread:
+            future = _get_coordinator().submit(_run_job, _progress, job_id, fn, args)
+        else:
+            future = _dispatcher.submit(_dispatch, job_id, fn, args)
+        _jobs[job_id]["future"] = future
+        _prune_finished_jobs()
+
+    future.add_done_callback(lambda f: _on_job_done(job_id, f))
+    return job_id
+
+
+def _on_job_done(job_id, future):
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return
+        job["finished_at"] = _utcnow_iso()
+        if _queued_by_key.get(job["key"]) == job_id:
+            del _queued_by_key[job["key"]]
+        try:
+            success, message, *details = future.result()
+            job["result"] = {"success": success, "message": message}
+            if details:
+                job["result"]["details"] = details[0]
+        except Exception as e:
+            job["result"] = {"success": False, "message": f"Job failed: {str(e)}"}
+        _write_shared(job_id, ".json", _shared_record(job))
+
+
+def get_job(job_id):
+    """
+    Returns a JSON-serializable view of the job, or None if the id is unknown.
+    Jobs of other API processes are read from their files in JOBS_DIR.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        record = _shared_record(job) if job is not None else None
+    local = record is not None
+    if not local:
+        if not all(c in "0123456789abcdef" for c in job_id):  # Ids are uuid hex; never a path
+            return None
+        record = _read_shared(job_id, ".json")
+        if record is None:
+            return None
+
+    view = {key: record[key] for key in ("id", "submitted_at", "finished_at", "coalesced_requests", "result")}
+    if isinstance(record["key"], list):
+        view["kind"], view["model_name"] = record["key"][0], record["key"][1]
+    else:
+        view["kind"], view["model_name"] = None, record["key"]
+
+    if local and _progress is not None:
+        progress = dict(_progress.get(job_id, {}))
+    else:
+        progress = _read_shared(job_id, ".progress.json") or {}
+    result = view["result"]
+    if result is not None:
+        view["status"] = "succeeded" if result["success"] else "failed"
+    elif progress.get("started_at"):
+        view["status"] = "running"
+    else:
+        view["status"] = "queued"
+    view["progress"] = progress
+    return view
+
+
+def shutdown(wait=True):
+    global _pool, _dispatcher, _coordinator, _manager, _progress
+    if _coordinator is not None:
+        _coordinator.shutdown(wait=wait)
+        _coordinator = None
+    if _pool is not None:
+        _dispatcher.shutdown(wait=wait)
+        _pool.shutdown(wait=wait)
+        _manager.shutdown()
+        _pool = _dispatcher = _manager = _progress = None
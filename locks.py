@@ -0,0 +1,105 @@
+"""
+Per-model advisory locks that hold across processes (e.g. several gunicorn workers).
+
+Each lock is a file under DATA_DIR/.locks/ locked with flock (msvcrt.locking on Windows).
+Writers take them around read-modify-write sequences; readers never do, they rely on every
+file being replaced atomically (see storage.atomic_path).
+
+    with locks.model_lock("sales", locks.HISTORY):
+        ...
+
+Locks are reentrant within a thread, so a locked helper may call another one taking the same lock.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import DATA_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+HISTORY = "history"    # <model>_data: read, merge, write
+FORECAST = "forecast"  # fit, model store, forecast and fingerprint writes
+
+LOCK_DIR = os.path.join(DATA_DIR, ".locks")
+
+_held = threading.local()  # (model_name, kind) -> depth, for reentrancy
+
+
+def _acquire(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:  # LK_LOCK gives up after ~10 seconds
+            time.sleep(0.1)
+
+
+def _try_acquire(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _release(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def model_lock(model_name, kind=HISTORY):
+    """Exclusive lock on one kind of state of a model, shared by every process using DATA_DIR."""
+    held = getattr(_held, "locks", None)
+    if held is None:
+        held = _held.locks = {}
+    key = (model_name, kind)
+    if held.get(key):
+        held[key] += 1
+        try:
+            yield
+        finally:
+            held[key] -= 1
+        return
+
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    # A new open file description per acquisition, so threads of one process exclude each other too.
+    with open(os.path.join(LOCK_DIR, f"{model_name}.{kind}.lock"), "a+") as f:
+        _acquire(f)
+        held[key] = 1
+        try:
+            yield
+        finally:
+            held[key] = 0
+            _release(f)
+
+
+@contextmanager
+def exclusive_process(name):
+    """
+    Non-blocking lock for singleton processes (e.g. scheduler.py): yields True if this process
+    holds it for the duration of the block, False if another process already does.
+    """
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, f"{name}.lock"), "a+") as f:
+        acquired = _try_acquire(f)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _release(f)
@@ -0,0 +1,84 @@
+import os
+import re
+import tempfile
+
+from config import MODEL_STORE_DIR, MODEL_VERSIONS_TO_KEEP
+
+_VERSION_FILE_RE = re.compile(r"^v(\d+)\.json$")
+
+
+def get_model_dir(model_name):
+    return os.path.join(MODEL_STORE_DIR, model_name)
+
+
+def get_model_filepath(model_name, version):
+    return os.path.join(get_model_dir(model_name), f"v{version:06d}.json")
+
+
+def list_versions(model_name):
+    """Returns the stored versions for a model, oldest first."""
+    try:
+        filenames = os.listdir(get_model_dir(model_name))
+    except FileNotFoundError:
+        return []
+    versions = [int(match.group(1)) for match in map(_VERSION_FILE_RE.match, filenames) if match]
+    return sorted(versions)
+
+
+def latest_version(model_name):
+    versions = list_versions(model_name)
+    return versions[-1] if versions else None
+
+
+def save_model(model_name, model):
+    """Serializes a fitted Prophet model as the next version for model_name. Returns the version."""
+    from prophet.serialize import model_to_json
+    model_dir = get_model_dir(model_name)
+    os.makedirs(model_dir, exist_ok=True)
+    version = (latest_version(model_name) or 0) + 1
+
+    # Write to a temp file first so readers never see a partially written model.
+    fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(model_to_json(model))
+        os.replace(tmp_path, get_model_filepath(model_name, version))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    for old_version in list_versions(model_name)[:-MODEL_VERSIONS_TO_KEEP]:
+        try:
+            os.remove(get_model_filepath(model_name, old_version))
+        except OSError as e:
+            print(f"Warning: Could not remove old model version {old_version} of '{model_name}': {e}")
+    return version
+
+
+def load_model(model_name, version=None):
+    """
+    Loads a stored model (latest version by default).
+    Returns (version, model), or (None, None) if nothing is stored.
+    """
+    from prophet.serialize import model_from_json
+    if version is None:
+        version = latest_version(model_name)
+        if version is None:
+            return None, None
+    with open(get_model_filepath(model_name, version), "r") as f:
+        return version, model_from_json(f.read())
+
+
+def warm_start_params(model):
+    """
+    Stan initial values taken from a fitted (MAP) model: k, m, sigma_obs, delta and beta.
+    Pass as `model.fit(df, init=...)`; Prophet falls back to its defaults for any
+    parameter whose shape no longer matches (e.g. a seasonality was added).
+    """
+    params = {}
+    for name in ["k", "m", "sigma_obs"]:
+        params[name] = model.params[name][0][0]
+    for name in ["delta", "beta"]:
+        params[name] = model.params[name][0]
+    return params
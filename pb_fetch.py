@@ -0,0 +1,229 @@
+"""
+Streaming reader for the PocketBase records list API.
+
+Records are fetched page by page over one pooled HTTP connection pool, with a bounded number of
+pages in flight, and folded into per-day aggregates as each page arrives. Peak memory is the
+in-flight pages plus one entry per day, however many records match.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import httpx
+import pandas as pd
+
+from config import (
+    PB_PAGE_SIZE,
+    PB_FETCH_CONCURRENCY,
+    PB_FETCH_RETRIES,
+    PB_RETRY_BACKOFF_SECONDS,
+    PB_REQUEST_TIMEOUT_SECONDS,
+)
+
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def aggregate_daily_values(ds_values, y_values, aggregation_method, series_values=None):
+    """
+    Aggregates raw PocketBase field values into one row per day (per series, if series_values is given).
+    ds_values are PocketBase datetime strings ('YYYY-MM-DD HH:MM:SS.sssZ'); only the date part is used.
+    y_values is ignored for "count". Days are summed for "sum"; otherwise the last value of each day is kept.
+    Returns (DataFrame with 'ds'/'y' (plus 'series'), number of rejected records).
+    """
+    ds = pd.to_datetime(pd.Series(ds_values, dtype='string').str.slice(0, 10), format='%Y-%m-%d', errors='coerce')
+    if aggregation_method == "count":
+        df = pd.DataFrame({'ds': ds})
+    else:
+        df = pd.DataFrame({'ds': ds, 'y': pd.to_numeric(pd.Series(y_values), errors='coerce')})
+    keys = ['ds']
+    if series_values is not None:
+        df.insert(0, 'series', pd.Series(series_values, dtype='string').replace('', pd.NA))
+        keys = ['series', 'ds']
+    valid_df = df.dropna()
+    rejected = len(df) - len(valid_df)
+
+    if aggregation_method == "count":
+        new_df = valid_df.groupby(keys).size().reset_index(name='y')
+    elif aggregation_method == "sum": # Example for summing daily values
+        new_df = valid_df.groupby(keys)['y'].sum().reset_index()
+    else:
+        new_df = valid_df.groupby(keys)['y'].last().reset_index()
+    return new_df, rejected
+
+
+class DailyAggregator:
+    """
+    Running per-day aggregate over pages of records ("count", "sum", or last value otherwise),
+    kept per series when series_field is set. Pages may arrive out of order; for "last", the value
+    from the highest page number wins, which matches the server-side sort order.
+    """
+
+    def __init__(self, ds_field, y_field, aggregation_method, series_field=None):
+        self.ds_field = ds_field
+        self.y_field = y_field
+        self.aggregation_method = aggregation_method
+        self.series_field = series_field
+        self.records = 0
+        self.rejected = 0
+        self._days = {}  # key -> y, or key -> (page_number, y) for "last"; key is ds or (series, ds)
+
+    def add_page(self, page_number, items):
+        ds_values = [item.get(self.ds_field) for item in items]
+        y_values = None if self.aggregation_method == "count" else [item.get(self.y_field) for item in items]
+        series_values = [item.get(self.series_field) for item in items] if self.series_field else None
+        page_df, rejected = aggregate_daily_values(ds_values, y_values, self.aggregation_method, series_values)
+        self.records += len(items)
+        self.rejected += rejected
+
+        keys = zip(page_df['series'], page_df['ds']) if self.series_field else page_df['ds']
+        if self.aggregation_method in ("count", "sum"):
+            for key, y in zip(keys, page_df['y']):
+                self._days[key] = self._days.get(key, 0) + y
+        else:
+            for key, y in zip(keys, page_df['y']):
+                previous = self._days.get(key)
+                if previous is None or previous[0] <= page_number:
+                    self._days[key] = (page_number, y)
+
+    def result(self):
+        columns = ['series', 'ds', 'y'] if self.series_field else ['ds', 'y']
+        if not self._days:
+            return pd.DataFrame(columns=columns)
+        keys = sorted(self._days)
+        if self.aggregation_method in ("count", "sum"):
+            values = [self._days[key] for key in keys]
+        else:
+            values = [self._days[key][1] for key in keys]
+        if self.series_field:
+            return pd.DataFrame({'series': [key[0] for key in keys], 'ds': pd.to_datetime([key[1] for key in keys]), 'y': values})
+        return pd.DataFrame({'ds': pd.to_datetime(keys), 'y': values})
+
+
+class PocketBaseFetcher:
+    """
+    Pooled, retrying client for `GET /api/collections/<collection>/records`.
+    Safe to share between threads; max_connections bounds the pool across all concurrent fetches.
+    """
+
+    def __init__(self, base_url, page_size=PB_PAGE_SIZE, concurrency=PB_FETCH_CONCURRENCY,
+                 max_retries=PB_FETCH_RETRIES, backoff_seconds=PB_RETRY_BACKOFF_SECONDS,
+                 timeout_seconds=PB_REQUEST_TIMEOUT_SECONDS, max_connections=None):
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        max_connections = max_connections or self.concurrency
+        self._client = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            timeout=timeout_seconds,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        self._pages_lock = threading.Lock()
+        self._auth_lock = threading.Lock()
+        self._credentials = None
+        self.pages_fetched = 0
+        self.retries = 0
+
+    def authenticate(self, email, password):
+        """
+        Authenticates as a superuser and sends the token with every later request. Tries the
+        PocketBase >= 0.23 `_superusers` collection first, then the older admins endpoint.
+        The credentials are kept so an expired token is renewed on the next 401.
+        """
+        self._credentials = (email, password)
+        self._authenticate()
+
+    def _authenticate(self):
+        email, password = self._credentials
+        body = {"identity": email, "password": password}
+        with self._auth_lock:
+            response = self._client.post("/api/collections/_superusers/auth-with-password", json=body)
+            if response.status_code == 404:
+                response = self._client.post("/api/admins/auth-with-password", json=body)
+            response.raise_for_status()
+            self._client.headers["Authorization"] = response.json()["token"]
+
+    def close(self):
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get(self, path, params):
+        """GET with retries and exponential backoff (plus jitter) on transport errors, 429 and 5xx."""
+        reauthenticated = False
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._client.get(path, params=params)
+                if response.status_code == 401 and self._credentials and not reauthenticated:
+                    self._authenticate()
+                    reauthenticated = True
+                    response = self._client.get(path, params=params)
+                if response.status_code not in _RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            with self._pages_lock:
+                self.retries += 1
+            time.sleep(self.backoff_seconds * (2 ** attempt) * (1 + random.random() * 0.1))
+
+    def get_page(self, collection_name, page, params):
+        result = self._get(f"/api/collections/{collection_name}/records",
+                           dict(params, page=page, perPage=self.page_size))
+        with self._pages_lock:
+            self.pages_fetched += 1
+        return result
+
+    def iter_pages(self, collection_name, pb_filter=None, fields=None, sort=None):
+        """
+        Yields (page_number, items) for every page of the result set. The first page tells us how many
+        pages there are; the rest are fetched concurrently with at most `concurrency` in flight, and
+        are yielded as they complete (not necessarily in order).
+        """
+        params = {}
+        if pb_filter:
+            params["filter"] = pb_filter
+        if fields:
+            params["fields"] = ",".join(fields)
+        if sort:
+            params["sort"] = sort
+
+        first_page = self.get_page(collection_name, 1, params)
+        yield 1, first_page.get("items", [])
+        total_pages = first_page.get("totalPages", 1)
+        if total_pages <= 1:
+            return
+
+        remaining = iter(range(2, total_pages + 1))
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pb-page") as pool:
+            in_flight = {}
+            for page in remaining:
+                in_flight[pool.submit(self.get_page, collection_name, page, params)] = page
+                if len(in_flight) >= self.concurrency:
+                    break
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    page = in_flight.pop(future)
+                    yield page, future.result().get("items", [])
+                    next_page = next(remaining, None)
+                    if next_page is not None:
+                        in_flight[pool.submit(self.get_page, collection_name, next_page, params)] = next_page
+
+    def aggregate_daily(self, collection_name, pb_filter, ds_field, y_field, aggregation_method, series_field=None):
+        """Streams the matching records into a DailyAggregator. Only the fields being aggregated are requested."""
+        fields = ["id", ds_field] + ([y_field] if y_field and aggregation_method != "count" else [])
+        if series_field:
+            fields.append(series_field)
+        aggregator = DailyAggregator(ds_field, y_field, aggregation_method, series_field)
+        for page_number, items in self.iter_pages(collection_name, pb_filter, fields, sort=f"{ds_field},id"):
+            aggregator.add_page(page_number, items)
+        return aggregator
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import threading
+
+import telemetry
+
+# Pre-serialized JSON bodies for the read endpoints, keyed by (endpoint, model_name).
+# Each entry remembers the (mtime_ns, size) of the file it was built from, so a
+# file rewritten by another process (or by hand) is picked up on the next request.
+# Directory-backed tables (Parquet partitions) are signed by their newest file,
+# total size and file count.
+_entries = {}
+_lock = threading.Lock()
+
+FORECAST = "forecast"
+HISTORICAL_DATA = "historical_data"
+
+
+def file_signature(filepath):
+    """Returns (mtime_ns, size) for filepath. Raises FileNotFoundError if it is missing."""
+    stat_result = os.stat(filepath)
+    if not os.path.isdir(filepath):
+        return (stat_result.st_mtime_ns, stat_result.st_size)
+    entries = [entry.stat() for entry in os.scandir(filepath) if entry.is_file()]
+    return (max([stat_result.st_mtime_ns] + [e.st_mtime_ns for e in entries]),
+            sum(e.st_size for e in entries), len(entries))
+
+
+def get_or_build(endpoint: str, model_name: str, filepath: str, build):
+    """
+    Returns (etag, body) for the given endpoint/model.
+    `build()` is only called when there is no cached body or the file changed on disk.
+    """
+    signature = file_signature(filepath)
+    key = (endpoint, model_name)
+
+    with _lock:
+        entry = _entries.get(key)
+    if entry is not None and entry[0] == signature:
+        telemetry.count("response_cache_hits", endpoint=endpoint, model=model_name)
+        return entry[1], entry[2]
+
+    telemetry.count("response_cache_misses", endpoint=endpoint, model=model_name)
+    with telemetry.span("serialize", endpoint=endpoint, model=model_name):
+        body = build()
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()
+
+    with _lock:
+        _entries[key] = (signature, etag, body)
+    return etag, body
+
+
+def invalidate(model_name: str, endpoint: str = None):
+    """Drops cached bodies for a model (all endpoints unless one is given)."""
+    with _lock:
+        for key in list(_entries):
+            if key[1] == model_name and (endpoint is None or key[0] == endpoint):
+                del _entries[key]
+
+
+def clear():
+    with _lock:
+        _entries.clear()
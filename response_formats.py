@@ -0,0 +1,127 @@
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from config import RESPONSE_CHUNK_ROWS, GZIP_LEVEL
+
+# Body encodings of the read endpoints (?format=...). "records" is the default list of row
+# objects; "columnar" is one JSON array per column, so key names are not repeated on every row;
+# "arrow" is an Arrow IPC stream with typed columns (dates stay timestamps).
+RECORDS = "records"
+COLUMNAR = "columnar"
+ARROW = "arrow"
+FORMATS = (RECORDS, COLUMNAR, ARROW)
+
+MIMETYPES = {RECORDS: "application/json", COLUMNAR: "application/json", ARROW: "application/vnd.apache.arrow.stream"}
+
+DATE_FORMAT = "date"          # '%Y-%m-%d' (forecasts)
+TIMESTAMP_FORMAT = "timestamp"  # '%Y-%m-%dT%H:%M:%S.%fZ' (history)
+
+
+def format_dates(values, date_format):
+    """
+    Formats datetimes as strings (None for NaT) for JSON bodies. Same output as
+    Series.dt.strftime with '%Y-%m-%d' or '%Y-%m-%dT%H:%M:%S.%fZ', without the per-row Python calls.
+    """
+    values = pd.to_datetime(pd.Series(values)).dt.tz_localize(None).to_numpy(dtype="datetime64[us]")
+    if date_format == DATE_FORMAT:
+        text = np.datetime_as_string(values, unit="D")
+    else:
+        text = np.char.add(np.datetime_as_string(values, unit="us"), "Z")
+    result = text.astype(object)
+    result[np.isnat(values)] = None
+    return result
+
+
+def json_ready(df, date_columns, date_format):
+    """A copy of df with its date columns formatted by format_dates."""
+    df = df.copy()
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = format_dates(df[col], date_format)
+    return df
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_records(df, chunk_rows=RESPONSE_CHUNK_ROWS):
+    """Yields a JSON array of row objects in pieces of chunk_rows rows. Same bytes as df.to_json(orient='records')."""
+    yield b"["
+    for i, chunk in enumerate(_chunks(df, chunk_rows)):
+        body = chunk.to_json(orient="records")[1:-1]
+        yield (("," if i else "") + body).encode("utf-8")
+    yield b"]"
+
+
+def iter_columnar(df, chunk_rows=RESPONSE_CHUNK_ROWS):
+    """Yields {"<column>": [values...], ...}, each column in pieces of chunk_rows values."""
+    yield b"{"
+    for i, col in enumerate(df.columns):
+        yield (("," if i else "") + json.dumps(col) + ":[").encode("utf-8")
+        for j, chunk in enumerate(_chunks(df[col], chunk_rows)):
+            yield (("," if j else "") + chunk.to_json(orient="values")[1:-1]).encode("utf-8")
+        yield b"]"
+    yield b"}"
+
+
+class _Drain:
+    """Write-only file object whose contents are taken out after every record batch."""
+
+    def __init__(self):
+        self._parts = []
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def iter_arrow(df, chunk_rows=RESPONSE_CHUNK_ROWS):
+    """Yields an Arrow IPC stream of df, one record batch of up to chunk_rows rows at a time."""
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = _Drain()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        yield sink.take()
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def iter_body(df, fmt, date_columns, date_format, chunk_rows=RESPONSE_CHUNK_ROWS):
+    """The body of df in the given format, as an iterator of bytes."""
+    if fmt == ARROW:
+        return iter_arrow(df, chunk_rows)
+    df = json_ready(df, date_columns, date_format)
+    return iter_columnar(df, chunk_rows) if fmt == COLUMNAR else iter_records(df, chunk_rows)
+
+
+def gzip_chunks(chunks, level=GZIP_LEVEL):
+    """Gzips a stream of bytes, flushing after every piece so clients can decode it as it arrives."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def gzip_body(body, level=GZIP_LEVEL):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
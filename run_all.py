@@ -1,75 +1,120 @@
+import argparse
+import multiprocessing
 import subprocess
 import os
 import sys # Import the sys module
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Imported once here; forked workers inherit them. The services modules defer Prophet to the
+# first fit, so it is imported explicitly for the workers to share.
+import prophet
+from generate_data import generate_data
+from train_model import train_model
+import storage
 
 DATA_DIR = "prophet_data"
 TARGET_MODELS = ["sales", "part_stock_log", "product_stocks", "service_request_counts"]
 
-def run_script_checked(script_name, model_name_arg=None):
-    script_display_name = f"{script_name} for model '{model_name_arg}'" if model_name_arg else script_name
-    print(f"Running: {script_display_name} ...")
-    
-    # Use sys.executable to ensure the correct Python interpreter is used
-    command = [sys.executable, script_name] 
-    if model_name_arg:
-        command.append(model_name_arg)
-    
+def initialize_model(model_name):
+    """
+    Generates data for model_name if it is missing and trains its initial forecast if that is missing.
+    Runs inside a pool worker; returns a summary dict used for the timing report.
+    """
+    summary = {"model": model_name, "status": "ok", "generate_seconds": None, "train_seconds": None, "message": ""}
+    backend = storage.get_backend(DATA_DIR)
+    data_file = backend.data_path(model_name)
+    forecast_file = backend.forecast_path(model_name)
+
+    if not os.path.exists(data_file):
+        print(f"'{data_file}' not found. Generating initial data...")
+        started = time.perf_counter()
+        try:
+            generate_data(model_name, DATA_DIR)
+        except Exception as e:
+            summary.update(status="error", message=f"Failed to generate initial data: {str(e)}")
+            return summary
+        finally:
+            summary["generate_seconds"] = time.perf_counter() - started
+    else:
+        print(f"'{data_file}' already exists. Skipping data generation for '{model_name}'.")
+
+    if os.path.exists(forecast_file):
+        print(f"'{forecast_file}' already exists for '{model_name}'. Skipping initial training.")
+        print(f"   To retrain, delete '{forecast_file}' and run this script again, or use the API for '{model_name}'.")
+        summary["message"] = "Forecast already exists."
+        return summary
+
+    print(f"'{forecast_file}' not found. Training initial model for '{model_name}'...")
+    started = time.perf_counter()
     try:
-        # Added encoding='utf-8' for better cross-platform text handling
-        result = subprocess.run(command, capture_output=True, text=True, check=True, encoding='utf-8')
-        print(result.stdout)
-        if result.stderr:
-            print(f"stderr from {script_display_name}:\n{result.stderr}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {script_display_name}:")
-        print(f"Return code: {e.returncode}")
-        print(f"Stdout:\n{e.stdout}")
-        print(f"Stderr:\n{e.stderr}")
-        return False
-    except FileNotFoundError:
-        print(f"Error: Script '{script_name}' not found, or Python interpreter '{sys.executable}' not found.")
-        return False
+        success, message = train_model(model_name)
     except Exception as e:
-        print(f"Error: An unexpected error occurred while running {script_display_name}: {str(e)}")
-        return False
+        success, message = False, f"Unexpected error while training: {str(e)}"
+    summary["train_seconds"] = time.perf_counter() - started
+    summary["message"] = message
+    if not success:
+        summary["status"] = "error"
+    return summary
 
-if __name__ == "__main__":
-    os.makedirs(DATA_DIR, exist_ok=True)
-    print(f"Starting: Initializing data and models for: {', '.join(TARGET_MODELS)}...")
+def _pool_context():
+    """Prefers 'fork' so workers inherit the libraries the parent already imported."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def _format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.2f}s"
+
+def print_timing_summary(summaries, total_seconds):
+    print("\n--- Timing summary ---")
+    print(f"{'model':<28}{'status':<8}{'generate':>10}{'train':>10}")
+    for summary in sorted(summaries, key=lambda s: s["model"]):
+        print(f"{summary['model']:<28}{summary['status']:<8}"
+              f"{_format_seconds(summary['generate_seconds']):>10}{_format_seconds(summary['train_seconds']):>10}")
+        if summary["status"] != "ok":
+            print(f"   Warning: {summary['message']}")
+    print(f"Total wall time: {total_seconds:.2f}s for {len(summaries)} model(s).")
 
-    for model_name in TARGET_MODELS:
-        print(f"\n--- Processing model: {model_name} ---")
-        data_file = os.path.join(DATA_DIR, f"{model_name}_data.csv")
-        forecast_file = os.path.join(DATA_DIR, f"{model_name}_forecast.csv")
+def initialize_models(model_names, jobs):
+    """Initializes all models concurrently on a process pool with `jobs` workers."""
+    summaries = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=_pool_context()) as pool:
+        futures = {pool.submit(initialize_model, model_name): model_name for model_name in model_names}
+        for future in as_completed(futures):
+            model_name = futures[future]
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                summaries.append({"model": model_name, "status": "error", "generate_seconds": None,
+                                  "train_seconds": None, "message": str(e)})
+    print_timing_summary(summaries, time.perf_counter() - started)
+    return summaries
 
-        if not os.path.exists(data_file):
-            print(f"'{data_file}' not found. Generating initial data...")
-            if not run_script_checked("generate_data.py", model_name):
-                print(f"Warning: Failed to generate initial data for '{model_name}'. This model might not work correctly.")
-        else:
-            print(f"'{data_file}' already exists. Skipping data generation for '{model_name}'.")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate missing data, train missing forecasts, then start the API.")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1,
+                        help="Number of models to initialize in parallel (default: number of CPU cores).")
+    parser.add_argument("--no-app", action="store_true", help="Only initialize the models; do not start the Flask app.")
+    args = parser.parse_args()
 
-        if os.path.exists(data_file):
-            if not os.path.exists(forecast_file):
-                print(f"'{forecast_file}' not found. Training initial model for '{model_name}'...")
-                if not run_script_checked("train_model.py", model_name):
-                     print(f"Warning: Failed to train initial model for '{model_name}'.")
-            else:
-                print(f"'{forecast_file}' already exists for '{model_name}'. Skipping initial training.")
-                print(f"   To retrain, delete '{forecast_file}' and run this script again, or use the API for '{model_name}'.")
-        else:
-            print(f"Warning: Cannot train initial model for '{model_name}' as '{data_file}' does not exist.")
+    os.makedirs(DATA_DIR, exist_ok=True)
+    jobs = max(1, min(args.jobs, len(TARGET_MODELS)))
+    print(f"Starting: Initializing data and models for: {', '.join(TARGET_MODELS)} ({jobs} parallel job(s))...")
+    initialize_models(TARGET_MODELS, jobs)
 
     print("\n-----------------------------------------------------")
     print("Success: Initialization complete for all models (if applicable).")
+    if args.no_app:
+        sys.exit(0)
     print("Warning: Starting Flask app. Press Ctrl+C to stop.")
     print("-----------------------------------------------------")
-    
+
     try:
         app_script_path = os.path.join(os.path.dirname(__file__), "app.py")
         if not os.path.exists(app_script_path):
-             app_script_path = "app.py" 
+             app_script_path = "app.py"
 
         # Use sys.executable for the Flask app as well
         subprocess.run([sys.executable, app_script_path], check=True, encoding='utf-8')
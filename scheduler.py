@@ -0,0 +1,281 @@
+"""
+Background refresh daemon: pulls new PocketBase records for every model on its own cadence and
+retrains it, instead of a cron POSTing /trigger_monthly_update for each model.
+
+    python scheduler.py [--models sales ...] [--once] [--status]
+
+Cadence: each model's "refresh_minutes" in POCKETBASE_COLLECTION_CONFIG (SCHEDULER_REFRESH_MINUTES
+by default; None leaves the model out). Runs fall on fixed slots offset within the cadence by a
+crc32 of the model name, so models sharing a cadence are spread over it instead of firing together.
+On top of that, no two runs start within SCHEDULER_STAGGER_SECONDS of each other, at most
+SCHEDULER_MAX_CONCURRENT_FITS run at once, and their fits share a pool of that many processes.
+A model that has never run, or missed its slot while the daemon was down, runs right away (staggered).
+
+High-water mark: SCHEDULER_DIR/<model>.json keeps the newest day fetched. The next run fetches from
+the start of that day on: records are aggregated per day, so the last day is fetched whole again
+rather than merged as a partial count or sum. A model's first run fetches SCHEDULER_INITIAL_FETCH_DAYS.
+
+Only one scheduler runs per DATA_DIR; a second one exits. The API notices the files it rewrites
+through their signatures, as it does for retrain jobs.
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+
+from config import (
+    DATA_DIR,
+    POCKETBASE_COLLECTION_CONFIG,
+    SCHEDULER_REFRESH_MINUTES,
+    SCHEDULER_STAGGER_SECONDS,
+    SCHEDULER_MAX_CONCURRENT_FITS,
+    SCHEDULER_RETRY_SECONDS,
+    SCHEDULER_INITIAL_FETCH_DAYS,
+)
+import locks
+import services
+import storage
+import telemetry
+
+SCHEDULER_DIR = os.path.join(DATA_DIR, ".scheduler")
+MAX_IDLE_SECONDS = 60  # Longest sleep between checks, so a changed clock is noticed
+
+
+def refresh_seconds(model_name):
+    """The model's cadence in seconds, or None if it is not scheduled. Raises ValueError for an invalid config."""
+    minutes = POCKETBASE_COLLECTION_CONFIG[model_name].get("refresh_minutes", SCHEDULER_REFRESH_MINUTES)
+    if minutes is None:
+        return None
+    if isinstance(minutes, bool) or not isinstance(minutes, (int, float)) or minutes <= 0:
+        raise ValueError(f"'refresh_minutes' of model '{model_name}' must be a positive number or None.")
+    return float(minutes) * 60
+
+
+def next_slot(model_name, cadence, after):
+    """The model's first slot strictly after `after` (epoch seconds)."""
+    offset = zlib.crc32(model_name.encode("utf-8")) % max(1, int(cadence))
+    return offset + (math.floor((after - offset) / cadence) + 1) * cadence
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec="seconds")
+
+
+def _timestamp(iso):
+    return datetime.fromisoformat(iso).timestamp()
+
+
+def _state_path(model_name):
+    return os.path.join(SCHEDULER_DIR, f"{model_name}.json")
+
+
+def read_state(model_name):
+    """The model's saved schedule state (high_water, last_started_at, last_status, ...); {} if it never ran."""
+    try:
+        with open(_state_path(model_name), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_state(model_name, state):
+    os.makedirs(SCHEDULER_DIR, exist_ok=True)
+    with storage.atomic_path(_state_path(model_name)) as tmp_path, open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def since_date(state, now):
+    """Day the model's next fetch starts from: its high-water mark, or SCHEDULER_INITIAL_FETCH_DAYS before now."""
+    if state.get("high_water"):
+        return date.fromisoformat(state["high_water"])
+    return (datetime.fromtimestamp(now, timezone.utc) - timedelta(days=SCHEDULER_INITIAL_FETCH_DAYS)).date()
+
+
+class Scheduler:
+    """
+    Runs services.refresh_model_from_db for each scheduled model when it is due. Call run() (it
+    blocks until stop() is called, or until every model has run once with once=True).
+    `completed` lists the finished runs: model, started_at, finished_at (epoch seconds), success,
+    message and the details returned by the refresh.
+    """
+
+    def __init__(self, model_names=None, max_concurrent_fits=SCHEDULER_MAX_CONCURRENT_FITS,
+                 stagger_seconds=SCHEDULER_STAGGER_SECONDS, retry_seconds=SCHEDULER_RETRY_SECONDS, force=False):
+        self.cadences = {}
+        for model_name in model_names or POCKETBASE_COLLECTION_CONFIG:
+            cadence = refresh_seconds(model_name)
+            if cadence is not None:
+                self.cadences[model_name] = cadence
+        self.max_concurrent_fits = max(1, max_concurrent_fits)
+        self.stagger_seconds = stagger_seconds
+        self.retry_seconds = retry_seconds
+        self.force = force
+        self.states = {model_name: read_state(model_name) for model_name in self.cadences}
+        self.next_due = {}
+        self.completed = []
+        self._running = {}  # model name -> (future, started_at)
+        self._last_start = None
+        self._once = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._fit_pool = None
+        self._threads = None
+
+    def _initial_due(self, model_name, now):
+        """Now if the model never ran or missed its slot since its last run, else its next slot."""
+        last_started = self.states[model_name].get("last_started_at")
+        if last_started is None:
+            return now
+        slot = next_slot(model_name, self.cadences[model_name], _timestamp(last_started))
+        return now if slot <= now else slot
+
+    def _start(self, model_name, now):
+        since = since_date(self.states[model_name], now)
+        self.states[model_name]["last_started_at"] = _iso(now)
+        self._last_start = now
+        print(f"Starting: Scheduled refresh of '{model_name}' from {since.isoformat()}.")
+        future = self._threads.submit(self._refresh, model_name, since)
+        future.add_done_callback(lambda f: self._wake.set())
+        self._running[model_name] = (future, now)
+
+    def _refresh(self, model_name, since):
+        started = time.perf_counter()
+        try:
+            success, message, details = services.refresh_model_from_db(model_name, since, self._fit_pool, self.force)
+        except Exception as e:
+            success, message, details = False, f"Refresh failed: {e}", {"rows_fetched": 0, "high_water": None, "status": "fit_failed"}
+        details["seconds"] = round(time.perf_counter() - started, 3)
+        return success, message, details
+
+    def _finish(self, model_name, future, started_at, now):
+        success, message, details = future.result()
+        state = self.states[model_name]
+        if details["high_water"] and details["high_water"] > state.get("high_water", ""):
+            state["high_water"] = details["high_water"]
+        state.update(last_finished_at=_iso(now), last_status=details["status"], last_message=message,
+                     last_rows_fetched=details["rows_fetched"], last_seconds=details["seconds"])
+        write_state(model_name, state)
+        telemetry.count("scheduled_refreshes", model=model_name, status=details["status"])
+        self.completed.append({"model": model_name, "started_at": started_at, "finished_at": now,
+                               "success": success, "message": message, **details})
+
+        if self._once:
+            self.next_due[model_name] = math.inf
+        else:
+            self.next_due[model_name] = next_slot(model_name, self.cadences[model_name], now)
+            if not success:
+                self.next_due[model_name] = min(self.next_due[model_name], now + self.retry_seconds)
+        prefix = "Success" if success else "Error"
+        print(f"{prefix}: Scheduled refresh of '{model_name}' {details['status']} in {details['seconds']:.1f}s "
+              f"({details['rows_fetched']} point(s) fetched): {message} Next run at {_iso(self.next_due[model_name]) if self.next_due[model_name] < math.inf else '-'}.")
+
+    def tick(self, now):
+        """
+        Collects finished runs, then starts the due models (earliest first) that the stagger and
+        the concurrency cap allow. Returns the seconds until the next start could happen, or None
+        if that depends on a running refresh finishing.
+        """
+        for model_name, (future, started_at) in list(self._running.items()):
+            if future.done():
+                del self._running[model_name]
+                self._finish(model_name, future, started_at, now)
+
+        for due_at, model_name in sorted((t, name) for name, t in self.next_due.items() if name not in self._running):
+            if due_at > now or len(self._running) >= self.max_concurrent_fits:
+                break
+            if self._last_start is not None and now - self._last_start < self.stagger_seconds:
+                break
+            self._start(model_name, now)
+
+        if len(self._running) >= self.max_concurrent_fits:
+            return None
+        stagger_end = self._last_start + self.stagger_seconds if self._last_start is not None else now
+        waiting = [max(t, stagger_end) for name, t in self.next_due.items() if name not in self._running and t < math.inf]
+        return max(0.0, min(waiting) - now) if waiting else None
+
+    def stop(self):
+        """Makes run() return once the running refreshes finish."""
+        self._stop.set()
+        self._wake.set()
+
+    def run(self, once=False):
+        """Runs until stop() (or, with once=True, until every scheduled model has run once). Returns self.completed."""
+        now = time.time()
+        self._once = once
+        self.next_due = {model_name: now if once else self._initial_due(model_name, now) for model_name in self.cadences}
+        self._fit_pool = ProcessPoolExecutor(max_workers=self.max_concurrent_fits, mp_context=multiprocessing.get_context("spawn"))
+        self._threads = ThreadPoolExecutor(max_workers=self.max_concurrent_fits, thread_name_prefix="scheduler")
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                wait = self.tick(time.time())
+                if once and not self._running and all(t == math.inf for t in self.next_due.values()):
+                    break
+                self._wake.wait(MAX_IDLE_SECONDS if wait is None else min(wait, MAX_IDLE_SECONDS))
+            for model_name, (future, started_at) in list(self._running.items()):
+                future.result()
+                self._finish(model_name, future, started_at, time.time())
+            self._running.clear()
+        finally:
+            self._threads.shutdown(wait=True)
+            self._fit_pool.shutdown(wait=True)
+            telemetry.flush()
+        return self.completed
+
+
+def print_status(model_names):
+    print(f"{'model':<28}{'every':>9}{'high water':>12}  {'last run':<27}{'status':<14}{'next slot'}")
+    now = time.time()
+    for model_name in model_names:
+        cadence = refresh_seconds(model_name)
+        state = read_state(model_name)
+        every = "-" if cadence is None else f"{cadence / 60:g}m"
+        next_at = "-" if cadence is None else _iso(next_slot(model_name, cadence, now))
+        print(f"{model_name:<28}{every:>9}{state.get('high_water', '-'):>12}  {state.get('last_started_at', '-'):<27}"
+              f"{state.get('last_status', '-'):<14}{next_at}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh every model from PocketBase on its own cadence.")
+    parser.add_argument("--models", nargs="+", choices=sorted(POCKETBASE_COLLECTION_CONFIG),
+                        help="Only schedule these models (default: all configured).")
+    parser.add_argument("--once", action="store_true", help="Refresh every scheduled model once (staggered), then exit.")
+    parser.add_argument("--force", action="store_true", help="Refit even models whose history is unchanged.")
+    parser.add_argument("--status", action="store_true", help="Print each model's schedule state and exit.")
+    args = parser.parse_args()
+    model_names = args.models or list(POCKETBASE_COLLECTION_CONFIG)
+
+    try:
+        if args.status:
+            print_status(model_names)
+            sys.exit(0)
+        scheduler = Scheduler(model_names, force=args.force)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    if not services.POCKETBASE_URL:
+        print("Error: PocketBase URL not configured (NEXT_PUBLIC_POCKETBASE_URL).")
+        sys.exit(1)
+
+    with locks.exclusive_process("scheduler") as acquired:
+        if not acquired:
+            print(f"Error: Another scheduler is already running for {DATA_DIR}.")
+            sys.exit(1)
+        signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+        print(f"Starting: Scheduler for {len(scheduler.cadences)} model(s), at most {scheduler.max_concurrent_fits} "
+              f"concurrent fit(s), runs at least {scheduler.stagger_seconds}s apart. Press Ctrl+C to stop.")
+        try:
+            completed = scheduler.run(once=args.once)
+        except KeyboardInterrupt:
+            print("\nWarning: Scheduler interrupted; unfinished refreshes keep their previous high-water mark.")
+            sys.exit(1)
+    if args.once and not all(run["success"] for run in completed):
+        sys.exit(1)
@@ -0,0 +1,341 @@
+"""
+Batch training for multi-series models: a POCKETBASE_COLLECTION_CONFIG entry with a
+`series_key` expands into one Prophet series per distinct value of that field (per product,
+per part, ...).
+
+Series are hashed into SERIES_BUCKETS buckets, and both the history and the forecasts are
+stored as one Parquet file per bucket:
+
+    DATA_DIR/<model>_series/history/bucket=NNN.parquet     series, ds, y, updated_at
+    DATA_DIR/<model>_series/forecast/bucket=NNN.parquet    series, ds, yhat, yhat_lower, yhat_upper
+
+A bucket is the unit of work: each one is fitted in a worker process, one series at a time, so
+at most one fitted model per worker is alive and only the forecasts are kept. Each series gets
+its own forecaster (see forecasters.py); under "auto" the picks are kept per bucket in
+bucket=NNN.selection.json. Buckets whose history is unchanged since their last fit are skipped. Reading one series' forecast only reads
+its bucket.
+
+    python series.py train product_stocks_by_product --workers 8
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import forecasters
+import history
+import locks
+import telemetry
+from config import (
+    DATA_DIR,
+    FORECAST_HORIZON_DAYS,
+    HISTORICAL_WINDOW_DAYS,
+    POCKETBASE_COLLECTION_CONFIG,
+    SERIES_BUCKETS,
+    SERIES_TRAIN_WORKERS,
+    SERIES_UNCERTAINTY_SAMPLES,
+)
+from storage import atomic_path
+
+HISTORY_COLUMNS = ['series', 'ds', 'y', 'updated_at']
+FORECAST_COLUMNS = ['series', 'ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+def is_series_model(model_name):
+    return bool(POCKETBASE_COLLECTION_CONFIG.get(model_name, {}).get("series_key"))
+
+
+def series_models():
+    return [name for name in POCKETBASE_COLLECTION_CONFIG if is_series_model(name)]
+
+
+def bucket_of(series_key):
+    """Stable across processes and runs (unlike hash())."""
+    return zlib.crc32(str(series_key).encode("utf-8")) % SERIES_BUCKETS
+
+
+def get_series_dir(model_name, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{model_name}_series")
+
+
+def _bucket_path(model_name, table, bucket, data_dir=DATA_DIR):
+    return os.path.join(get_series_dir(model_name, data_dir), table, f"bucket={bucket:03d}.parquet")
+
+
+def history_bucket_path(model_name, bucket, data_dir=DATA_DIR):
+    return _bucket_path(model_name, "history", bucket, data_dir)
+
+
+def forecast_bucket_path(model_name, bucket, data_dir=DATA_DIR):
+    return _bucket_path(model_name, "forecast", bucket, data_dir)
+
+
+def list_buckets(model_name, table="history", data_dir=DATA_DIR):
+    try:
+        filenames = os.listdir(os.path.join(get_series_dir(model_name, data_dir), table))
+    except FileNotFoundError:
+        return []
+    return sorted(int(f[len("bucket="):-len(".parquet")]) for f in filenames
+                  if f.startswith("bucket=") and f.endswith(".parquet"))
+
+
+def _read_bucket(path, series_key=None):
+    import pyarrow.parquet as pq
+    filters = [('series', '=', str(series_key))] if series_key is not None else None
+    return pq.read_table(path, filters=filters, memory_map=True).to_pandas()
+
+
+def _write_bucket(path, df):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_path(path) as tmp_path:
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+
+
+def read_series_history(model_name, series_key=None, data_dir=DATA_DIR):
+    """One series' history (or all of them). Raises FileNotFoundError if there is none."""
+    if series_key is not None:
+        df = _read_bucket(history_bucket_path(model_name, bucket_of(series_key), data_dir), series_key)
+        if df.empty:
+            raise FileNotFoundError(f"No history for series '{series_key}' of '{model_name}'.")
+        return df
+    buckets = list_buckets(model_name, "history", data_dir)
+    if not buckets:
+        raise FileNotFoundError(f"No series history for '{model_name}'.")
+    return pd.concat([_read_bucket(history_bucket_path(model_name, b, data_dir)) for b in buckets], ignore_index=True)
+
+
+def read_series_forecast(model_name, series_key, data_dir=DATA_DIR):
+    """One series' forecast. Raises FileNotFoundError if it has none."""
+    df = _read_bucket(forecast_bucket_path(model_name, bucket_of(series_key), data_dir), series_key)
+    if df.empty:
+        raise FileNotFoundError(f"No forecast for series '{series_key}' of '{model_name}'.")
+    return df
+
+
+def forecast_signature(model_name, series_key, data_dir=DATA_DIR):
+    """(mtime_ns, size) of the bucket file holding the series' forecast, for caching responses."""
+    stat_result = os.stat(forecast_bucket_path(model_name, bucket_of(series_key), data_dir))
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def history_signature(model_name, series_key, data_dir=DATA_DIR):
+    """(mtime_ns, size) of the bucket file holding the series' history, for caching responses."""
+    stat_result = os.stat(history_bucket_path(model_name, bucket_of(series_key), data_dir))
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def merge_series_history(model_name, new_data_df, data_dir=DATA_DIR):
+    """
+    Merges new daily points (columns series, ds, y) into the bucketed history: the newest value
+    per (series, ds) wins and each series is trimmed to the model's window (see history.py).
+    Only the buckets of the incoming series are rewritten. Returns the touched bucket numbers.
+    """
+    new_df = new_data_df[['series', 'ds', 'y']].copy()
+    new_df['series'] = new_df['series'].astype(str)
+    new_df['ds'] = pd.to_datetime(new_df['ds']).dt.tz_localize(None)
+    new_df['y'] = pd.to_numeric(new_df['y'], errors='coerce')
+    new_df['updated_at'] = pd.Timestamp.now('UTC').tz_localize(None)
+    new_df.dropna(subset=['series', 'ds', 'y'], inplace=True)
+    keys = new_df['series'].unique()
+    new_df['bucket'] = new_df['series'].map(dict(zip(keys, (bucket_of(key) for key in keys))))
+
+    window = history.history_window(model_name)
+    touched = []
+    with locks.model_lock(model_name, locks.HISTORY):
+        for bucket, bucket_new_df in new_df.groupby('bucket', sort=True):
+            path = history_bucket_path(model_name, bucket, data_dir)
+            frames = [bucket_new_df[HISTORY_COLUMNS]]
+            if os.path.exists(path):
+                frames.insert(0, _read_bucket(path)[HISTORY_COLUMNS])
+            combined = pd.concat(frames, ignore_index=True)
+            combined.sort_values(['series', 'ds', 'updated_at'], inplace=True, kind='stable')
+            combined.drop_duplicates(['series', 'ds'], keep='last', inplace=True)
+            combined = history.trim_series(combined, window)
+            _write_bucket(path, combined.reset_index(drop=True))
+            touched.append(int(bucket))
+    return touched
+
+
+def _bucket_fingerprint(model_name, bucket_history):
+    """Content hash of a bucket's sorted history plus the settings that shape its forecasts (see services.history_fingerprint)."""
+    settings = {
+        "collection": forecasters.fitted_config(model_name),
+        "window_days": HISTORICAL_WINDOW_DAYS,
+        "horizon_days": FORECAST_HORIZON_DAYS,
+        "uncertainty_samples": SERIES_UNCERTAINTY_SAMPLES,
+        "prophet": forecasters.prophet_version(),
+        "forecaster": forecasters.configured_forecaster(model_name),
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    digest.update("\0".join(bucket_history['series']).encode("utf-8"))
+    digest.update(bucket_history['ds'].to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+    digest.update(bucket_history['y'].to_numpy(dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _read_selections(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def train_bucket(model_name, bucket, force=False, data_dir=DATA_DIR):
+    """
+    Fits every series of one bucket with its forecaster and rewrites the bucket's forecast file.
+    Runs in a pool worker; each model is dropped as soon as its forecast is taken. Returns a stats dict.
+    """
+    from prophet import Prophet
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)  # One INFO line per fit otherwise
+
+    started = time.perf_counter()
+    stats = {"bucket": bucket, "series": 0, "fitted": 0, "too_few_points": 0, "failed": 0, "skipped": False,
+             "forecasters": {}}
+    bucket_history = _read_bucket(history_bucket_path(model_name, bucket, data_dir))
+    bucket_history.sort_values(['series', 'ds'], inplace=True, kind='stable')
+    stats["series"] = int(bucket_history['series'].nunique())
+
+    forecast_path = forecast_bucket_path(model_name, bucket, data_dir)
+    fingerprint_path = os.path.splitext(forecast_path)[0] + ".fingerprint"
+    selection_path = os.path.splitext(forecast_path)[0] + ".selection.json"
+    fingerprint = _bucket_fingerprint(model_name, bucket_history)
+    if not force and os.path.exists(forecast_path) and os.path.exists(fingerprint_path):
+        with open(fingerprint_path, "r") as f:
+            if f.read().strip() == fingerprint:
+                stats.update(skipped=True, seconds=time.perf_counter() - started)
+                telemetry.count("fits_skipped", stats["series"], model=model_name)
+                telemetry.flush()
+                return stats
+
+    configured = forecasters.configured_forecaster(model_name)
+    previous_selections = _read_selections(selection_path)
+    selections = {}
+    forecasts = []
+    for series_key, series_df in bucket_history.groupby('series', sort=False):
+        if len(series_df) < forecasters.MIN_POINTS[configured]:
+            stats["too_few_points"] += 1
+            continue
+        try:
+            selection = forecasters.select_forecaster(configured, series_df, FORECAST_HORIZON_DAYS,
+                                                      previous=previous_selections.get(series_key))
+            forecaster_name = selection["forecaster"]
+            if forecaster_name == "prophet":
+                model = Prophet(uncertainty_samples=SERIES_UNCERTAINTY_SAMPLES)
+                with telemetry.span("fit", model=model_name, forecaster="prophet"):
+                    model.fit(series_df[['ds', 'y']])
+                with telemetry.span("predict", model=model_name, forecaster="prophet"):
+                    forecast = model.predict(model.make_future_dataframe(periods=FORECAST_HORIZON_DAYS))
+                del model
+            else:
+                with telemetry.span("fit", model=model_name, forecaster=forecaster_name):
+                    forecast = forecasters.baseline_forecast(forecaster_name, series_df, FORECAST_HORIZON_DAYS)
+        except Exception as e:
+            print(f"Warning: Could not fit series '{series_key}' of '{model_name}': {e}")
+            stats["failed"] += 1
+            continue
+        forecast.insert(0, 'series', series_key)
+        forecasts.append(forecast[FORECAST_COLUMNS])
+        selections[series_key] = selection
+        stats["fitted"] += 1
+        stats["forecasters"][forecaster_name] = stats["forecasters"].get(forecaster_name, 0) + 1
+        telemetry.count("fits", model=model_name, forecaster=forecaster_name)
+
+    if forecasts:
+        _write_bucket(forecast_path, pd.concat(forecasts, ignore_index=True))
+    elif os.path.exists(forecast_path):
+        os.remove(forecast_path)
+    with atomic_path(selection_path) as tmp_path, open(tmp_path, "w") as f:
+        json.dump(selections, f)
+    with atomic_path(fingerprint_path) as tmp_path, open(tmp_path, "w") as f:
+        f.write(fingerprint)
+    stats["seconds"] = time.perf_counter() - started
+    telemetry.flush()  # Pool workers exit without running atexit handlers
+    return stats
+
+
+def train_series_model(model_name, executor=None, force=False, on_bucket_done=None, data_dir=DATA_DIR):
+    """
+    Fits every bucket of a series model on executor (a new pool of SERIES_TRAIN_WORKERS
+    processes if None). on_bucket_done(stats, buckets_done, buckets_total) is called as buckets
+    complete. Returns (success, message, summary).
+    """
+    configured = forecasters.configured_forecaster(model_name)
+    if configured not in forecasters.FORECASTER_NAMES:
+        return False, f"Unknown forecaster '{configured}' for model '{model_name}'. Expected one of: {', '.join(forecasters.FORECASTER_NAMES)}.", {}
+    buckets = list_buckets(model_name, "history", data_dir)
+    if not buckets:
+        return False, f"No series history for '{model_name}'.", {}
+
+    started = time.perf_counter()
+    summary = {"buckets": len(buckets), "buckets_skipped": 0, "series": 0, "fitted": 0,
+               "too_few_points": 0, "failed": 0, "buckets_failed": 0, "forecasters": {}}
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=SERIES_TRAIN_WORKERS)
+    try:
+        # Held across the run so two trainings of the same model never interleave their writes.
+        with locks.model_lock(model_name, locks.FORECAST):
+            futures = [executor.submit(train_bucket, model_name, bucket, force, data_dir) for bucket in buckets]
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    print(f"Warning: Training a bucket of '{model_name}' failed: {e}")
+                    summary["buckets_failed"] += 1
+                    continue
+                summary["buckets_skipped"] += stats["skipped"]
+                for key in ("series", "fitted", "too_few_points", "failed"):
+                    summary[key] += stats[key]
+                for name, count in stats["forecasters"].items():
+                    summary["forecasters"][name] = summary["forecasters"].get(name, 0) + count
+                if on_bucket_done is not None:
+                    on_bucket_done(stats, done, len(buckets))
+            reconciled = None
+            if POCKETBASE_COLLECTION_CONFIG[model_name].get("hierarchy") is not None:
+                import hierarchy  # Imports this module
+                reconciled = hierarchy.reconcile_model(model_name, force=force, data_dir=data_dir)
+                summary["hierarchy"] = reconciled[2]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    seconds = time.perf_counter() - started
+    summary["seconds"] = round(seconds, 3)
+    summary["series_per_minute"] = round(summary["fitted"] * 60 / seconds, 1) if seconds else None
+    by_forecaster = ", ".join(f"{count} {name}" for name, count in sorted(summary["forecasters"].items()))
+    message = (f"Series model '{model_name}': fitted {summary['fitted']} of {summary['series']} series "
+               f"{f'({by_forecaster}) ' if by_forecaster else ''}in {seconds:.1f}s ({summary['buckets_skipped']} unchanged bucket(s) skipped, "
+               f"{summary['too_few_points']} series with too few points, {summary['failed']} failed).")
+    success = summary["failed"] == 0 and summary["buckets_failed"] == 0
+    if reconciled is not None:
+        success, message = success and reconciled[0], f"{message} {reconciled[1]}"
+    return success, message, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch training for multi-series models.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train_parser = subparsers.add_parser("train", help="Fit every series of a series model.")
+    train_parser.add_argument("model_name", choices=series_models())
+    train_parser.add_argument("--workers", type=int, default=SERIES_TRAIN_WORKERS)
+    train_parser.add_argument("--force", action="store_true", help="Refit buckets whose history is unchanged.")
+    args = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        success, message, _ = train_series_model(args.model_name, pool, args.force)
+    if success:
+        print(f"Success: {message}")
+    else:
+        print(f"Error: {message}")
+        sys.exit(1)
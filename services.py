@@ -1,133 +1,450 @@
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-from prophet import Prophet
 from datetime import datetime, timedelta
-from pocketbase import PocketBase
 
 # Import configurations from config.py
 from config import (
     DATA_DIR, 
     HISTORICAL_WINDOW_DAYS, 
+    FORECAST_HORIZON_DAYS,
     POCKETBASE_URL, 
-    POCKETBASE_COLLECTION_CONFIG
+    POCKETBASE_COLLECTION_CONFIG,
+    WARM_START_REFITS,
+    BACKFILL_MONTH_CONCURRENCY,
+    PB_MAX_CONNECTIONS,
+    PB_ADMIN_EMAIL,
+    PB_ADMIN_PASSWORD
 )
+import response_cache
+import bulk_ingest
+import jobs
+import locks
+import series
+import forecasters
+import history
+import model_store
+import storage
+import telemetry
+
+# Prophet (with cmdstanpy and matplotlib) and httpx are imported where they are used, so API
+# processes that only serve reads never load them.
 
 def get_data_filepath(model_name):
-    return os.path.join(DATA_DIR, f"{model_name}_data.csv")
+    return storage.get_backend().data_path(model_name)
 
 def get_forecast_filepath(model_name):
-    return os.path.join(DATA_DIR, f"{model_name}_forecast.csv")
+    return storage.get_backend().forecast_path(model_name)
+
+def get_fingerprint_filepath(model_name):
+    """Sidecar next to the forecast holding the fingerprint of the history it was trained on."""
+    return os.path.splitext(get_forecast_filepath(model_name))[0] + ".fingerprint"
+
+def get_forecaster_filepath(model_name):
+    """Sidecar next to the forecast recording which forecaster produced it (see forecasters.py)."""
+    return os.path.splitext(get_forecast_filepath(model_name))[0] + ".forecaster.json"
+
+def read_forecaster_selection(model_name):
+    """The selection dict saved with the current forecast, or None (e.g. for forecasts saved before forecasters)."""
+    try:
+        with open(get_forecaster_filepath(model_name), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def current_forecaster(model_name):
+    """Name of the forecaster behind the saved forecast; forecasts without a selection came from Prophet."""
+    return (read_forecaster_selection(model_name) or {}).get("forecaster", "prophet")
+
+def history_fingerprint(model_name: str, historical_df: pd.DataFrame):
+    """
+    Content hash of the (already windowed) ds/y series a model would be trained on, plus
+    everything else that shapes the forecast: the model's collection config, the window and
+    horizon settings and the Prophet version.
+    """
+    ds = pd.to_datetime(historical_df['ds']).to_numpy(dtype='datetime64[ns]')
+    y = pd.to_numeric(historical_df['y'], errors='coerce').to_numpy(dtype=np.float64)
+    settings = {
+        "collection": forecasters.fitted_config(model_name),
+        "window_days": HISTORICAL_WINDOW_DAYS,
+        "horizon_days": FORECAST_HORIZON_DAYS,
+        "prophet": forecasters.prophet_version(),
+        "forecaster": forecasters.configured_forecaster(model_name),
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    digest.update(ds.view(np.int64).tobytes())
+    digest.update(y.tobytes())
+    return digest.hexdigest()
+
+def _read_fingerprint(model_name: str):
+    try:
+        with open(get_fingerprint_filepath(model_name), "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _fingerprint_is_current(model_name: str, fingerprint: str):
+    if not os.path.exists(get_forecast_filepath(model_name)):
+        return False
+    if current_forecaster(model_name) == "prophet" and model_store.latest_version(model_name) is None:
+        return False
+    return _read_fingerprint(model_name) == fingerprint
+
+def forecast_is_current(model_name: str, historical_df: pd.DataFrame):
+    """True if the saved forecast and model were trained on exactly this history and config."""
+    return _fingerprint_is_current(model_name, history_fingerprint(model_name, historical_df))
 
 def _process_and_save_historical_data(model_name: str, new_data_df: pd.DataFrame):
     """
-    Helper function to combine new data with existing, apply rolling window, and save.
+    Merges new points into the saved history (a new point replaces the saved one for the same
+    'ds'), applies the model's rolling window (see history.py) and saves it.
     Returns the processed DataFrame.
     """
     historical_data_filepath = get_data_filepath(model_name)
-    now_iso = datetime.utcnow().isoformat()
+    window = history.history_window(model_name)
+    new_df = history.new_points(new_data_df, pd.Timestamp.now('UTC').tz_localize(None))
 
-    # Ensure 'ds' is datetime and timezone naive for new_data_df
-    if 'ds' in new_data_df.columns:
-        new_data_df['ds'] = pd.to_datetime(new_data_df['ds']).dt.tz_localize(None)
-    
-    if 'created_at' not in new_data_df.columns:
-        new_data_df['created_at'] = now_iso
-    # Always set/update 'updated_at' for new entries or fetched data
-    new_data_df['updated_at'] = now_iso
+    # Read-merge-write under the model's lock so concurrent updates (from any process) don't drop each other's rows.
+    with telemetry.span("history_merge", model=model_name), locks.model_lock(model_name, locks.HISTORY):
+        existing_df = pd.DataFrame(columns=storage.HISTORY_COLUMNS)
 
-    historical_df_columns = ['ds', 'y', 'created_at', 'updated_at']
-    existing_df = pd.DataFrame(columns=historical_df_columns)
+        if os.path.exists(historical_data_filepath):
+            try:
+                with telemetry.span("history_read", model=model_name):
+                    existing_df = storage.get_backend().read_history(model_name) # Date columns come back parsed
+            except Exception as e:
+                print(f"Warning: Could not read or parse existing data file {historical_data_filepath}: {str(e)}. Proceeding as if empty.")
+                existing_df = pd.DataFrame(columns=storage.HISTORY_COLUMNS)
 
-    if os.path.exists(historical_data_filepath):
-        try:
-            existing_df = pd.read_csv(historical_data_filepath)
-            for col in ['ds', 'created_at', 'updated_at']: # Ensure date columns are parsed
-                if col in existing_df.columns:
-                    existing_df[col] = pd.to_datetime(existing_df[col], errors='coerce')
-            if 'ds' in existing_df.columns:
-                existing_df['ds'] = existing_df['ds'].dt.tz_localize(None)
-        except Exception as e:
-            print(f"Warning: Could not read or parse existing data file {historical_data_filepath}: {str(e)}. Proceeding as if empty.")
-            existing_df = pd.DataFrame(columns=historical_df_columns)
-
-    # Ensure consistent columns for concatenation
-    for col in historical_df_columns:
-        if col not in new_data_df.columns:
-            new_data_df[col] = pd.NaT if 'date' in col or 'ds' in col else (0.0 if col == 'y' else None)
-        if col not in existing_df.columns:
-            existing_df[col] = pd.NaT if 'date' in col or 'ds' in col else (0.0 if col == 'y' else None)
-    
-    combined_df = pd.concat([existing_df, new_data_df], ignore_index=True)
-    
-    # Ensure 'ds' and 'updated_at' are datetime for sorting and dropping duplicates
-    combined_df['ds'] = pd.to_datetime(combined_df['ds'], errors='coerce').dt.tz_localize(None)
-    combined_df['updated_at'] = pd.to_datetime(combined_df['updated_at'], errors='coerce')
-    combined_df.dropna(subset=['ds'], inplace=True) # Remove rows where 'ds' is NaT
+        for col in storage.HISTORY_COLUMNS:
+            if col not in existing_df.columns:
+                existing_df[col] = pd.NaT if col != 'y' else 0.0
 
-    combined_df.sort_values(by=['ds', 'updated_at'], ascending=[True, True], inplace=True)
-    combined_df.drop_duplicates(subset=['ds'], keep='last', inplace=True)
-    
-    combined_df.sort_values('ds', ascending=True, inplace=True)
-    if len(combined_df) > HISTORICAL_WINDOW_DAYS:
-        combined_df = combined_df.tail(HISTORICAL_WINDOW_DAYS)
-    
-    combined_df.reset_index(drop=True, inplace=True)
-    
-    # Select only relevant columns for saving
-    combined_df_to_save = combined_df[historical_df_columns]
-    combined_df_to_save.to_csv(historical_data_filepath, index=False)
-    return combined_df_to_save
+        combined_df, evicted_ds = history.merge(existing_df, new_df, window)
+        with telemetry.span("history_write", model=model_name):
+            storage.get_backend().write_history(model_name, combined_df, touched_ds=new_df['ds'], evicted_ds=evicted_ds)
+    telemetry.count("rows_ingested", len(new_df), model=model_name)
+    response_cache.invalidate(model_name, response_cache.HISTORICAL_DATA)
+    return combined_df
+
+def _load_previous_model(model_name: str):
+    """Latest stored fit for a model, or None if there is none or it cannot be read."""
+    try:
+        return model_store.load_model(model_name)[1]
+    except Exception as e:
+        print(f"Warning: Could not load previous model for '{model_name}', fitting from scratch: {str(e)}")
+        return None
+
+def _fit_prophet_forecast(model_name: str, historical_df: pd.DataFrame):
+    """Fits Prophet (warm-started from the previous stored fit), stores the model and returns its forecast."""
+    from prophet import Prophet
+    fit_kwargs = {}
+    if WARM_START_REFITS:
+        previous_model = _load_previous_model(model_name)
+        if previous_model is not None:
+            fit_kwargs['init'] = model_store.warm_start_params(previous_model)
+    model = Prophet()
+    with telemetry.span("fit", model=model_name, forecaster="prophet"):
+        model.fit(historical_df[['ds', 'y']].copy(), **fit_kwargs) # Use .copy()
+    model_store.save_model(model_name, model)
+    jobs.report_progress(stage="predicting")
+    future = model.make_future_dataframe(periods=FORECAST_HORIZON_DAYS)
+    with telemetry.span("predict", model=model_name, forecaster="prophet"):
+        return model.predict(future)
 
-def _train_and_save_forecast(model_name: str, historical_df: pd.DataFrame):
-    """Helper function to train Prophet model and save forecast."""
+def _remove_forecast_files(model_name: str):
+    """Removes the saved forecast and its sidecars. Returns a note for the caller's message."""
+    note = ""
     forecast_filepath = get_forecast_filepath(model_name)
+    if os.path.exists(forecast_filepath):
+        try:
+            os.remove(forecast_filepath)
+            response_cache.invalidate(model_name, response_cache.FORECAST)
+            note = f" Old forecast file {forecast_filepath} removed."
+        except OSError as e:
+            print(f"Warning: Could not remove old forecast file {forecast_filepath}: {e}")
+    for sidecar in (get_fingerprint_filepath(model_name), get_forecaster_filepath(model_name)):
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+    return note
 
-    if historical_df.empty or len(historical_df) < 20: # Min data points for stable Prophet
-        message = f"Not enough data ({len(historical_df)} points) to train model '{model_name}'. Data saved to {get_data_filepath(model_name)}."
-        if os.path.exists(forecast_filepath):
-            try:
-                os.remove(forecast_filepath)
-                message += f" Old forecast file {forecast_filepath} removed."
-            except OSError as e:
-                print(f"Warning: Could not remove old forecast file {forecast_filepath}: {e}")
-        return False, message
+def _train_and_save_forecast(model_name: str, historical_df: pd.DataFrame, force: bool = False):
+    """
+    Helper function to pick the model's forecaster (see forecasters.py), train it and save the forecast.
+    Skipped (and reported as such) when the history is unchanged since the last fit, unless force is set.
+    """
+    configured = forecasters.configured_forecaster(model_name)
+    if configured not in forecasters.FORECASTER_NAMES:
+        return False, f"Unknown forecaster '{configured}' for model '{model_name}'. Expected one of: {', '.join(forecasters.FORECASTER_NAMES)}."
 
-    try:
-        model = Prophet()
-        model.fit(historical_df[['ds', 'y']].copy()) # Use .copy()
-        future = model.make_future_dataframe(periods=30) # Forecast 30 days
+    # One fit per model at a time across processes; a waiting retrain then finds the fingerprint current.
+    with locks.model_lock(model_name, locks.FORECAST):
+        min_points = forecasters.MIN_POINTS[configured]
+        if historical_df.empty or len(historical_df) < min_points: # Prophet needs 20 points, the baselines far fewer
+            message = f"Not enough data ({len(historical_df)} points) to train model '{model_name}'. Data saved to {get_data_filepath(model_name)}."
+            return False, message + _remove_forecast_files(model_name)
+
+        fingerprint = history_fingerprint(model_name, historical_df)
+        if not force and _fingerprint_is_current(model_name, fingerprint):
+            telemetry.count("fits_skipped", model=model_name)
+            return True, f"History for model '{model_name}' is unchanged since the last fit; retrain skipped (use force=true to refit)."
+
+        try:
+            jobs.report_progress(stage="selecting", data_points=len(historical_df))
+            selection = forecasters.select_forecaster(configured, historical_df, FORECAST_HORIZON_DAYS,
+                                                      previous=read_forecaster_selection(model_name))
+            forecaster_name = selection["forecaster"]
+            jobs.report_progress(stage="fitting", forecaster=forecaster_name)
+            if forecaster_name == "prophet":
+                forecast = _fit_prophet_forecast(model_name, historical_df)
+            else:
+                # Baselines fit and predict in one pass, so their "fit" span covers both.
+                with telemetry.span("fit", model=model_name, forecaster=forecaster_name):
+                    forecast = forecasters.baseline_forecast(forecaster_name, historical_df, FORECAST_HORIZON_DAYS)
+            telemetry.count("fits", model=model_name, forecaster=forecaster_name)
+            storage.get_backend().write_forecast(model_name, forecast[storage.FORECAST_COLUMNS])
+            with storage.atomic_path(get_forecaster_filepath(model_name)) as tmp_path, open(tmp_path, "w") as f:
+                json.dump(selection, f)
+            with storage.atomic_path(get_fingerprint_filepath(model_name)) as tmp_path, open(tmp_path, "w") as f:
+                f.write(fingerprint)
+            response_cache.invalidate(model_name, response_cache.FORECAST)
+            return True, f"Forecast for model '{model_name}' (re)trained with {forecaster_name} and saved successfully."
+        except Exception as e:
+            return False, f"Error during model training or prediction for '{model_name}': {str(e)}"
+
+# Frequencies accepted by /forecast/<model_name>?freq=..., mapped to pandas offsets
+FORECAST_FREQUENCIES = {'D': 'D', 'W': 'W', 'M': 'MS'}
+
+@lru_cache(maxsize=8)
+def _load_stored_model(model_name: str, version: int, include_uncertainty: bool):
+    _, model = model_store.load_model(model_name, version)
+    if not include_uncertainty:
+        model.uncertainty_samples = 0 # Interval sampling dominates predict time
+    return model
+
+def predict_from_stored_model(model_name: str, version: int, horizon: int, freq: str = 'D', include_uncertainty: bool = True):
+    """
+    Predicts `horizon` periods of `freq` past the history of a stored model version, without refitting.
+    Returns the forecast in the same ds/yhat/yhat_lower/yhat_upper layout as the saved forecast
+    (only ds/yhat when include_uncertainty is False).
+    """
+    model = _load_stored_model(model_name, version, include_uncertainty)
+    future = model.make_future_dataframe(periods=horizon, freq=FORECAST_FREQUENCIES[freq])
+    with telemetry.span("predict", model=model_name, forecaster="prophet"):
         forecast = model.predict(future)
-        forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_csv(forecast_filepath, index=False)
-        return True, f"Forecast for model '{model_name}' (re)trained and saved successfully."
-    except Exception as e:
-        return False, f"Error during model training or prediction for '{model_name}': {str(e)}"
+    columns = ['ds', 'yhat', 'yhat_lower', 'yhat_upper'] if include_uncertainty else ['ds', 'yhat']
+    return forecast[columns]
 
-def update_forecast_manually(model_name: str, new_data_list: list):
+def on_demand_version(model_name: str):
     """
-    Updates forecast by manually providing a list of new data points.
-    Applies rolling window.
+    What on-demand forecasts for a model are predicted from, as a cache key: ("prophet", stored
+    model version) or (baseline name, history fingerprint). None if there is nothing to predict from.
+    """
+    forecaster_name = current_forecaster(model_name)
+    if forecaster_name == "prophet":
+        version = model_store.latest_version(model_name)
+        return None if version is None else ("prophet", version)
+    fingerprint = _read_fingerprint(model_name)
+    return None if fingerprint is None else (forecaster_name, fingerprint)
+
+def predict_on_demand(model_name: str, version: tuple, horizon: int, freq: str = 'D', include_uncertainty: bool = True):
+    """predict_from_stored_model() for an on_demand_version(); baselines are refitted on the saved history (milliseconds)."""
+    forecaster_name, token = version
+    if forecaster_name == "prophet":
+        return predict_from_stored_model(model_name, token, horizon, freq, include_uncertainty)
+    historical_df = load_historical_data(model_name)
+    with telemetry.span("predict", model=model_name, forecaster=forecaster_name):
+        return forecasters.baseline_forecast(forecaster_name, historical_df, horizon,
+                                             FORECAST_FREQUENCIES[freq], include_uncertainty)
+
+def append_manual_data(model_name: str, new_data_list: list):
+    """
+    Parses a list of manually provided data points and merges them into the model's history.
+    Applies rolling window. Returns (success, message, processed_historical_df); the DataFrame
+    is None when nothing was merged.
     """
     if not new_data_list or not isinstance(new_data_list, list):
-        return False, "Invalid input: Expecting a list of new data points."
+        return False, "Invalid input: Expecting a list of new data points.", None
 
     try:
         new_data_df = pd.DataFrame(new_data_list)
         if 'ds' not in new_data_df.columns or 'y' not in new_data_df.columns:
-             return False, "New data must contain 'ds' and 'y' columns."
+             return False, "New data must contain 'ds' and 'y' columns.", None
         new_data_df['ds'] = pd.to_datetime(new_data_df['ds'], errors='coerce')
         new_data_df['y'] = pd.to_numeric(new_data_df['y'], errors='coerce')
         new_data_df.dropna(subset=['ds', 'y'], inplace=True)
     except Exception as e:
-        return False, f"Failed to parse new data: {str(e)}"
+        return False, f"Failed to parse new data: {str(e)}", None
 
     if new_data_df.empty:
-        return True, "No valid new data points provided after parsing. No update performed."
+        return True, "No valid new data points provided after parsing. No update performed.", None
 
     processed_historical_df = _process_and_save_historical_data(model_name, new_data_df)
-    return _train_and_save_forecast(model_name, processed_historical_df)
+    return True, f"Merged {len(new_data_df)} data points into the history of '{model_name}'.", processed_historical_df
+
+def append_manual_series_data(model_name: str, new_data_list: list):
+    """
+    append_manual_data() for a series model: every point also needs a 'series' key.
+    Returns (success, message, touched_buckets); touched_buckets is None when nothing was merged.
+    """
+    if not new_data_list or not isinstance(new_data_list, list):
+        return False, "Invalid input: Expecting a list of new data points.", None
+
+    try:
+        new_data_df = pd.DataFrame(new_data_list)
+        if not {'series', 'ds', 'y'} <= set(new_data_df.columns):
+            return False, "New data for a series model must contain 'series', 'ds' and 'y' columns.", None
+        new_data_df['ds'] = pd.to_datetime(new_data_df['ds'], errors='coerce')
+        new_data_df['y'] = pd.to_numeric(new_data_df['y'], errors='coerce')
+        new_data_df.dropna(subset=['series', 'ds', 'y'], inplace=True)
+    except Exception as e:
+        return False, f"Failed to parse new data: {str(e)}", None
 
+    if new_data_df.empty:
+        return True, "No valid new data points provided after parsing. No update performed.", None
+
+    touched = series.merge_series_history(model_name, new_data_df)
+    return True, f"Merged {len(new_data_df)} data points for {new_data_df['series'].nunique()} series into the history of '{model_name}'.", touched
+
+def append_bulk_data(model_name: str, stream, fmt: str):
+    """
+    Streams an NDJSON or CSV body (see bulk_ingest.py) into the model's history in a single merge;
+    bad rows are dropped and counted. Returns (success, message, stats, merged): merged is the
+    processed history DataFrame, or the touched buckets for a series model, and None when
+    nothing was merged.
+    """
+    is_series = series.is_series_model(model_name)
+    try:
+        with telemetry.span("bulk_parse", model=model_name, format=fmt):
+            new_data_df, stats = bulk_ingest.read_points(stream, fmt, with_series=is_series)
+    except Exception as e:
+        return False, f"Failed to parse new data: {str(e)}", None, None
+    for reason in bulk_ingest.REJECT_REASONS:
+        if stats[reason]:
+            telemetry.count("bulk_rows_rejected", stats[reason], model=model_name, reason=reason)
+
+    rejected = f" ({stats['rejected']} of {stats['rows']} rows rejected)" if stats["rejected"] else ""
+    if new_data_df.empty:
+        return True, f"No valid new data points provided after parsing{rejected}. No update performed.", stats, None
+
+    if is_series:
+        merged = series.merge_series_history(model_name, new_data_df)
+        message = f"Merged {len(new_data_df)} data points for {new_data_df['series'].nunique()} series into the history of '{model_name}'{rejected}."
+    else:
+        merged = _process_and_save_historical_data(model_name, new_data_df)
+        message = f"Merged {len(new_data_df)} data points into the history of '{model_name}'{rejected}."
+    return True, message, stats, merged
+
+def update_forecast_from_bulk(model_name: str, stream, fmt: str, force: bool = False, retrain_executor=None):
+    """
+    append_bulk_data() followed by one retrain. A series model is batch-fitted on retrain_executor
+    (a new pool of SERIES_TRAIN_WORKERS processes if None). Returns (success, message, stats).
+    """
+    success, message, stats, merged = append_bulk_data(model_name, stream, fmt)
+    if merged is None:
+        return success, message, stats
+    if series.is_series_model(model_name):
+        success, fit_message, _ = series.train_series_model(model_name, retrain_executor, force)
+    else:
+        success, fit_message = _train_and_save_forecast(model_name, merged, force=force)
+    return success, f"{message} {fit_message}", stats
+
+def update_forecast_manually(model_name: str, new_data_list: list, force: bool = False, retrain_executor=None):
+    """
+    Updates forecast by manually providing a list of new data points.
+    Applies rolling window. A series model is batch-fitted on retrain_executor (a new pool of
+    SERIES_TRAIN_WORKERS processes if None).
+    """
+    if series.is_series_model(model_name):
+        success, message, touched_buckets = append_manual_series_data(model_name, new_data_list)
+        if touched_buckets is None:
+            return success, message
+        success, fit_message, _ = series.train_series_model(model_name, retrain_executor, force)
+        return success, f"{message} {fit_message}"
 
-def fetch_data_for_month_from_pb(pb_client: PocketBase, model_name: str, target_month_date: datetime.date):
+    success, message, processed_historical_df = append_manual_data(model_name, new_data_list)
+    if processed_historical_df is None:
+        return success, message
+    return _train_and_save_forecast(model_name, processed_historical_df, force=force)
+
+def load_historical_data(model_name: str):
+    """Reads the saved history for a model with 'ds' parsed. Raises FileNotFoundError if missing."""
+    with telemetry.span("history_read", model=model_name):
+        historical_df = storage.get_backend().read_history(model_name)
+    historical_df.dropna(subset=['ds'], inplace=True)
+    return historical_df
+
+def retrain_from_saved_history(model_name: str, force: bool = False):
+    """Retrains a model from its saved history file. Used by background retrain jobs."""
+    # Read the history only once this job holds the fit lock, so an older snapshot never overwrites a newer fit.
+    with locks.model_lock(model_name, locks.FORECAST):
+        try:
+            historical_df = load_historical_data(model_name)
+        except FileNotFoundError:
+            return False, f"Historical data for model '{model_name}' not found."
+        except Exception as e:
+            return False, f"Error reading historical data for '{model_name}': {str(e)}"
+        return _train_and_save_forecast(model_name, historical_df, force=force)
+
+def timed_retrain_from_saved_history(model_name: str, force: bool = False):
+    """retrain_from_saved_history() plus the wall time it took. Returns (success, message, seconds)."""
+    started = time.perf_counter()
+    success, message = retrain_from_saved_history(model_name, force=force)
+    return success, message, time.perf_counter() - started
+
+
+def retrain_series_model(model_name: str, force: bool = False, retrain_executor=None):
+    """
+    Batch-fits a series model, one task per bucket on retrain_executor (the job worker pool by
+    default, so call this from an in-thread job). Returns (success, message, summary).
+    """
+    if retrain_executor is None:
+        retrain_executor = jobs.get_worker_pool()
+    jobs.report_progress(stage="fitting", buckets_done=0)
+
+    def on_bucket_done(stats, done, total):
+        jobs.report_progress(buckets_done=done, buckets_total=total)
+
+    return series.train_series_model(model_name, retrain_executor, force, on_bucket_done)
+
+def timed_retrain_series_model(model_name: str, force: bool = False, retrain_executor=None):
+    """retrain_series_model() with the wall time it took in place of the summary."""
+    started = time.perf_counter()
+    success, message, _ = retrain_series_model(model_name, force, retrain_executor)
+    return success, message, time.perf_counter() - started
+
+
+# One long-lived, authenticated PocketBase client per process, shared by every fetch
+# (jobs, backfills, bulk updates) so connections and the auth token are reused.
+_pb_client = None
+_pb_client_lock = threading.Lock()
+
+def get_pb_client():
+    """Returns the shared PocketBaseFetcher, creating (and authenticating) it on first use."""
+    from pb_fetch import PocketBaseFetcher
+    global _pb_client
+    with _pb_client_lock:
+        if _pb_client is None:
+            pb_client = PocketBaseFetcher(POCKETBASE_URL, max_connections=PB_MAX_CONNECTIONS)
+            if PB_ADMIN_EMAIL and PB_ADMIN_PASSWORD:
+                try:
+                    pb_client.authenticate(PB_ADMIN_EMAIL, PB_ADMIN_PASSWORD)
+                except Exception:
+                    pb_client.close()
+                    raise
+            _pb_client = pb_client
+        return _pb_client
+
+
+def _fetch_daily_from_pb(pb_client: "PocketBaseFetcher", model_name: str, start_dt: datetime, end_dt: datetime = None,
+                         period_label: str = "", raise_errors: bool = False):
+    """Fetches the model's records with ds_field in [start_dt, end_dt] (no upper bound if end_dt is None), aggregated per day."""
     if model_name not in POCKETBASE_COLLECTION_CONFIG:
         print(f"Error: PocketBase configuration not found for model '{model_name}'.")
         return pd.DataFrame()
@@ -137,73 +454,257 @@ def fetch_data_for_month_from_pb(pb_client: PocketBase, model_name: str, target_
     ds_field = config["ds_field"]
     y_field = config.get("y_field")
     aggregation_method = config.get("aggregation_method")
+    series_field = config.get("series_key")
 
-    year, month = target_month_date.year, target_month_date.month
-    month_start_dt = datetime(year, month, 1)
-    month_end_dt = (datetime(year, month + 1, 1) - timedelta(microseconds=1)) if month < 12 else datetime(year, month, 31, 23, 59, 59, 999999)
-    
-    pb_filter = f"{ds_field} >= '{month_start_dt.strftime('%Y-%m-%d %H:%M:%S')}' && {ds_field} <= '{month_end_dt.strftime('%Y-%m-%d %H:%M:%S')}'"
+    pb_filter = f"{ds_field} >= '{start_dt.strftime('%Y-%m-%d %H:%M:%S')}'"
+    if end_dt is not None:
+        pb_filter += f" && {ds_field} <= '{end_dt.strftime('%Y-%m-%d %H:%M:%S')}'"
     if config.get("filter_field") and config.get("filter_value"):
         pb_filter += f" && {config['filter_field']} = '{config['filter_value']}'"
 
     print(f"Fetching from PB collection '{collection_name}' with filter: {pb_filter}")
     
+    # Pages are streamed into running per-day aggregates rather than loaded as one list.
     try:
-        records = pb_client.collection(collection_name).get_full_list(query_params={"filter": pb_filter})
+        with telemetry.span("pb_fetch", model=model_name):
+            aggregator = pb_client.aggregate_daily(collection_name, pb_filter, ds_field, y_field, aggregation_method, series_field)
     except Exception as e:
         print(f"Error fetching data from PocketBase for {model_name}: {e}")
+        if raise_errors:
+            raise
         return pd.DataFrame()
 
-    if not records:
-        print(f"No records found in PocketBase for {model_name} for {target_month_date.strftime('%Y-%m')}.")
+    if not aggregator.records:
+        print(f"No records found in PocketBase for {model_name} for {period_label}.")
         return pd.DataFrame()
+    if aggregator.rejected:
+        print(f"Warning: Skipped {aggregator.rejected} record(s) with an invalid '{ds_field}' or '{y_field}' value for {model_name}.")
+    return aggregator.result()
 
-    new_data_points = []
-    for record in records:
-        try:
-            record_ds_val = getattr(record, ds_field)
-            ds_date = pd.to_datetime(str(record_ds_val).split(" ")[0]).date() # Get date part
 
-            if aggregation_method == "count":
-                new_data_points.append({'ds': ds_date, 'y': 1})
-            else:
-                record_y_val = float(getattr(record, y_field))
-                new_data_points.append({'ds': ds_date, 'y': record_y_val})
-        except Exception as e:
-            print(f"Error processing record {record.id} for {model_name}: {e}")
-    
-    if not new_data_points: return pd.DataFrame()
-    new_df = pd.DataFrame(new_data_points)
-    new_df['ds'] = pd.to_datetime(new_df['ds'])
+def fetch_data_for_month_from_pb(pb_client: "PocketBaseFetcher", model_name: str, target_month_date: datetime.date,
+                                 raise_errors: bool = False):
+    year, month = target_month_date.year, target_month_date.month
+    month_start_dt = datetime(year, month, 1)
+    month_end_dt = (datetime(year, month + 1, 1) - timedelta(microseconds=1)) if month < 12 else datetime(year, month, 31, 23, 59, 59, 999999)
+    return _fetch_daily_from_pb(pb_client, model_name, month_start_dt, month_end_dt,
+                                target_month_date.strftime('%Y-%m'), raise_errors)
+
 
-    if aggregation_method == "count":
-        new_df = new_df.groupby('ds').size().reset_index(name='y')
-    elif aggregation_method == "sum": # Example for summing daily values
-        new_df = new_df.groupby('ds')['y'].sum().reset_index()
-        
-    return new_df
+def fetch_data_since_from_pb(pb_client: "PocketBaseFetcher", model_name: str, since_date: datetime.date,
+                             raise_errors: bool = False):
+    """Fetches every record from the start of since_date on, aggregated per day. Whole days, so a day's count or sum is never partial."""
+    since_dt = datetime(since_date.year, since_date.month, since_date.day)
+    return _fetch_daily_from_pb(pb_client, model_name, since_dt, None, f"{since_date.isoformat()} onwards", raise_errors)
 
 
-def update_and_retrain_model_from_db(model_name: str, fetch_target_month: datetime.date):
+def update_and_retrain_model_from_db(model_name: str, fetch_target_month: datetime.date, force: bool = False):
     if not POCKETBASE_URL:
         return False, "PocketBase URL not configured."
     try:
-        pb_client = PocketBase(POCKETBASE_URL)
-        # Add authentication if needed:
-        # pb_client.admins.auth_with_password(os.getenv("PB_ADMIN_EMAIL"), os.getenv("PB_ADMIN_PASSWORD"))
+        pb_client = get_pb_client()
     except Exception as e:
         return False, f"Failed to initialize PocketBase client: {e}"
 
     print(f"Attempting to fetch data for model '{model_name}' for month: {fetch_target_month.strftime('%Y-%m')}")
+    jobs.report_progress(stage="fetching", month=fetch_target_month.strftime('%Y-%m'))
     new_data_df = fetch_data_for_month_from_pb(pb_client, model_name, fetch_target_month)
 
     if new_data_df.empty:
         return True, f"No new data fetched from PocketBase for '{model_name}' for {fetch_target_month.strftime('%Y-%m')}. Forecast not updated based on new DB data."
 
+    if series.is_series_model(model_name):
+        # Runs as an in-thread job; the buckets are fitted on the worker pool.
+        series.merge_series_history(model_name, new_data_df)
+        success, message, _ = retrain_series_model(model_name, force)
+        return success, f"DB Update: {message} (used data for {fetch_target_month.strftime('%Y-%m')})"
+
     processed_historical_df = _process_and_save_historical_data(model_name, new_data_df)
-    success, message = _train_and_save_forecast(model_name, processed_historical_df)
+    success, message = _train_and_save_forecast(model_name, processed_historical_df, force=force)
     
     if success:
         return True, f"DB Update: {message} (used data for {fetch_target_month.strftime('%Y-%m')})"
     else:
-        return False, f"DB Update: {message}"
\ No newline at end of file
+        return False, f"DB Update: {message}"
+
+
+def backfill_model_from_db(model_name: str, start_month: datetime.date, end_month: datetime.date, force: bool = False):
+    """
+    Fetches every month from start_month to end_month (inclusive) from PocketBase concurrently,
+    merges them into the history in a single pass and retrains once.
+    Progress and per-month fetch timings are reported to the job status.
+    """
+    if not POCKETBASE_URL:
+        return False, "PocketBase URL not configured."
+    months = [period.to_timestamp().date() for period in pd.period_range(start_month, end_month, freq='M')]
+    if not months:
+        return False, "Backfill range is empty."
+
+    month_timings = {}
+    fetched_frames = []
+    jobs.report_progress(stage="fetching", months_total=len(months), months_done=0, month_timings=month_timings)
+
+    def fetch_month(pb_client, month):
+        started = time.perf_counter()
+        month_df = fetch_data_for_month_from_pb(pb_client, model_name, month)
+        return month, month_df, time.perf_counter() - started
+
+    try:
+        pb_client = get_pb_client()
+    except Exception as e:
+        return False, f"Failed to initialize PocketBase client: {e}"
+    with ThreadPoolExecutor(max_workers=BACKFILL_MONTH_CONCURRENCY, thread_name_prefix="backfill") as pool:
+        futures = [pool.submit(fetch_month, pb_client, month) for month in months]
+        for future in as_completed(futures):
+            month, month_df, seconds = future.result()
+            month_timings[month.strftime('%Y-%m')] = {"seconds": round(seconds, 3), "rows": len(month_df)}
+            if not month_df.empty:
+                fetched_frames.append(month_df)
+            jobs.report_progress(months_done=len(month_timings), month_timings=month_timings)
+
+    range_label = f"{months[0].strftime('%Y-%m')}..{months[-1].strftime('%Y-%m')}"
+    if not fetched_frames:
+        return True, f"No data fetched from PocketBase for '{model_name}' for {range_label}. Forecast not updated."
+
+    jobs.report_progress(stage="merging")
+    new_data_df = pd.concat(fetched_frames, ignore_index=True)
+    summary = f"Backfill {range_label}: {len(new_data_df)} daily points from {len(fetched_frames)} month(s)."
+    if series.is_series_model(model_name):
+        series.merge_series_history(model_name, new_data_df)
+        success, message, _ = retrain_series_model(model_name, force)
+        return success, f"{summary} {message}"
+    processed_historical_df = _process_and_save_historical_data(model_name, new_data_df)
+    success, message = _train_and_save_forecast(model_name, processed_historical_df, force=force)
+    return success, f"{summary} {message}"
+
+
+def update_all_models_from_db(fetch_target_month: datetime.date, retrain_executor=None, model_names=None, force: bool = False):
+    """
+    Updates every configured model (or model_names) from PocketBase for one month.
+    All collections are fetched concurrently over the shared client; each model's history is
+    merged as soon as its fetch completes and its retrain is submitted to retrain_executor
+    (the job worker pool by default), so fits overlap with the remaining fetches.
+    Models whose merged history is unchanged since their last fit are not retrained (unless force).
+    Returns (success, message, report) with one entry per model: rows_fetched, fetch_seconds,
+    fit_seconds and status ("updated", "unchanged", "no_data", "fetch_failed", "merge_failed" or
+    "fit_failed"). A failure only fails its own model.
+    """
+    if not POCKETBASE_URL:
+        return False, "PocketBase URL not configured.", []
+    model_names = list(model_names or POCKETBASE_COLLECTION_CONFIG)
+    try:
+        pb_client = get_pb_client()
+    except Exception as e:
+        return False, f"Failed to initialize PocketBase client: {e}", []
+    if retrain_executor is None:
+        retrain_executor = jobs.get_worker_pool()
+
+    month_label = fetch_target_month.strftime('%Y-%m')
+    report = {name: {"model": name, "rows_fetched": 0, "fetch_seconds": None, "fit_seconds": None,
+                     "status": "pending", "message": ""} for name in model_names}
+    jobs.report_progress(stage="fetching", month=month_label, models_total=len(model_names), models_fetched=0)
+
+    def fetch_model(name):
+        started = time.perf_counter()
+        try:
+            new_data_df = fetch_data_for_month_from_pb(pb_client, name, fetch_target_month, raise_errors=True)
+        finally:
+            report[name]["fetch_seconds"] = round(time.perf_counter() - started, 3)
+        return new_data_df
+
+    retrain_futures = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(model_names)), thread_name_prefix="update-all") as pool:
+        fetch_futures = {pool.submit(fetch_model, name): name for name in model_names}
+        for fetched, future in enumerate(as_completed(fetch_futures), start=1):
+            name = fetch_futures[future]
+            entry = report[name]
+            try:
+                new_data_df = future.result()
+            except Exception as e:
+                entry.update(status="fetch_failed", message=str(e))
+            else:
+                entry["rows_fetched"] = len(new_data_df)
+                if new_data_df.empty:
+                    entry.update(status="no_data", message=f"No new data for {month_label}. Forecast not updated.")
+                elif series.is_series_model(name):
+                    try:
+                        series.merge_series_history(name, new_data_df)
+                    except Exception as e:  # e.g. pyarrow missing, or an unreadable bucket file
+                        entry.update(status="merge_failed", message=str(e))
+                    else:
+                        # Blocks a fetch thread while the model's buckets are fitted on retrain_executor.
+                        retrain_futures[pool.submit(timed_retrain_series_model, name, force, retrain_executor)] = name
+                else:
+                    try:
+                        processed_historical_df = _process_and_save_historical_data(name, new_data_df)
+                    except Exception as e:
+                        entry.update(status="merge_failed", message=str(e))
+                    else:
+                        if not force and forecast_is_current(name, processed_historical_df):
+                            telemetry.count("fits_skipped", model=name)
+                            entry.update(status="unchanged", message="History unchanged since the last fit; retrain skipped.")
+                        else:
+                            retrain_futures[retrain_executor.submit(timed_retrain_from_saved_history, name, force)] = name
+            jobs.report_progress(models_fetched=fetched)
+
+    jobs.report_progress(stage="fitting", models_fitting=len(retrain_futures))
+    for future in as_completed(retrain_futures):
+        entry = report[retrain_futures[future]]
+        try:
+            success, message, fit_seconds = future.result()
+        except Exception as e:
+            success, message, fit_seconds = False, f"Retrain failed: {e}", None
+        entry.update(status="updated" if success else "fit_failed", message=message,
+                     fit_seconds=None if fit_seconds is None else round(fit_seconds, 3))
+
+    report = [report[name] for name in model_names]
+    failed = [entry["model"] for entry in report if entry["status"].endswith("_failed")]
+    updated = sum(entry["status"] == "updated" for entry in report)
+    unchanged = sum(entry["status"] == "unchanged" for entry in report)
+    message = f"Update all for {month_label}: {updated} of {len(report)} model(s) updated, {unchanged} unchanged."
+    if failed:
+        message += f" Failed: {', '.join(failed)}."
+    return not failed, message, report
+
+
+def refresh_model_from_db(model_name: str, since_date: datetime.date, retrain_executor, force: bool = False):
+    """
+    Incremental update used by scheduler.py: fetches the model's records from since_date on, merges
+    them and retrains on retrain_executor (whose size caps the concurrent fits) unless the history
+    is unchanged since the last fit.
+    Returns (success, message, details) with rows_fetched, high_water (ISO date of the newest day
+    fetched, or None) and status ("updated", "unchanged", "no_data", "fetch_failed" or "fit_failed").
+    """
+    details = {"rows_fetched": 0, "high_water": None, "status": "fetch_failed"}
+    if not POCKETBASE_URL:
+        return False, "PocketBase URL not configured.", details
+    try:
+        pb_client = get_pb_client()
+        new_data_df = fetch_data_since_from_pb(pb_client, model_name, since_date, raise_errors=True)
+    except Exception as e:
+        return False, f"Fetch from PocketBase failed: {e}", details
+
+    details["rows_fetched"] = len(new_data_df)
+    if new_data_df.empty:
+        details["status"] = "no_data"
+        return True, f"No new data since {since_date.isoformat()}. Forecast not updated.", details
+    details["high_water"] = pd.Timestamp(new_data_df['ds'].max()).date().isoformat()
+
+    if series.is_series_model(model_name):
+        series.merge_series_history(model_name, new_data_df)
+        success, message, summary = retrain_series_model(model_name, force, retrain_executor)
+        if success and summary["buckets_skipped"] == summary["buckets"]:
+            details["status"] = "unchanged"
+            return True, message, details
+    else:
+        processed_historical_df = _process_and_save_historical_data(model_name, new_data_df)
+        if not force and forecast_is_current(model_name, processed_historical_df):
+            telemetry.count("fits_skipped", model=model_name)
+            details["status"] = "unchanged"
+            return True, "History unchanged since the last fit; retrain skipped.", details
+        try:
+            success, message, _ = retrain_executor.submit(timed_retrain_from_saved_history, model_name, force).result()
+        except Exception as e:
+            success, message = False, f"Retrain failed: {e}"
+    details["status"] = "updated" if success else "fit_failed"
+    return success, message, details
@@ -0,0 +1,280 @@
+"""
+Storage backends for the per-model history and forecast tables in DATA_DIR.
+
+csv      <model>_data.csv / <model>_forecast.csv (the original layout)
+parquet  <model>_data.parquet/ holds one Parquet file per calendar year of 'ds', so an update
+         only rewrites the years it touched; <model>_forecast.parquet is a single file.
+         Datetime columns are stored typed and files are read memory-mapped. Needs pyarrow.
+
+Every file is written to a temporary name and renamed into place (atomic_path), so readers
+never see a partially written table and never need a lock. Writers serialize per model with
+locks.model_lock.
+
+Select the backend with STORAGE_BACKEND in config.py. Existing files can be converted with:
+    python storage.py migrate --from csv --to parquet
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_DIR, STORAGE_BACKEND
+
+HISTORY_COLUMNS = ['ds', 'y', 'created_at', 'updated_at']
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+_DATETIME_COLUMNS = ['ds', 'created_at', 'updated_at']
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yields a temporary path in the same directory as `path`. When the block completes, the
+    temporary file atomically replaces `path`; if it raises, `path` is left untouched.
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _parse_datetime_columns(df):
+    for col in _DATETIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce', format='ISO8601')
+    if 'ds' in df.columns:
+        df['ds'] = df['ds'].dt.tz_localize(None)
+    return df
+
+
+def _read_columns(columns, since, until):
+    """Columns to load for a filtered read: 'ds' is needed for since/until even when not returned."""
+    if columns is None:
+        return None
+    columns = list(columns)
+    if (since is not None or until is not None) and 'ds' not in columns:
+        columns.append('ds')
+    return columns
+
+
+def select_rows(df, since=None, until=None, columns=None):
+    """Keeps rows with since <= ds <= until (either bound optional) and the given columns, in that order."""
+    if since is not None or until is not None:
+        ds = df['ds']
+        keep = np.ones(len(df), dtype=bool)
+        if since is not None:
+            keep &= (ds >= since).to_numpy()
+        if until is not None:
+            keep &= (ds <= until).to_numpy()
+        if not keep.all():
+            df = df[keep].reset_index(drop=True)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def _parquet_filters(since, until):
+    filters = []
+    if since is not None:
+        filters.append(('ds', '>=', pd.Timestamp(since)))
+    if until is not None:
+        filters.append(('ds', '<=', pd.Timestamp(until)))
+    return filters or None
+
+
+class CSVStorage:
+    name = "csv"
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+
+    def data_path(self, model_name):
+        return os.path.join(self.data_dir, f"{model_name}_data.csv")
+
+    def forecast_path(self, model_name):
+        return os.path.join(self.data_dir, f"{model_name}_forecast.csv")
+
+    def list_models(self):
+        suffix = "_data.csv"
+        return sorted(os.path.basename(p)[:-len(suffix)] for p in glob.glob(os.path.join(self.data_dir, f"*{suffix}")))
+
+    def read_history(self, model_name, since=None, until=None, columns=None):
+        """
+        Raises FileNotFoundError if the model has no history. since/until (inclusive bounds on 'ds')
+        and columns narrow the result; CSV is still read in full, only the unused columns are skipped.
+        """
+        df = pd.read_csv(self.data_path(model_name), usecols=_read_columns(columns, since, until))
+        return select_rows(_parse_datetime_columns(df), since, until, columns)
+
+    def write_history(self, model_name, df, touched_ds=None, evicted_ds=None):
+        # CSV has no partitions to skip, so touched_ds/evicted_ds are ignored and the file is rewritten.
+        with atomic_path(self.data_path(model_name)) as tmp_path:
+            df.to_csv(tmp_path, index=False)
+
+    def read_forecast(self, model_name, since=None, until=None, columns=None):
+        df = pd.read_csv(self.forecast_path(model_name), usecols=_read_columns(columns, since, until))
+        return select_rows(_parse_datetime_columns(df), since, until, columns)
+
+    def write_forecast(self, model_name, df):
+        with atomic_path(self.forecast_path(model_name)) as tmp_path:
+            df.to_csv(tmp_path, index=False)
+
+
+class ParquetStorage:
+    name = "parquet"
+
+    def __init__(self, data_dir=DATA_DIR):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("The 'parquet' storage backend requires pyarrow (pip install pyarrow).") from e
+        self.data_dir = data_dir
+
+    def data_path(self, model_name):
+        return os.path.join(self.data_dir, f"{model_name}_data.parquet")
+
+    def forecast_path(self, model_name):
+        return os.path.join(self.data_dir, f"{model_name}_forecast.parquet")
+
+    def list_models(self):
+        suffix = "_data.parquet"
+        return sorted(os.path.basename(p)[:-len(suffix)] for p in glob.glob(os.path.join(self.data_dir, f"*{suffix}")))
+
+    def _partition_path(self, model_name, partition):
+        return os.path.join(self.data_path(model_name), f"{partition}.parquet")
+
+    def _existing_partitions(self, model_name):
+        """Years ('YYYY') with a partition file. Raises FileNotFoundError if there is no history."""
+        return sorted(f[:-len(".parquet")] for f in os.listdir(self.data_path(model_name)) if f.endswith(".parquet"))
+
+    def read_history(self, model_name, since=None, until=None, columns=None):
+        """
+        Raises FileNotFoundError if the model has no history. since/until (inclusive bounds on 'ds')
+        skip the yearly partitions outside the range and are pushed down to the row groups of the rest;
+        columns limits what is decoded.
+        """
+        import pyarrow.parquet as pq
+        for attempt in range(3):
+            partitions = self._existing_partitions(model_name)
+            if since is not None:
+                partitions = [p for p in partitions if int(p) >= pd.Timestamp(since).year]
+            if until is not None:
+                partitions = [p for p in partitions if int(p) <= pd.Timestamp(until).year]
+            if not partitions:
+                return pd.DataFrame(columns=list(columns) if columns is not None else HISTORY_COLUMNS)
+            paths = [self._partition_path(model_name, partition) for partition in partitions]
+            try:
+                # Partitions are named by year and read in name order, so 'ds' comes back sorted.
+                dataset = pq.ParquetDataset(paths, memory_map=True, filters=_parquet_filters(since, until))
+                df = dataset.read(columns=_read_columns(columns, since, until)).to_pandas()
+                return select_rows(df, columns=columns)
+            except FileNotFoundError:
+                # A writer dropped a year that fell out of the window after we listed the directory.
+                if attempt == 2:
+                    raise
+
+    def write_history(self, model_name, df, touched_ds=None, evicted_ds=None):
+        """
+        Writes the history (sorted by 'ds') as yearly partitions. When touched_ds (the 'ds' values
+        that were added or changed) is given, only those years are rewritten, plus the years rows were
+        evicted from by the rolling window: those of evicted_ds if given, else the oldest year.
+        Years that dropped out of the window are deleted.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.data_path(model_name), exist_ok=True)
+        df = df[HISTORY_COLUMNS]
+        years = pd.to_datetime(df['ds']).dt.year.to_numpy()
+        # Rows are sorted by 'ds', so each year is one contiguous block.
+        block_starts = np.flatnonzero(np.diff(years)) + 1 if len(years) else np.array([], dtype=int)
+        blocks = {str(years[start]): (start, end) for start, end in
+                  zip(np.r_[0, block_starts], np.r_[block_starts, len(years)]) if start < end}
+        present = set(blocks)
+        existing = set(self._existing_partitions(model_name))
+
+        if touched_ds is None:
+            to_write = present
+        else:
+            touched_years = set(pd.to_datetime(pd.Series(touched_ds)).dt.year.astype(str).unique())
+            to_write = (touched_years & present) | (present - existing)
+            if evicted_ds is not None:
+                to_write |= set(pd.to_datetime(pd.Series(evicted_ds)).dt.year.astype(str).unique()) & present
+            elif present:
+                to_write.add(min(present))
+
+        for year in sorted(to_write):
+            start, end = blocks[year]
+            block_df = _parse_datetime_columns(df.iloc[start:end].copy())
+            with atomic_path(self._partition_path(model_name, year)) as tmp_path:
+                pq.write_table(pa.Table.from_pandas(block_df, preserve_index=False), tmp_path)
+        for year in existing - present:
+            os.remove(self._partition_path(model_name, year))
+
+    def read_forecast(self, model_name, since=None, until=None, columns=None):
+        import pyarrow.parquet as pq
+        table = pq.read_table(self.forecast_path(model_name), memory_map=True,
+                              columns=_read_columns(columns, since, until), filters=_parquet_filters(since, until))
+        return select_rows(table.to_pandas(), columns=columns)
+
+    def write_forecast(self, model_name, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        df = _parse_datetime_columns(df.copy())
+        with atomic_path(self.forecast_path(model_name)) as tmp_path:
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+
+
+BACKENDS = {CSVStorage.name: CSVStorage, ParquetStorage.name: ParquetStorage}
+_backend = None
+
+
+def get_backend(data_dir=None):
+    """The backend selected by STORAGE_BACKEND (shared instance for DATA_DIR, created on first use)."""
+    global _backend
+    if STORAGE_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Expected one of: {', '.join(BACKENDS)}.")
+    if data_dir is not None and data_dir != DATA_DIR:
+        return BACKENDS[STORAGE_BACKEND](data_dir)
+    if _backend is None:
+        _backend = BACKENDS[STORAGE_BACKEND](DATA_DIR)
+    return _backend
+
+
+def migrate(source_name, target_name, data_dir=DATA_DIR):
+    """Copies every model's history and forecast from one backend to another. Returns the migrated model names."""
+    source = BACKENDS[source_name](data_dir)
+    target = BACKENDS[target_name](data_dir)
+    migrated = []
+    for model_name in source.list_models():
+        target.write_history(model_name, source.read_history(model_name))
+        if os.path.exists(source.forecast_path(model_name)):
+            target.write_forecast(model_name, source.read_forecast(model_name))
+        print(f"Success: Migrated '{model_name}' from {source_name} to {target_name}.")
+        migrated.append(model_name)
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Storage maintenance for prophet_data.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert all models from one storage backend to another.")
+    migrate_parser.add_argument("--from", dest="source", default="csv", choices=sorted(BACKENDS))
+    migrate_parser.add_argument("--to", dest="target", default="parquet", choices=sorted(BACKENDS))
+    migrate_parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    if args.source == args.target:
+        print("Error: Source and target backends are the same.")
+        sys.exit(1)
+    models = migrate(args.source, args.target, args.data_dir)
+    print(f"Migrated {len(models)} model(s). Set STORAGE_BACKEND={args.target} to use the new files.")
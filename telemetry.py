@@ -0,0 +1,266 @@
+"""
+Timing spans, counters and the text served at /metrics (Prometheus exposition format).
+
+Every process (API workers, retrain pool workers) keeps its own totals in memory; a background
+thread writes them to METRICS_DIR/<pid>-<token>.json every METRICS_FLUSH_SECONDS while they change,
+and jobs write them when they finish.
+/metrics adds up the files of all processes, so the numbers cover fits that ran in the pool and
+requests served by other gunicorn workers. Totals of processes that have exited are kept until
+their file is METRICS_FILES_MAX_AGE_SECONDS old.
+
+    with telemetry.span("fit", model="sales", forecaster="prophet"):
+        model.fit(df)
+    telemetry.count("rows_ingested", len(df), model="sales")
+
+A SamplingProfiler records the stacks of one thread at a fixed interval; app.py runs one for a
+request that sends the X-Profile header when PROFILE_REQUESTS is enabled.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from config import DATA_DIR, METRICS_FLUSH_SECONDS, METRICS_FILES_MAX_AGE_SECONDS
+
+METRICS_DIR = os.path.join(DATA_DIR, ".metrics")
+PREFIX = "forecast_"
+
+# Upper bounds (seconds) of the histogram buckets of every span; reads take milliseconds, fits seconds.
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# name -> (type, help). Names are exported with PREFIX; counters also get a _total suffix.
+METRICS = {
+    "span_seconds": ("histogram", "Time spent in instrumented code paths, by span."),
+    "http_request_seconds": ("histogram", "Time spent in Flask handlers, by route, method and status."),
+    "rows_ingested": ("counter", "History points merged into a model's saved history."),
+    "fits": ("counter", "Forecaster fits run, by forecaster."),
+    "fits_skipped": ("counter", "Retrains skipped because the history was unchanged since the last fit."),
+    "response_cache_hits": ("counter", "Read endpoint bodies served from the response cache."),
+    "response_cache_misses": ("counter", "Read endpoint bodies (re)built from the saved files."),
+    "bulk_rows_rejected": ("counter", "Rows of NDJSON/CSV bulk uploads dropped while parsing, by model and reason."),
+    "scheduled_refreshes": ("counter", "Refreshes run by scheduler.py, by model and status."),
+}
+
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [count per bucket..., count above the last bucket, sum]
+_lock = threading.Lock()
+_dirty = False       # Totals changed since the last flush
+_flusher_pid = None  # Process the flusher thread was started in
+_token = uuid.uuid4().hex[:8]
+
+
+def _reset_after_fork():
+    """A forked process (e.g. a gunicorn worker) starts its own totals; the parent's stay in the parent's file."""
+    global _lock, _dirty, _token
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _dirty = False
+    _token = uuid.uuid4().hex[:8]
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Adds value to the counter `name` (one of METRICS) with the given labels."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    _changed()
+
+
+def observe(name, seconds, **labels):
+    """Records a duration in the histogram `name` (one of METRICS)."""
+    key = _key(name, labels)
+    with _lock:
+        values = _histograms.get(key)
+        if values is None:
+            values = _histograms[key] = [0] * (len(SPAN_BUCKETS) + 2)
+        for i, bound in enumerate(SPAN_BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+                break
+        else:
+            values[len(SPAN_BUCKETS)] += 1
+        values[-1] += seconds
+    _changed()
+
+
+@contextmanager
+def span(name, **labels):
+    """Times the block into span_seconds{span=name, ...}, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("span_seconds", time.perf_counter() - started, span=name, **labels)
+
+
+def _snapshot():
+    with _lock:
+        return {"counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+                "histograms": [[name, list(labels), list(values)] for (name, labels), values in _histograms.items()]}
+
+
+def _own_path():
+    return os.path.join(METRICS_DIR, f"{os.getpid()}-{_token}.json")
+
+
+def flush():
+    """Writes this process's totals to METRICS_DIR."""
+    global _dirty
+    _dirty = False
+    if not _counters and not _histograms:
+        return
+    path = _own_path()
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write metrics file {path}: {e}")
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        if _dirty:
+            flush()
+
+
+def _changed():
+    """Marks the totals for the next flush, starting this process's flusher thread on first use."""
+    global _dirty, _flusher_pid
+    _dirty = True
+    if _flusher_pid != os.getpid():
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True).start()
+
+
+def _collect():
+    """Totals of all processes: the files of the others plus this process's live values."""
+    counters, histograms = {}, {}
+
+    def add(snapshot):
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            current = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                current[i] += value
+
+    own_path, oldest = _own_path(), time.time() - METRICS_FILES_MAX_AGE_SECONDS
+    try:
+        filenames = os.listdir(METRICS_DIR)
+    except OSError:
+        filenames = []
+    for filename in filenames:
+        path = os.path.join(METRICS_DIR, filename)
+        if not filename.endswith(".json") or path == own_path:
+            continue
+        try:
+            if os.path.getmtime(path) < oldest:
+                os.remove(path)
+                continue
+            with open(path, "r") as f:
+                add(json.load(f))
+        except (OSError, ValueError):
+            pass  # Removed or replaced while listing
+    add(_snapshot())
+    return counters, histograms
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(pairs):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    counters, histograms = _collect()
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        exported = PREFIX + name + ("_total" if kind == "counter" else "")
+        lines.append(f"# HELP {exported} {help_text}")
+        lines.append(f"# TYPE {exported} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{exported}{{{_labels(labels)}}} {_number(value)}")
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(SPAN_BUCKETS + ("+Inf",), values[:-1]):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{exported}_bucket{{{_labels(labels + (('le', le),))}}} {cumulative}")
+            lines.append(f"{exported}_sum{{{_labels(labels)}}} {_number(values[-1])}")
+            lines.append(f"{exported}_count{{{_labels(labels)}}} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every `interval` seconds from a background thread.
+    report() returns the stacks in the collapsed format flame graph tools read
+    ("outer;inner;leaf <samples>"), most frequent first.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = self._seconds = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._seconds = time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def report(self):
+        total = sum(self.samples.values())
+        header = f"# {total} samples every {self.interval * 1000:g}ms over {self._seconds:.3f}s\n"
+        return header + "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common())
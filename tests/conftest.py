@@ -0,0 +1,51 @@
+from datetime import date
+
+import pytest
+
+import services
+from config import POCKETBASE_COLLECTION_CONFIG
+from tests.pb_stub import add_example_series_models, start_stub_server, synthetic_collections
+
+STUB_START = date(2025, 1, 1)
+
+
+@pytest.fixture(autouse=True)
+def example_series_models():
+    """Every test sees the multi-series examples of config.py as configured models."""
+    configured = dict(POCKETBASE_COLLECTION_CONFIG)
+    add_example_series_models()
+    yield
+    POCKETBASE_COLLECTION_CONFIG.clear()
+    POCKETBASE_COLLECTION_CONFIG.update(configured)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Runs the test in a fresh directory; DATA_DIR is relative, so every file the code writes lands there."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "prophet_data").mkdir()
+    return tmp_path / "prophet_data"
+
+
+@pytest.fixture
+def pb_stub(request):
+    """
+    A running PocketBase stand-in with 2,000 synthetic records per collection over 31 days.
+    Parametrize indirectly with a dict of start_stub_server() options (fail_every, credentials).
+    Yields the server; its URL is server.base_url and its records server.collections.
+    """
+    collections = synthetic_collections(2_000, start=STUB_START, days=31)
+    server, base_url = start_stub_server(collections, **getattr(request, "param", {}))
+    server.base_url, server.collections = base_url, collections
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def pb_services(data_dir, pb_stub, monkeypatch):
+    """services pointed at the stub with a fresh shared client, in a fresh data directory. Yields the stub."""
+    monkeypatch.setattr(services, "POCKETBASE_URL", pb_stub.base_url)
+    monkeypatch.setattr(services, "_pb_client", None)
+    yield pb_stub
+    if services._pb_client is not None:
+        services._pb_client.close()
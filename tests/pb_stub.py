@@ -0,0 +1,275 @@
+"""
+Local stand-in for the PocketBase records list API, for exercising the fetch and update paths
+without a real server.
+
+Supports GET /api/collections/<name>/records with page, perPage, sort, fields and skipTotal,
+and filters made of `field <op> 'value'` clauses joined by && (ops: = != > >= < <=).
+Every `fail_every`-th request answers 503 so retries can be exercised. With `credentials`
+set, records require the token issued by POST /api/collections/_superusers/auth-with-password.
+
+Usage:
+    python -m tests.pb_stub --port 8090 --records 100000
+    NEXT_PUBLIC_POCKETBASE_URL=http://127.0.0.1:8090 python app.py
+"""
+import argparse
+import json
+import re
+import threading
+import uuid
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from config import POCKETBASE_COLLECTION_CONFIG
+
+# The multi-series examples commented out in config.py, for tests and benchmarks (see add_example_series_models)
+EXAMPLE_SERIES_MODELS = {
+    "product_stocks_by_product": {
+        "collection_name": "daily_product_stock_levels",
+        "ds_field": "record_date",
+        "y_field": "stock_level",
+        "series_key": "product",
+    },
+    "part_stock_log_by_part": {
+        "collection_name": "inventory_movements",
+        "ds_field": "movement_date",
+        "y_field": "quantity_change",
+        "aggregation_method": "sum",
+        "series_key": "part",
+    },
+}
+
+_RECORDS_PATH_RE = re.compile(r"^/api/collections/([^/]+)/records$")
+_AUTH_PATHS = ("/api/collections/_superusers/auth-with-password", "/api/admins/auth-with-password")
+_FILTER_CLAUSE_RE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*'([^']*)'\s*$")
+_DATETIME_RE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+_OPERATORS = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+}
+
+
+def add_example_series_models(collection_config=POCKETBASE_COLLECTION_CONFIG):
+    """Adds the EXAMPLE_SERIES_MODELS that are not configured yet (copies, so tests can change them)."""
+    for model_name, config in EXAMPLE_SERIES_MODELS.items():
+        collection_config.setdefault(model_name, dict(config))
+
+
+def _comparable(value):
+    """Normalizes PocketBase datetimes ('... HH:MM:SS' vs '... HH:MM:SS.sssZ') so they compare as strings."""
+    if isinstance(value, str) and _DATETIME_RE.match(value):
+        value = value.rstrip("Z")
+        return value if "." in value else value + ".000"
+    return value
+
+
+def parse_filter(pb_filter):
+    """Returns a predicate for a filter of `field op 'value'` clauses joined by &&."""
+    clauses = []
+    for clause in filter(None, (part.strip() for part in (pb_filter or "").split("&&"))):
+        match = _FILTER_CLAUSE_RE.match(clause)
+        if not match:
+            raise ValueError(f"Unsupported filter clause: {clause}")
+        field, op, value = match.groups()
+        clauses.append((field, _OPERATORS[op], _comparable(value)))
+
+    def predicate(record):
+        for field, compare, value in clauses:
+            record_value = record.get(field)
+            if record_value is None:
+                return False
+            record_value = _comparable(record_value if isinstance(record_value, str) else str(record_value))
+            if not compare(record_value, value):
+                return False
+        return True
+    return predicate
+
+
+def _sorted_records(records, sort):
+    result = list(records)
+    # Apply the sort keys last-to-first; Python's sort is stable.
+    for key in reversed([k.strip() for k in (sort or "").split(",") if k.strip()]):
+        descending = key.startswith("-")
+        field = key.lstrip("-+")
+        result.sort(key=lambda r: _comparable(r.get(field, "")), reverse=descending)
+    return result
+
+
+class StubState:
+    def __init__(self, collections, fail_every=0, credentials=None):
+        self.collections = collections
+        self.fail_every = fail_every
+        self.credentials = credentials  # (identity, password) or None for open access
+        self.tokens = set()
+        self.auth_requests = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._query_cache = {}  # (collection, filter, sort) -> matching records
+
+    def query(self, collection_name, pb_filter, sort):
+        key = (collection_name, pb_filter, sort)
+        with self.lock:
+            cached = self._query_cache.get(key)
+        if cached is None:
+            predicate = parse_filter(pb_filter)
+            cached = _sorted_records((r for r in self.collections[collection_name] if predicate(r)), sort)
+            with self.lock:
+                self._query_cache[key] = cached
+        return cached
+
+    def authenticate(self, identity, password):
+        """Returns a new token for valid credentials, else None."""
+        with self.lock:
+            self.auth_requests += 1
+            if self.credentials is None or (identity, password) != tuple(self.credentials):
+                return None
+            token = uuid.uuid4().hex
+            self.tokens.add(token)
+            return token
+
+    def is_authorized(self, token):
+        with self.lock:
+            return self.credentials is None or token in self.tokens
+
+    def should_fail(self):
+        with self.lock:
+            self.requests += 1
+            return self.fail_every > 0 and self.requests % self.fail_every == 0
+
+
+def _make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real server
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if urlparse(self.path).path not in _AUTH_PATHS:
+                self.rfile.read(length)
+                return self._send_json(404, {"code": 404, "message": "Not found.", "data": {}})
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                body = {}
+            token = state.authenticate(body.get("identity"), body.get("password"))
+            if token is None:
+                return self._send_json(400, {"code": 400, "message": "Failed to authenticate.", "data": {}})
+            self._send_json(200, {"token": token, "record": {"email": body.get("identity")}})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            match = _RECORDS_PATH_RE.match(url.path)
+            if not match:
+                return self._send_json(404, {"code": 404, "message": "Not found.", "data": {}})
+            collection_name = match.group(1)
+            if collection_name not in state.collections:
+                return self._send_json(404, {"code": 404, "message": "Missing collection context.", "data": {}})
+            if not state.is_authorized(self.headers.get("Authorization")):
+                return self._send_json(401, {"code": 401, "message": "The request requires valid record authorization token.", "data": {}})
+            if state.should_fail():
+                return self._send_json(503, {"code": 503, "message": "Injected failure.", "data": {}})
+
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                records = state.query(collection_name, query.get("filter"), query.get("sort"))
+            except ValueError as e:
+                return self._send_json(400, {"code": 400, "message": str(e), "data": {}})
+            page = max(1, int(query.get("page", 1)))
+            per_page = max(1, min(1000, int(query.get("perPage", 30))))
+            items = records[(page - 1) * per_page:page * per_page]
+            if query.get("fields"):
+                fields = query["fields"].split(",")
+                items = [{f: r[f] for f in fields if f in r} for r in items]
+
+            skip_total = query.get("skipTotal") in ("1", "true")
+            self._send_json(200, {
+                "page": page,
+                "perPage": per_page,
+                "totalItems": -1 if skip_total else len(records),
+                "totalPages": -1 if skip_total else (len(records) + per_page - 1) // per_page,
+                "items": items,
+            })
+
+    return Handler
+
+
+def start_stub_server(collections, host="127.0.0.1", port=0, fail_every=0, credentials=None):
+    """
+    Serves `collections` ({collection_name: [record dicts]}) on a background thread.
+    credentials=(identity, password) makes the records endpoint require a superuser token.
+    Returns (server, base_url); call server.shutdown() to stop it.
+    """
+    state = StubState(collections, fail_every=fail_every, credentials=credentials)
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def synthetic_collections(records_per_collection, start=date(2025, 1, 1), days=31, seed=0, series_count=50):
+    """
+    Random records for every collection in POCKETBASE_COLLECTION_CONFIG, spread over `days` days.
+    Collections used by a multi-series model also get its series_key field (SKU-0001..SKU-<series_count>).
+    """
+    rng = np.random.default_rng(seed)
+    series_rng = np.random.default_rng(seed + 1)
+    collections = {}
+    for model_name, config in POCKETBASE_COLLECTION_CONFIG.items():
+        records = collections.get(config["collection_name"])
+        if records is None:
+            seconds = np.sort(rng.integers(0, days * 86400, records_per_collection))
+            timestamps = (pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S.000Z")
+            values = rng.normal(50, 15, records_per_collection).round(2)
+            records = []
+            for i, (ts, value) in enumerate(zip(timestamps, values)):
+                record = {"id": f"{i:015d}", "collectionName": config["collection_name"], config["ds_field"]: ts,
+                          "created": ts, "updated": ts}
+                if config.get("y_field"):
+                    record[config["y_field"]] = float(value)
+                records.append(record)
+            collections[config["collection_name"]] = records
+        if config.get("series_key"):
+            for record, k in zip(records, series_rng.integers(1, series_count + 1, len(records))):
+                record[config["series_key"]] = f"SKU-{k:04d}"
+    return collections
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local PocketBase list-API stand-in with synthetic data.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--records", type=int, default=10_000, help="Records per configured collection.")
+    parser.add_argument("--start", default="2025-01-01", help="First day of the synthetic records.")
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every N-th request with a 503.")
+    parser.add_argument("--admin-email", help="Require superuser auth with this identity (and --admin-password).")
+    parser.add_argument("--admin-password")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        synthetic_collections(args.records, date.fromisoformat(args.start), args.days),
+        args.host, args.port, args.fail_every,
+        (args.admin_email, args.admin_password) if args.admin_email else None,
+    )
+    print(f"PocketBase stub serving {len(POCKETBASE_COLLECTION_CONFIG)} collection(s) at {base_url}. Press Ctrl+C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,22 @@
+import backtest
+from config import POCKETBASE_COLLECTION_CONFIG
+from generate_data import synthetic_series
+
+MODEL = "sales"
+
+
+def key():
+    train_df = synthetic_series(MODEL, 60, end="2025-06-30")
+    return backtest.fold_key(MODEL, None, "seasonal_naive", 14, train_df.iloc[:46], train_df.iloc[46:])
+
+
+def test_schedule_changes_keep_cached_folds(monkeypatch):
+    cached = key()
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "refresh_minutes", 15)
+    assert key() == cached
+
+
+def test_fitting_changes_invalidate_cached_folds(monkeypatch):
+    cached = key()
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "window_days", 730)
+    assert key() != cached
@@ -0,0 +1,52 @@
+import functools
+import io
+
+import pandas as pd
+import pytest
+
+import bulk_ingest
+import services
+import storage
+
+OFFSET_ONLY = ["2025-01-01T23:30:00+02:00", "2025-01-02T01:00:00+02:00", "2025-01-03T12:00:00+02:00"]
+MIXED = ["2025-01-04T23:30:00-05:00", "2025-01-05T08:00:00", "2025-01-06T09:15:00"]
+EXPECTED = pd.to_datetime(["2025-01-01 21:30", "2025-01-01 23:00", "2025-01-03 10:00",
+                           "2025-01-05 04:30", "2025-01-05 08:00", "2025-01-06 09:15"])
+
+
+def lines(fmt):
+    if fmt == bulk_ingest.NDJSON:
+        return [f'{{"ds":"{ds}","y":{i}}}\n'.encode() for i, ds in enumerate(OFFSET_ONLY + MIXED)]
+    return [f"{ds},{i}\n".encode() for i, ds in enumerate(OFFSET_ONLY + MIXED)]
+
+
+def read(fmt, chunk_bytes, monkeypatch):
+    """read_points() on the six rows, plus the row count of every block it typed."""
+    blocks, typed = [], bulk_ingest._typed
+    monkeypatch.setattr(bulk_ingest, "_typed", lambda table, *args: blocks.append(table.num_rows) or typed(table, *args))
+    header = b"ds,y\n" if fmt == bulk_ingest.CSV else b""
+    df, stats = bulk_ingest.read_points(io.BytesIO(header + b"".join(lines(fmt))), fmt, chunk_bytes=chunk_bytes)
+    return df, stats, blocks
+
+
+@pytest.mark.parametrize("fmt", bulk_ingest.FORMATS)
+def test_ds_is_normalized_the_same_in_every_block(fmt, monkeypatch):
+    whole, _, blocks = read(fmt, 1 << 20, monkeypatch)
+    assert blocks == [6]
+    # One block of offset-only values, then one mixing offsets and naive values
+    chunked, stats, blocks = read(fmt, len(b"".join(lines(fmt)[:3])), monkeypatch)
+    assert blocks == [3, 3]
+    for df in (whole, chunked):
+        assert pd.api.types.is_datetime64_dtype(df['ds'])
+        assert df['ds'].tolist() == EXPECTED.tolist()
+    assert stats["accepted"] == 6 and stats["rejected"] == 0
+
+
+@pytest.mark.parametrize("fmt", bulk_ingest.FORMATS)
+def test_every_accepted_row_is_merged(data_dir, fmt, monkeypatch):
+    chunk_bytes = len(b"".join(lines(fmt)[:3]))
+    monkeypatch.setattr(bulk_ingest, "read_points", functools.partial(bulk_ingest.read_points, chunk_bytes=chunk_bytes))
+    header = b"ds,y\n" if fmt == bulk_ingest.CSV else b""
+    success, _, stats, _ = services.append_bulk_data("sales", io.BytesIO(header + b"".join(lines(fmt))), fmt)
+    assert success and stats["accepted"] == 6
+    assert storage.get_backend().read_history("sales")['ds'].tolist() == EXPECTED.tolist()
@@ -0,0 +1,61 @@
+import os
+import threading
+
+import pytest
+
+import services
+from config import POCKETBASE_COLLECTION_CONFIG
+from generate_data import synthetic_series
+
+MODEL = "sales"
+
+
+@pytest.fixture
+def baseline_model(data_dir, monkeypatch):
+    """MODEL fitted with a NumPy baseline, so every fit takes milliseconds."""
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "forecaster", "seasonal_naive")
+    points = synthetic_series(MODEL, 120, end="2025-06-30")
+    points['ds'] = points['ds'].dt.strftime('%Y-%m-%d')
+    return points.to_dict("records")
+
+
+def forecast_mtime():
+    return os.stat(services.get_forecast_filepath(MODEL)).st_mtime_ns
+
+
+def test_unchanged_history_skips_the_fit(baseline_model):
+    success, message = services.update_forecast_manually(MODEL, baseline_model)
+    assert success and "trained" in message
+    fitted_at = forecast_mtime()
+
+    success, message = services.update_forecast_manually(MODEL, baseline_model[-10:])
+    assert success and "retrain skipped" in message
+    assert forecast_mtime() == fitted_at
+
+
+def test_force_and_changed_points_refit(baseline_model):
+    services.update_forecast_manually(MODEL, baseline_model)
+
+    success, message = services.update_forecast_manually(MODEL, baseline_model[-10:], force=True)
+    assert success and "trained" in message
+
+    changed = dict(baseline_model[-1], y=baseline_model[-1]["y"] + 1)
+    success, message = services.update_forecast_manually(MODEL, [changed])
+    assert success and "trained" in message
+
+
+def test_concurrent_retrains_fit_once(baseline_model):
+    assert services.append_manual_data(MODEL, baseline_model)[0]
+    results = []
+
+    def retrain():
+        results.append(services.retrain_from_saved_history(MODEL))
+
+    threads = [threading.Thread(target=retrain) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(success for success, _ in results)
+    assert sum("trained" in message for _, message in results) == 1
+    assert sum("retrain skipped" in message for _, message in results) == 3
@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hierarchy
+import series
+from config import POCKETBASE_COLLECTION_CONFIG
+from generate_data import synthetic_panel
+
+MODEL = "product_stocks_by_product"
+HORIZON = 7
+
+
+def forecasts(levels, leaf_count=12, seed=0):
+    """(A, base aggregates, base leaves, aggregate variances, leaf variances) for a random grouping of the leaves."""
+    rng = np.random.default_rng(seed)
+    mapping = pd.DataFrame({level: [f"{level}{rng.integers(groups)}" for _ in range(leaf_count)] for level, groups in levels},
+                           index=[f"P{i:02d}" for i in range(leaf_count)])
+    A = hierarchy.aggregation_matrix(mapping)[0]
+    base_leaves = rng.uniform(50, 150, (leaf_count, HORIZON))
+    base_aggregates = A @ base_leaves + rng.normal(0, 20, (len(A), HORIZON))
+    return A, base_aggregates, base_leaves, rng.uniform(1, 10, len(A)), rng.uniform(1, 10, leaf_count)
+
+
+def gls(A, base_aggregates, base_leaves, w_a, w_b):
+    """The textbook projection S (S' W^-1 S)^-1 S' W^-1 y^ with S = [A; I] and W = diag(w_a, w_b)."""
+    S = np.vstack([A, np.eye(A.shape[1])])
+    W_inv = np.diag(1.0 / np.concatenate([w_a, w_b]))
+    y = np.vstack([base_aggregates, base_leaves])
+    return S @ np.linalg.solve(S.T @ W_inv @ S, S.T @ W_inv @ y)
+
+
+LEVELS = [[], [("category", 3)], [("category", 3), ("region", 2)]]
+
+
+@pytest.mark.parametrize("levels", LEVELS)
+@pytest.mark.parametrize("method", ["ols", "wls_struct", "mint_diag"])
+def test_reconciliation_is_the_gls_projection(levels, method):
+    A, base_aggregates, base_leaves, aggregate_variance, leaf_variance = forecasts(levels)
+    w_a, w_b = {"ols": (np.ones(len(A)), np.ones(A.shape[1])),
+                "wls_struct": (A.sum(axis=1), np.ones(A.shape[1])),
+                "mint_diag": (aggregate_variance, leaf_variance)}[method]
+    aggregates, leaves = hierarchy.reconcile_forecasts(A, base_aggregates, base_leaves, method, aggregate_variance, leaf_variance)
+    np.testing.assert_allclose(np.vstack([aggregates, leaves]), gls(A, base_aggregates, base_leaves, w_a, w_b))
+
+
+@pytest.mark.parametrize("levels", LEVELS)
+def test_bottom_up_keeps_the_leaves(levels):
+    A, base_aggregates, base_leaves, _, _ = forecasts(levels)
+    aggregates, leaves = hierarchy.reconcile_forecasts(A, base_aggregates, base_leaves, "bottom_up")
+    np.testing.assert_array_equal(leaves, base_leaves)
+    np.testing.assert_array_equal(aggregates, A @ base_leaves)
+
+
+@pytest.mark.parametrize("levels", LEVELS)
+@pytest.mark.parametrize("method", hierarchy.METHODS)
+def test_reconciled_forecasts_are_coherent(levels, method):
+    A, base_aggregates, base_leaves, aggregate_variance, leaf_variance = forecasts(levels)
+    aggregates, leaves = hierarchy.reconcile_forecasts(A, base_aggregates, base_leaves, method, aggregate_variance, leaf_variance)
+    np.testing.assert_allclose(aggregates, A @ leaves)
+    np.testing.assert_allclose(aggregates[0], leaves.sum(axis=0))
+
+
+def test_unknown_method_is_rejected():
+    A, base_aggregates, base_leaves, _, _ = forecasts([])
+    with pytest.raises(ValueError, match="Unknown reconciliation method"):
+        hierarchy.reconcile_forecasts(A, base_aggregates, base_leaves, "top_down")
+
+
+@pytest.fixture
+def trained(data_dir, monkeypatch):
+    """Eight series of MODEL in two categories, fitted (and reconciled) once."""
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "forecaster", "seasonal_naive")
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "hierarchy", {"levels": ["category"], "mapping": "categories.csv"})
+    panel = synthetic_panel(MODEL, 8, 60, end="2025-06-30")
+    keys = sorted(panel['series'].unique())
+    pd.DataFrame({"product": keys, "category": ["A", "B"] * 4}).to_csv(data_dir / "categories.csv", index=False)
+    series.merge_series_history(MODEL, panel)
+    with ThreadPoolExecutor(1) as pool:
+        success, message, summary = series.train_series_model(MODEL, pool, False)
+    assert success, message
+    return data_dir / "categories.csv"
+
+
+def test_reconciliation_is_skipped_while_nothing_changed(trained):
+    success, _, summary = hierarchy.reconcile_model(MODEL)
+    assert success and summary == {"skipped": True}
+
+    success, _, summary = hierarchy.reconcile_model(MODEL, force=True)
+    assert success and summary["nodes"] == 1 + 2 + 8
+
+
+def test_a_new_mapping_or_method_is_reconciled(trained):
+    pd.DataFrame({"product": [], "category": []}).to_csv(trained, index=False)
+    success, _, summary = hierarchy.reconcile_model(MODEL)
+    assert success and summary["aggregates"] == 1 + 1  # Every series is now (unmapped)
+    assert hierarchy.reconcile_model(MODEL)[2] == {"skipped": True}
+
+    success, _, summary = hierarchy.reconcile_model(MODEL, "bottom_up")
+    assert success and summary["method"] == "bottom_up"
+
+
+def test_saved_forecasts_are_coherent(trained):
+    total = hierarchy.read_reconciled_forecast(MODEL, hierarchy.TOTAL)
+    categories = hierarchy.read_reconciled_forecast(MODEL, "category")
+    leaves = hierarchy.read_reconciled_forecast(MODEL, hierarchy.SERIES_LEVEL)
+    assert set(categories['node']) == {"A", "B"}
+    expected = leaves.groupby('ds')['yhat'].sum().to_numpy()
+    np.testing.assert_allclose(total.sort_values('ds')['yhat'].to_numpy(), expected)
+    np.testing.assert_allclose(categories.groupby('ds')['yhat'].sum().to_numpy(), expected)
+
+
+def test_node_responses_are_cached_until_reconciled_again(trained, monkeypatch):
+    import app
+    reads = []
+    read = hierarchy.read_reconciled_forecast
+    monkeypatch.setattr(hierarchy, "read_reconciled_forecast", lambda *args: reads.append(args) or read(*args))
+    client = app.app.test_client()
+
+    first = client.get(f"/forecast/{MODEL}?level=category&node=A")
+    assert first.status_code == 200 and len(first.get_json()) == hierarchy.FORECAST_HORIZON_DAYS
+    assert client.get(f"/forecast/{MODEL}?level=category&node=A").get_data() == first.get_data()
+    assert len(reads) == 1
+
+    hierarchy.reconcile_model(MODEL, "bottom_up")
+    assert client.get(f"/forecast/{MODEL}?level=category&node=A").status_code == 200
+    assert len(reads) == 2
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import history
+from storage import HISTORY_COLUMNS
+
+SAVED_AT = pd.Timestamp("2025-01-01")
+NOW = pd.Timestamp("2025-02-01")
+
+
+def points(days, y, at=SAVED_AT):
+    """History-layout rows for the given days of January 2025."""
+    ds = pd.Timestamp("2025-01-01") + pd.to_timedelta(np.asarray(days), unit='D')
+    return pd.DataFrame({'ds': ds, 'y': np.asarray(y, dtype=np.float64), 'created_at': at, 'updated_at': at})[HISTORY_COLUMNS]
+
+
+def reference(existing_df, new_df, window):
+    """The merge done the slow way: concat, sort, keep the newest row per 'ds', trim to the window."""
+    combined = pd.concat([existing_df, new_df], ignore_index=True).sort_values('ds', kind='stable')
+    combined = combined.drop_duplicates('ds', keep='last').reset_index(drop=True)
+    kind, size = window
+    if size is None or combined.empty:
+        return combined, combined['ds'].iloc[:0]
+    keep = combined.index >= len(combined) - size if kind == history.ROWS else \
+        combined['ds'] > combined['ds'].iloc[-1] - pd.Timedelta(days=size)
+    return combined[keep].reset_index(drop=True), combined.loc[~keep, 'ds']
+
+
+def assert_merge(existing_df, new_df, window):
+    merged, evicted = history.merge(existing_df, new_df, window)
+    expected, expected_evicted = reference(existing_df, new_df, window)
+    pd.testing.assert_frame_equal(merged, expected, check_dtype=False)
+    assert list(pd.to_datetime(evicted)) == list(expected_evicted)
+    return merged, evicted
+
+
+def test_new_point_replaces_the_saved_one():
+    merged, evicted = assert_merge(points([0, 1, 2], [1, 2, 3]), points([1], [20], at=NOW), (history.DAYS, None))
+    assert merged['y'].tolist() == [1, 20, 3]
+    assert merged.loc[1, 'updated_at'] == NOW
+    assert evicted.empty
+
+
+def test_points_are_inserted_between_saved_ones():
+    merged, _ = assert_merge(points([0, 2, 4], [1, 3, 5]), points([1, 3, 5], [2, 4, 6], at=NOW), (history.DAYS, None))
+    assert merged['y'].tolist() == [1, 2, 3, 4, 5, 6]
+
+
+def test_days_window_evicts_old_points():
+    merged, evicted = assert_merge(points(range(10), range(10)), points([12], [12], at=NOW), (history.DAYS, 5))
+    assert merged['ds'].min() == pd.Timestamp("2025-01-09")  # Newer than 5 days before the 13th
+    assert len(evicted) == 8
+
+
+def test_rows_window_keeps_the_newest_rows():
+    merged, evicted = assert_merge(points(range(10), range(10)), points([3, 11], [30, 11], at=NOW), (history.ROWS, 4))
+    assert merged['y'].tolist() == [7, 8, 9, 11]
+    assert len(evicted) == 7
+
+
+@pytest.mark.parametrize("window", [(history.DAYS, None), (history.DAYS, 3), (history.ROWS, 2)])
+def test_empty_saved_history(window):
+    new_df = points([4, 1, 1, 6], [4, 1, 10, 6], at=NOW)  # Unsorted, with a duplicate 'ds'
+    merged, _ = assert_merge(points([], []), new_df, window)
+    assert merged['ds'].is_monotonic_increasing and merged['ds'].is_unique
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("window", [(history.DAYS, None), (history.DAYS, 30), (history.ROWS, 25)])
+def test_matches_the_reference_merge(seed, window):
+    rng = np.random.default_rng(seed)
+    existing_days = np.sort(rng.choice(60, rng.integers(0, 50), replace=False))
+    new_days = rng.integers(0, 90, rng.integers(0, 30))
+    assert_merge(points(existing_days, rng.normal(size=len(existing_days))),
+                 points(new_days, rng.normal(size=len(new_days)), at=NOW), window)
@@ -0,0 +1,69 @@
+from datetime import date
+
+import httpx
+import pytest
+
+import services
+from config import POCKETBASE_COLLECTION_CONFIG
+from pb_fetch import PocketBaseFetcher, aggregate_daily_values
+
+MODEL = "part_stock_log"
+CONFIG = POCKETBASE_COLLECTION_CONFIG[MODEL]
+
+
+def expected_daily(records):
+    ordered = sorted(records, key=lambda r: (r[CONFIG["ds_field"]], r["id"]))
+    expected, _ = aggregate_daily_values([r[CONFIG["ds_field"]] for r in ordered],
+                                         [r[CONFIG["y_field"]] for r in ordered], CONFIG["aggregation_method"])
+    return expected
+
+
+def assert_same_daily(result, expected):
+    assert result['ds'].tolist() == expected['ds'].tolist()
+    assert result['y'].astype(float).round(6).tolist() == expected['y'].astype(float).round(6).tolist()
+
+
+def test_iter_pages_yields_every_page_once(pb_stub):
+    records = pb_stub.collections[CONFIG["collection_name"]]
+    with PocketBaseFetcher(pb_stub.base_url, page_size=150, concurrency=4) as fetcher:
+        pages = list(fetcher.iter_pages(CONFIG["collection_name"], sort="id"))
+    expected_pages = -(-len(records) // 150)
+    assert sorted(page for page, _ in pages) == list(range(1, expected_pages + 1))
+    assert fetcher.pages_fetched == expected_pages
+    assert sorted(item["id"] for _, items in pages for item in items) == sorted(r["id"] for r in records)
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_month_fetch_matches_direct_aggregate(pb_stub, concurrency):
+    with PocketBaseFetcher(pb_stub.base_url, page_size=100, concurrency=concurrency) as fetcher:
+        result = services.fetch_data_for_month_from_pb(fetcher, MODEL, date(2025, 1, 1), raise_errors=True)
+    assert_same_daily(result, expected_daily(pb_stub.collections[CONFIG["collection_name"]]))
+
+
+@pytest.mark.parametrize("pb_stub", [{"fail_every": 3}], indirect=True)
+def test_transient_failures_are_retried(pb_stub):
+    # Every third request fails server-wide, so with pages in flight one page can draw several
+    # failures in a row; the retry budget is raised to keep the test deterministic.
+    with PocketBaseFetcher(pb_stub.base_url, page_size=100, concurrency=4, max_retries=20, backoff_seconds=0) as fetcher:
+        result = services.fetch_data_for_month_from_pb(fetcher, MODEL, date(2025, 1, 1), raise_errors=True)
+    assert fetcher.retries > 0
+    assert_same_daily(result, expected_daily(pb_stub.collections[CONFIG["collection_name"]]))
+
+
+@pytest.mark.parametrize("pb_stub", [{"fail_every": 1}], indirect=True)
+def test_gives_up_after_max_retries(pb_stub):
+    with PocketBaseFetcher(pb_stub.base_url, max_retries=2, backoff_seconds=0) as fetcher:
+        with pytest.raises(httpx.HTTPStatusError):
+            list(fetcher.iter_pages(CONFIG["collection_name"]))
+    assert pb_stub.state.requests == 3
+    assert fetcher.retries == 2
+
+
+@pytest.mark.parametrize("pb_stub", [{"credentials": ("admin@example.com", "secret")}], indirect=True)
+def test_expired_token_is_renewed(pb_stub):
+    with PocketBaseFetcher(pb_stub.base_url, page_size=500) as fetcher:
+        fetcher.authenticate("admin@example.com", "secret")
+        pb_stub.state.tokens.clear()  # Every issued token expires
+        pages = list(fetcher.iter_pages(CONFIG["collection_name"]))
+    assert sum(len(items) for _, items in pages) == len(pb_stub.collections[CONFIG["collection_name"]])
+    assert pb_stub.state.auth_requests == 2
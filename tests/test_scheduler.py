@@ -0,0 +1,117 @@
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+
+import scheduler
+import services
+from config import POCKETBASE_COLLECTION_CONFIG
+from tests.conftest import STUB_START
+
+HOUR = 3600.0
+
+
+@pytest.mark.parametrize("model_name", sorted(POCKETBASE_COLLECTION_CONFIG))
+def test_slots_are_offset_by_crc32(model_name):
+    offset = zlib.crc32(model_name.encode("utf-8")) % int(HOUR)
+    after = 1_750_000_000.0
+    slot = scheduler.next_slot(model_name, HOUR, after)
+    assert after < slot <= after + HOUR
+    assert (slot - offset) % HOUR == 0
+    assert scheduler.next_slot(model_name, HOUR, slot) == slot + HOUR
+
+
+def test_models_sharing_a_cadence_get_different_slots():
+    slots = {scheduler.next_slot(name, HOUR, 0.0) for name in POCKETBASE_COLLECTION_CONFIG}
+    assert len(slots) == len(POCKETBASE_COLLECTION_CONFIG)
+
+
+class FakeRefresh:
+    """
+    Stands in for services.refresh_model_from_db; returns the queued high-water marks in turn.
+    With a gate, every refresh waits for it to be set.
+    """
+
+    def __init__(self, high_waters, gate=None):
+        self.high_waters = list(high_waters)
+        self.gate = gate
+        self.since_dates = []
+
+    def __call__(self, model_name, since_date, retrain_executor, force=False):
+        self.since_dates.append(since_date)
+        if self.gate is not None:
+            self.gate.wait(10)
+        return True, "ok", {"rows_fetched": 1, "high_water": self.high_waters.pop(0), "status": "updated"}
+
+
+def run_once(sched, now):
+    """Starts the due models at `now` and collects them once they finish."""
+    sched.tick(now)
+    for future, _ in list(sched._running.values()):
+        future.result()
+    sched.tick(now)
+
+
+def test_high_water_advances_and_never_regresses(data_dir, monkeypatch):
+    refresh = FakeRefresh(["2025-01-10", "2025-01-05", "2025-01-12"])
+    monkeypatch.setattr(services, "refresh_model_from_db", refresh)
+    now = 1_750_000_000.0
+    with ThreadPoolExecutor(1) as threads:
+        for run in range(3):
+            sched = scheduler.Scheduler(["sales"], stagger_seconds=0)
+            sched._threads, sched.next_due = threads, {"sales": now}
+            run_once(sched, now)
+            now += 2 * HOUR
+
+    assert refresh.since_dates[1:] == [date(2025, 1, 10), date(2025, 1, 10)]
+    assert scheduler.read_state("sales")["high_water"] == "2025-01-12"
+    assert scheduler.read_state("sales")["last_status"] == "updated"
+
+
+def test_missed_slot_runs_right_away(data_dir):
+    now = 1_750_000_000.0
+    scheduler.write_state("sales", {"last_started_at": scheduler._iso(now - 3 * 24 * HOUR)})
+    assert scheduler.Scheduler(["sales"])._initial_due("sales", now) == now
+
+    scheduler.write_state("sales", {"last_started_at": scheduler._iso(now - 60)})
+    cadence = scheduler.refresh_seconds("sales")
+    assert scheduler.Scheduler(["sales"])._initial_due("sales", now) == scheduler.next_slot("sales", cadence, now - 60)
+
+
+def test_stagger_and_fit_cap_hold_back_due_models(data_dir, monkeypatch):
+    gate = threading.Event()
+    monkeypatch.setattr(services, "refresh_model_from_db", FakeRefresh(["2025-01-10"] * 3, gate))
+    models = ["sales", "part_stock_log", "product_stocks"]
+    now = 1_750_000_000.0
+    with ThreadPoolExecutor(2) as threads:
+        sched = scheduler.Scheduler(models, max_concurrent_fits=2, stagger_seconds=30)
+        sched._threads, sched.next_due = threads, dict.fromkeys(models, now)
+        assert sched.tick(now) == 30  # One start; the next is staggered
+        assert sched.tick(now + 10) == 20 and len(sched._running) == 1
+        assert sched.tick(now + 30) is None and len(sched._running) == 2  # At the cap
+        assert sched.tick(now + 60) is None and len(sched._running) == 2
+
+        gate.set()
+        for future, _ in list(sched._running.values()):
+            future.result()
+        sched.tick(now + 60)
+        assert len(sched.completed) == 2 and len(sched._running) == 1
+
+
+@pytest.fixture
+def series_refresh(pb_services, monkeypatch):
+    """refresh_model_from_db for a series model against the stub, fitting on a thread."""
+    model_name = "product_stocks_by_product"
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[model_name], "forecaster", "seasonal_naive")
+    with ThreadPoolExecutor(1) as pool:
+        yield lambda: services.refresh_model_from_db(model_name, STUB_START, pool)
+
+
+def test_series_refresh_of_unchanged_history_is_unchanged(series_refresh):
+    success, _, details = series_refresh()
+    assert success and details["status"] == "updated"
+
+    success, _, details = series_refresh()
+    assert success and details["status"] == "unchanged"
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import series
+import services
+from config import POCKETBASE_COLLECTION_CONFIG
+from generate_data import synthetic_panel
+from tests.conftest import STUB_START
+
+MODEL = "product_stocks_by_product"
+
+
+@pytest.fixture
+def points(data_dir, monkeypatch):
+    """Eight series of MODEL, fitted with a NumPy baseline so every fit takes milliseconds."""
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "forecaster", "seasonal_naive")
+    panel = synthetic_panel(MODEL, 8, 60, end="2025-06-30")
+    panel['ds'] = panel['ds'].dt.strftime('%Y-%m-%d')
+    return panel.to_dict("records")
+
+
+def test_manual_update_trains_the_series_buckets(points, data_dir):
+    with ThreadPoolExecutor(1) as pool:
+        success, message = services.update_forecast_manually(MODEL, points, retrain_executor=pool)
+    assert success and "fitted 8 of 8 series" in message
+    assert not (data_dir / f"{MODEL}_data.csv").exists()
+    assert len(series.read_series_forecast(MODEL, points[0]["series"])) > 0
+
+
+def train(force=False):
+    with ThreadPoolExecutor(1) as pool:
+        return series.train_series_model(MODEL, pool, force)
+
+
+def test_schedule_changes_keep_bucket_fits(points, monkeypatch):
+    services.append_manual_series_data(MODEL, points)
+    summary = train()[2]
+    assert summary["fitted"] == 8 and summary["buckets_skipped"] == 0
+
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[MODEL], "refresh_minutes", 15)
+    summary = train()[2]
+    assert summary["fitted"] == 0 and summary["buckets_skipped"] == summary["buckets"]
+
+
+def test_prophet_upgrade_refits_buckets(points, monkeypatch):
+    services.append_manual_series_data(MODEL, points)
+    train()
+
+    monkeypatch.setattr(series.forecasters, "prophet_version", lambda: "99.0")
+    summary = train()[2]
+    assert summary["fitted"] == 8 and summary["buckets_skipped"] == 0
+
+
+def test_a_failed_bucket_merge_only_fails_its_model(pb_services, monkeypatch):
+    monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG["sales"], "forecaster", "seasonal_naive")
+
+    def failing_merge(model_name, new_data_df, data_dir=None):
+        raise ImportError("pyarrow is not installed")
+
+    monkeypatch.setattr(series, "merge_series_history", failing_merge)
+    with ThreadPoolExecutor(1) as pool:
+        success, message, report = services.update_all_models_from_db(STUB_START, pool, [MODEL, "sales"])
+    assert not success and f"Failed: {MODEL}." in message
+    assert [(entry["model"], entry["status"]) for entry in report] == [(MODEL, "merge_failed"), ("sales", "updated")]
+    assert report[0]["message"] == "pyarrow is not installed"
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+import services
+from config import POCKETBASE_COLLECTION_CONFIG
+from tests.conftest import STUB_START
+
+MODELS = ["sales", "part_stock_log"]
+
+
+@pytest.fixture
+def update_all(pb_services, monkeypatch):
+    """update_all_models_from_db() for MODELS against the stub, fitting NumPy baselines on a thread."""
+    for model_name in MODELS:
+        monkeypatch.setitem(POCKETBASE_COLLECTION_CONFIG[model_name], "forecaster", "seasonal_naive")
+    with ThreadPoolExecutor(1) as pool:
+        yield lambda model_names=MODELS: services.update_all_models_from_db(STUB_START, pool, model_names)
+
+
+def test_every_model_is_updated(update_all):
+    success, message, report = update_all()
+    assert success, message
+    assert [entry["status"] for entry in report] == ["updated", "updated"]
+
+
+def test_a_failed_merge_only_fails_its_model(update_all, monkeypatch):
+    merge = services._process_and_save_historical_data
+
+    def failing_merge(model_name, new_data_df):
+        if model_name == "sales":
+            raise OSError("disk full")
+        return merge(model_name, new_data_df)
+
+    monkeypatch.setattr(services, "_process_and_save_historical_data", failing_merge)
+    success, message, report = update_all()
+    assert not success and "Failed: sales." in message
+    assert {entry["model"]: entry["status"] for entry in report} == {"sales": "merge_failed", "part_stock_log": "updated"}
+    assert report[0]["message"] == "disk full"
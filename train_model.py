@@ -1,49 +1,36 @@
 # train_model.py
-import os
-import pandas as pd
-from prophet import Prophet
 import sys
-from config import DATA_DIR # Import DATA_DIR from config
+import services
 
-# This MODEL_NAME is used for file paths and error messages specific to this script run.
-CURRENT_MODEL_NAME = sys.argv[1] if len(sys.argv) > 1 else "sales"
+def train_model(model_name, force=False):
+    """
+    Trains model_name's forecaster (Prophet or a baseline, see forecasters.py) from its saved
+    history and saves its forecast.
+    The fit is skipped if the history is unchanged since the last one, unless force is set.
+    Returns (success, message).
+    """
+    data_filepath = services.get_data_filepath(model_name)
 
-# os.makedirs(DATA_DIR, exist_ok=True) # DATA_DIR is created by config.py
+    try:
+        df = services.load_historical_data(model_name)
+    except FileNotFoundError:
+        return False, f"Data file {data_filepath} not found for model '{model_name}'. Please generate it first."
+    except Exception as e:
+        return False, f"Error reading or processing data file {data_filepath} for model '{model_name}': {str(e)}"
 
-data_filepath = os.path.join(DATA_DIR, f"{CURRENT_MODEL_NAME}_data.csv")
-forecast_filepath = os.path.join(DATA_DIR, f"{CURRENT_MODEL_NAME}_forecast.csv")
+    if 'y' not in df.columns:
+        return False, f"'y' column not found in {data_filepath} for model '{model_name}'."
 
-try:
-    df = pd.read_csv(data_filepath) 
-    if 'ds' not in df.columns:
-        print(f"Error: 'ds' column not found in {data_filepath} for model '{CURRENT_MODEL_NAME}'.")
-        exit(1)
-    
-    df['ds'] = pd.to_datetime(df['ds'], errors='coerce')
-    df.dropna(subset=['ds'], inplace=True) 
-    df['ds'] = df['ds'].dt.tz_localize(None)
+    # Same fit/predict/save path the API uses, including the minimum-data check.
+    return services._train_and_save_forecast(model_name, df, force=force)
 
-except FileNotFoundError:
-    print(f"Error: Data file {data_filepath} not found for model '{CURRENT_MODEL_NAME}'. Please generate it first.")
-    exit(1)
-except Exception as e:
-    print(f"Error reading or processing data file {data_filepath} for model '{CURRENT_MODEL_NAME}': {str(e)}")
-    exit(1)
-
-if df.empty or len(df) < 20: # Increased min for stability
-    print(f"Error: Not enough data ({len(df)} points) in {data_filepath} to train the model for '{CURRENT_MODEL_NAME}'. Needs at least 20 data points after processing.")
-    exit(1)
-if 'y' not in df.columns:
-    print(f"Error: 'y' column not found in {data_filepath} for model '{CURRENT_MODEL_NAME}'.")
-    exit(1)
-
-try:
-    model = Prophet()
-    model.fit(df[['ds', 'y']].copy())
-    future = model.make_future_dataframe(periods=30) 
-    forecast = model.predict(future)
-    forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']].to_csv(forecast_filepath, index=False)
-    print(f"Success: Saved 30-day forecast for '{CURRENT_MODEL_NAME}' to {forecast_filepath}")
-except Exception as e:
-    print(f"Error during model training or prediction for '{CURRENT_MODEL_NAME}': {str(e)}")
-    exit(1)
+if __name__ == "__main__":
+    # This model name is used for file paths and error messages specific to this script run.
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    current_model_name = args[0] if args else "sales"
+    success, message = train_model(current_model_name, force="--force" in sys.argv[1:])
+    if success:
+        print(f"Success: {message}")
+    else:
+        print(f"Error: {message}")
+        sys.exit(1)
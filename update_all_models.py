@@ -0,0 +1,46 @@
+# update_all_models.py
+# Command-line equivalent of POST /trigger_update_all, for cron:
+#   python update_all_models.py 2025 1 --workers 4
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import services
+from config import POCKETBASE_COLLECTION_CONFIG, RETRAIN_WORKERS
+
+
+def print_report(report):
+    print(f"{'model':<26}{'rows':>8}{'fetch':>10}{'fit':>10}  status")
+    for entry in report:
+        fetch = f"{entry['fetch_seconds']:.2f}s" if entry["fetch_seconds"] is not None else "-"
+        fit = f"{entry['fit_seconds']:.2f}s" if entry["fit_seconds"] is not None else "-"
+        print(f"{entry['model']:<26}{entry['rows_fetched']:>8}{fetch:>10}{fit:>10}  {entry['status']}")
+        if entry["status"].endswith("_failed"):
+            print(f"    {entry['message']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch one month for every configured model from PocketBase and retrain them.")
+    parser.add_argument("year", type=int)
+    parser.add_argument("month", type=int, help="1-12")
+    parser.add_argument("--workers", type=int, default=RETRAIN_WORKERS, help="Processes used for the Prophet fits.")
+    parser.add_argument("--models", nargs="+", choices=sorted(POCKETBASE_COLLECTION_CONFIG),
+                        help="Only update these models (default: all configured).")
+    parser.add_argument("--force", action="store_true", help="Refit even models whose history is unchanged.")
+    args = parser.parse_args()
+
+    try:
+        target_month = date(args.year, args.month, 1)
+    except ValueError as e:
+        parser.error(f"Invalid year or month: {e}")
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        success, message, report = services.update_all_models_from_db(target_month, executor, args.models, args.force)
+    if report:
+        print_report(report)
+    if success:
+        print(f"Success: {message}")
+    else:
+        print(f"Error: {message}")
+        sys.exit(1)
@@ -1,18 +1,45 @@
+import argparse
 import sys
 import json
 
-from services import update_forecast_manually # Import the service function
+import bulk_ingest
+from services import update_forecast_manually, update_forecast_from_bulk # Import the service functions
+
+USAGE_EXAMPLES = """examples:
+  python update_forecast.py sales "[{'ds': '2025-06-01', 'y': 100}]"
+  python update_forecast.py sales ./new_sales_data.json
+  python update_forecast.py sales ./new_sales_data.ndjson        (or .jsonl / .csv: streamed in chunks)
+  cat points.csv | python update_forecast.py sales - --format csv
+"""
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python update_forecast.py <model_name> <json_data_list_string_or_filepath>")
-        print("Example (JSON string): python update_forecast.py sales \"[{'ds': '2025-06-01', 'y': 100}]\"")
-        print("Example (Filepath): python update_forecast.py sales ./new_sales_data.json")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Merge new data points into a model's history and retrain it once.",
+                                     epilog=USAGE_EXAMPLES, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model_name")
+    parser.add_argument("data", help="A JSON list string, a .json file, an .ndjson/.jsonl/.csv file, or - for stdin.")
+    parser.add_argument("--format", choices=bulk_ingest.FORMATS, help="Bulk format of the file or stdin (default: from the file extension).")
+    parser.add_argument("--force", action="store_true", help="Refit even if the history is unchanged since the last fit.")
+    args = parser.parse_args()
+
+    model_name_arg = args.model_name
+    data_arg = args.data
+
+    bulk_format = args.format or (bulk_ingest.format_for(filename=data_arg) if data_arg != "-" else bulk_ingest.NDJSON)
+    if bulk_format is not None:
+        print(f"Attempting to update model '{model_name_arg}' from {'stdin' if data_arg == '-' else data_arg} ({bulk_format})...")
+        try:
+            f = sys.stdin.buffer if data_arg == "-" else open(data_arg, 'rb')
+        except FileNotFoundError:
+            print(f"Error: File '{data_arg}' not found.")
+            sys.exit(1)
+        with f:
+            success, message, stats = update_forecast_from_bulk(model_name_arg, f, bulk_format, force=args.force)
+        if stats:
+            reasons = ", ".join(f"{stats[reason]} {reason}" for reason in bulk_ingest.REJECT_REASONS if stats[reason])
+            print(f"Parsed {stats['rows']} rows: {stats['accepted']} accepted, {stats['rejected']} rejected{f' ({reasons})' if reasons else ''}.")
+        print(f"Success: {message}" if success else f"Error: {message}")
+        sys.exit(0 if success else 1)
 
-    model_name_arg = sys.argv[1]
-    data_arg = sys.argv[2]
-    
     new_data = []
     try:
         # Try to interpret as JSON string first
@@ -28,13 +55,13 @@ if __name__ == "__main__":
         except json.JSONDecodeError:
             print(f"Error: File '{data_arg}' does not contain valid JSON.")
             sys.exit(1)
-    
+
     if not isinstance(new_data, list):
         print("Error: Parsed data is not a list.")
         sys.exit(1)
 
     print(f"Attempting to update model '{model_name_arg}' with {len(new_data)} new data points...")
-    success, message = update_forecast_manually(model_name_arg, new_data)
+    success, message = update_forecast_manually(model_name_arg, new_data, force=args.force)
 
     if success:
         print(f"Success: {message}")
@@ -0,0 +1,23 @@
+"""
+WSGI entry point for production servers:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py sets preload_app, so this module runs once, in the master process: the app
+and its libraries are imported and the read caches are filled there, then workers are forked
+and share those pages copy-on-write. The retrain job pools are started lazily inside each
+worker (jobs.py), never in the master. Prophet is only imported by the processes that fit.
+"""
+import gc
+import time
+
+started = time.perf_counter()
+
+from app import app, warm_response_caches
+
+cached_bodies = warm_response_caches()
+print(f"Success: App loaded in {time.perf_counter() - started:.2f}s ({cached_bodies} cached response bodies).")
+
+# Moves everything allocated so far out of the collector's reach: a forked worker's collections
+# would otherwise write to (and so copy) every page holding these objects.
+gc.freeze()